@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+generate.py - Generate synthetic bank-export CSVs for csvimport/csvtransform benchmarks.
+
+Usage:
+    python benchmarks/generate.py --org orgname1 --rows 1000000 --output bench_data/orgname1.csv \
+        [ --existing-output bench_data/orgname1_existing.csv --overlap 0.5 ] [ --seed 1 ]
+
+Formats follow confs/csvimport.conf.sample (orgname1, orgname2) plus the Debit/Credit
+split layout documented in docs/csvimport.md (anotherbank).
+"""
+
+import argparse
+import csv
+import datetime
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from csvimport import bind_transform, compile_transform, load_config  # noqa: E402
+
+SAMPLE_CONFIG = os.path.join(os.path.dirname(__file__), "..", "confs", "csvimport.conf.sample")
+
+# Formats that are documented but not in the sample config
+EXTRA_ORGS = {
+    "csvtransform": {
+        "input_format": ["Booking Date", "Check Serial Number", "Description", "Amount", "Credit Debit Indicator", "Category"],
+        "output_format": ["Booking Date", "Check Serial Number", "Description", "Debit", "Credit", "Category"],
+        "key_fields": ["Booking Date", "Description", "Debit", "Credit"],
+    },
+    "anotherbank": {
+        "input_format": ["Posting Date", "Transaction Date", "Amount", "Credit Debit Indicator", "type", "Type Group", "Reference", "Instructed Currency", "Currency Exchange Rate", "Instructed Amount", "Description", "Category", "Check Serial Number", "Card Ending"],
+        "output_format": ["Posting Date", "Check Serial Number", "Description", "Debit", "Credit", "Category", "Amount", "Credit Debit Indicator", "type", "Type Group", "Reference", "Instructed Currency", "Currency Exchange Rate", "Instructed Amount", "Card Ending"],
+        "key_fields": ["Description", "Instructed Amount", "Check Serial Number", "Posting Date"],
+    },
+}
+
+MERCHANTS = ["GROCERY MART", "COFFEE HOUSE", "GAS STATION", "ONLINE STORE", "PHARMACY", "RESTAURANT", "UTILITY CO", "PAYROLL", "TRANSFER", "BOOKSHOP"]
+CATEGORIES = ["Groceries", "Food & Drink", "Gas", "Shopping", "Health", "Bills", "Income", "Transfer"]
+NAMES = ["Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie"]
+
+def org_formats(org: str) -> dict:
+    if org in EXTRA_ORGS:
+        return EXTRA_ORGS[org]
+    orgs = load_config(SAMPLE_CONFIG).get("organizations", {})
+    if org not in orgs:
+        raise SystemExit(f"Unknown org '{org}'. Known: {', '.join(sorted(list(orgs) + list(EXTRA_ORGS)))}")
+    return orgs[org]
+
+def column_value(col: str, i: int, rng: random.Random, date: str, amount: str) -> str:
+    lower = col.lower()
+    if "date" in lower:
+        return date
+    if col == "Amount" or col == "Instructed Amount":
+        return amount
+    if col == "Credit Debit Indicator":
+        return "Credit" if amount[0] != "-" and i % 5 == 0 else "Debit"
+    if col == "Description":
+        return f"{rng.choice(MERCHANTS)} #{i % 9973}"
+    if col == "Category":
+        return rng.choice(CATEGORIES)
+    if col == "Email":
+        return f"user{i}@example.com"
+    if col == "Name":
+        return f"{rng.choice(NAMES)} {i}"
+    if col == "Check Serial Number":
+        return str(1000 + i) if i % 50 == 0 else ""
+    if col == "Card Ending":
+        return str(1000 + i % 9000)
+    if col in ("Type", "type", "Type Group"):
+        return "Sale" if i % 5 else "Payment"
+    if col == "Instructed Currency":
+        return "USD"
+    if col == "Currency Exchange Rate":
+        return "1"
+    if col == "Reference":
+        return f"REF{i:010d}"
+    return ""
+
+def generate_rows(input_format: list, count: int, seed: int, start: int = 0):
+    rng = random.Random(seed)
+    base = datetime.date(2020, 1, 1)
+    for i in range(start, start + count):
+        date = (base + datetime.timedelta(days=i // 200 % 2000)).strftime("%m/%d/%Y")
+        amount = f"{rng.uniform(-500, 500):.2f}"
+        yield [column_value(col, i, rng, date, amount) for col in input_format]
+
+def write_csv(path: str, header: list, rows) -> int:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+def generate_dataset(org: str, rows: int, output: str, existing_output: str = None, overlap: float = 0.5, seed: int = 1) -> None:
+    formats = org_formats(org)
+    input_format = formats["input_format"]
+    count = write_csv(output, input_format, generate_rows(input_format, rows, seed))
+    print(f"Wrote {count} rows to {output}", file=sys.stderr)
+    if existing_output:
+        # Existing history: the first `overlap` share of the input plus as many older rows,
+        # projected to the output format the same way csvimport would transform them
+        output_format = formats["output_format"]
+        apply = bind_transform(compile_transform(input_format, output_format, formats.get("transform_rules")), input_format)
+        shared = int(rows * overlap)
+        history = generate_rows(input_format, shared, seed)
+        older = generate_rows(input_format, shared, seed + 1, start=rows)
+        count = write_csv(existing_output, output_format, (apply(row) for source in (history, older) for row in source))
+        print(f"Wrote {count} existing rows to {existing_output}", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic bank-export CSVs for benchmarks.")
+    parser.add_argument("--org", default="orgname1", help="Organization format to generate (default: orgname1)")
+    parser.add_argument("--rows", type=int, default=10000, help="Number of input rows (default: 10000)")
+    parser.add_argument("--output", required=True, help="Path of the generated input CSV")
+    parser.add_argument("--existing-output", help="Also write an existing-entries CSV (output format) for dedup benchmarks")
+    parser.add_argument("--overlap", type=float, default=0.5, help="Fraction of input rows also present in the existing CSV (default: 0.5)")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed (default: 1)")
+    args = parser.parse_args()
+    generate_dataset(args.org, args.rows, args.output, args.existing_output, args.overlap, args.seed)
+
+if __name__ == "__main__":
+    main()
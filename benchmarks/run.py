@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+run.py - Throughput benchmarks for csvimport and csvtransform.
+
+Usage:
+    python benchmarks/run.py [ --org ORG ] [ --sizes 10k,1m,10m ] [ --engine row|columnar ] \
+        [ --workers N ] [ --compact-keys 64|128 ] [ --data-dir bench_data ] \
+        [ --output results.json ] [ --compare baseline.json [ --threshold 0.10 ] ]
+
+Each stage runs in a fresh process so its peak RSS is its own:
+  read       csv parsing only
+  transform  read + compiled transform plan
+  load_keys  building the existing-entries key set
+  dedup      read + transform + dedup against existing keys and within the batch
+  write      read + transform + dedup + CSV write
+  cli        csvimport.py end to end as a subprocess
+  csvtransform  csvtransform.transform_csv (only for --org csvtransform)
+stage_seconds is the time attributable to the stage itself (difference from the
+previous cumulative stage). Results are JSON so runs can be diffed with --compare.
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import csvimport  # noqa: E402
+from generate import generate_dataset, org_formats  # noqa: E402
+
+# Cumulative pipeline stages and the stages whose time they include
+STAGE_INCLUDES = {"transform": ["read"], "dedup": ["transform", "load_keys"], "write": ["dedup"]}
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+
+class NullLogger:
+    def debug(self, *args, **kwargs): pass
+    def info(self, *args, **kwargs): pass
+    def warning(self, *args, **kwargs): pass
+    def error(self, *args, **kwargs): pass
+
+def peak_rss_mb(usage) -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return round(usage.ru_maxrss * scale / (1024 * 1024), 1)
+
+def run_stage(stage: str, params: dict) -> dict:
+    formats = org_formats(params["org"])
+    input_format, output_format = formats["input_format"], formats["output_format"]
+    key_columns = formats["key_fields"]
+    logger = NullLogger()
+    rows = 0
+    start = time.perf_counter()
+    if stage == "read":
+        with csvimport.open_csv(params["input"]) as reader:
+            for _ in reader:
+                rows += 1
+        rows -= 1
+    elif stage == "load_keys":
+        keys = csvimport.build_existing_keys(lambda: csvimport.iter_csv_entries(params["existing"]), key_columns, compact_bits=params["compact_keys"])
+        rows = len(keys)
+    elif stage == "csvtransform":
+        import csvtransform
+        with open(os.devnull, "w") as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                csvtransform.transform_csv(params["input"], params["output"])
+            finally:
+                sys.stdout = stdout
+        rows = params["rows"]
+    else:
+        plan = csvimport.compile_transform(input_format, output_format, formats.get("transform_rules"))
+        pipeline = csvimport.read_rows([params["input"]], plan, workers=params["workers"], engine=params["engine"])
+        if stage in ("dedup", "write"):
+            keys = csvimport.build_existing_keys(lambda: csvimport.iter_csv_entries(params["existing"]), key_columns, compact_bits=params["compact_keys"])
+            pipeline = csvimport.dedup_rows(pipeline, keys, csvimport.make_key_func(output_format, key_columns), logger, "first")
+        if stage == "write":
+            with open(params["output"], "w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(output_format)
+                for row in pipeline:
+                    writer.writerow(row)
+                    rows += 1
+        else:
+            for _ in pipeline:
+                rows += 1
+    elapsed = time.perf_counter() - start
+    return {"seconds": round(elapsed, 4), "rows": rows, "peak_rss_mb": peak_rss_mb(resource.getrusage(resource.RUSAGE_SELF))}
+
+def run_cli(params: dict) -> dict:
+    formats = org_formats(params["org"])
+    with tempfile.TemporaryDirectory() as tmp:
+        config = os.path.join(tmp, "bench.conf")
+        with open(config, "w", encoding="utf-8") as f:
+            json.dump({"organizations": {"bench": formats}}, f)
+        cmd = [sys.executable, os.path.join(ROOT, "csvimport.py"), "--input-files", params["input"], "--org", "bench",
+               "--config", config, "--output", params["output"], "--existing-csv", params["existing"],
+               "--log-file", os.path.join(tmp, "csvimport.log"), "--engine", params["engine"], "--workers", str(params["workers"])]
+        if params["compact_keys"]:
+            cmd += ["--compact-keys", str(params["compact_keys"])]
+        start = time.perf_counter()
+        proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
+        _, status, usage = os.wait4(proc.pid, 0)
+        elapsed = time.perf_counter() - start
+        if status != 0:
+            raise RuntimeError(f"csvimport.py exited with status {status}")
+    with open(params["output"], "r", encoding="utf-8", newline="") as f:
+        rows = sum(1 for _ in f) - 1
+    return {"seconds": round(elapsed, 4), "rows": rows, "peak_rss_mb": peak_rss_mb(usage)}
+
+def run_isolated(stage: str, params: dict) -> dict:
+    if stage == "cli":
+        return run_cli(params)
+    ctx = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+        return pool.submit(run_stage, stage, params).result()
+
+def ensure_data(data_dir: str, org: str, rows: int, seed: int) -> tuple:
+    input_path = os.path.join(data_dir, f"{org}_{rows}.csv")
+    existing_path = os.path.join(data_dir, f"{org}_{rows}_existing.csv")
+    if not (os.path.exists(input_path) and os.path.exists(existing_path)):
+        generate_dataset(org, rows, input_path, existing_path, overlap=0.5, seed=seed)
+    return input_path, existing_path
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+def compare(result: dict, baseline: dict, threshold: float) -> int:
+    regressions = 0
+    print(f"{'size':>6} {'stage':<13} {'baseline rows/s':>16} {'current rows/s':>15} {'change':>8}")
+    for size, stages in result["sizes"].items():
+        for stage, current in stages.items():
+            base = baseline.get("sizes", {}).get(size, {}).get(stage)
+            if not base or not base.get("rows_per_sec"):
+                continue
+            change = current["rows_per_sec"] / base["rows_per_sec"] - 1
+            flag = ""
+            if change < -threshold:
+                regressions += 1
+                flag = "  REGRESSION"
+            print(f"{size:>6} {stage:<13} {base['rows_per_sec']:>16,.0f} {current['rows_per_sec']:>15,.0f} {change:>+8.1%}{flag}")
+    return 1 if regressions else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark csvimport/csvtransform stages on synthetic data.")
+    parser.add_argument("--org", default="orgname1", help="Organization format (orgname1, orgname2, anotherbank, csvtransform)")
+    parser.add_argument("--sizes", default="10k", help="Comma-separated sizes: 10k,100k,1m,10m or row counts (default: 10k)")
+    parser.add_argument("--stages", default="read,transform,load_keys,dedup,write,cli", help="Comma-separated stages to run")
+    parser.add_argument("--engine", choices=["row", "columnar"], default="row", help="csvimport transform engine")
+    parser.add_argument("--workers", type=int, default=1, help="csvimport --workers value")
+    parser.add_argument("--compact-keys", type=int, choices=[64, 128], help="csvimport --compact-keys value")
+    parser.add_argument("--data-dir", default="bench_data", help="Where generated data is kept between runs (default: bench_data)")
+    parser.add_argument("--seed", type=int, default=1, help="Data generator seed (default: 1)")
+    parser.add_argument("--output", help="Write JSON results to this file (default: STDOUT)")
+    parser.add_argument("--compare", help="Baseline JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed rows/sec drop before a stage counts as a regression (default: 0.10)")
+    args = parser.parse_args()
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    if args.org == "csvtransform" and "csvtransform" not in stages:
+        stages.append("csvtransform")
+    result = {
+        "benchmark": "csvimport",
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {"org": args.org, "engine": args.engine, "workers": args.workers, "compact_keys": args.compact_keys, "seed": args.seed},
+        "sizes": {},
+    }
+    for size in [s.strip() for s in args.sizes.split(",") if s.strip()]:
+        rows = SIZES.get(size.lower()) or int(size)
+        input_path, existing_path = ensure_data(args.data_dir, args.org, rows, args.seed)
+        with tempfile.TemporaryDirectory() as tmp:
+            params = {"org": args.org, "rows": rows, "input": input_path, "existing": existing_path, "output": os.path.join(tmp, "out.csv"),
+                      "engine": args.engine, "workers": args.workers, "compact_keys": args.compact_keys}
+            size_result = {}
+            for stage in stages:
+                stats = run_isolated(stage, params)
+                stats["rows_per_sec"] = round(rows / stats["seconds"], 1) if stats["seconds"] else None
+                # Time attributable to the stage itself, net of the stages it re-runs
+                included = sum(size_result[s]["seconds"] for s in STAGE_INCLUDES.get(stage, []) if s in size_result)
+                stats["stage_seconds"] = round(max(stats["seconds"] - included, 0.0), 4)
+                size_result[stage] = stats
+                print(f"{size:>6} {stage:<13} {stats['seconds']:>9.3f}s {stats['rows_per_sec'] or 0:>12,.0f} rows/s {stats['peak_rss_mb']:>8.1f} MB", file=sys.stderr)
+            result["sizes"][size] = size_result
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            sys.exit(compare(result, json.load(f), args.threshold))
+
+if __name__ == "__main__":
+    main()
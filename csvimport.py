@@ -18,18 +18,51 @@ Options:
   --output-format FORMAT               Output format specification (e.g., column order or names)
   --config CONFIG                      Optional config file for organization-specific formats
   --org ORG                            Organization name (for config lookup)
+  --all-orgs | --jobs MANIFEST         Import every configured organization (or the jobs in a manifest) in one process
 
 """
 
 
 import argparse
+import array
+import atexit
+import bisect
+import codecs
+import collections
+import concurrent.futures
+import contextlib
 import csv
+import datetime
+import decimal
+import functools
+import gzip
+import hashlib
+import io
+import itertools
+import json
 import sys
+import tempfile
+import threading
+import time
 import yaml
 import logging
-from typing import List, Dict, Optional
+import logging.handlers
+import math
+import operator
+import queue
+import random
+import re
+import shutil
+import sqlite3
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 import os
 
+# Optional zstd compression for backup chunks (gzip otherwise)
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 # Google Sheets API imports
 try:
     import gspread
@@ -60,57 +93,791 @@ def parse_format(format_str: Optional[str]) -> Optional[List[str]]:
         return yaml.safe_load(format_str)
     return [col.strip() for col in format_str.split(",")]
 
+# --- Input files ---
+SNIFF_BYTES = 64 * 1024
+SNIFF_DIALECT_CHARS = 16 * 1024
+READ_BUFFER_BYTES = 1024 * 1024
+SNIFF_DELIMITERS = ",;\t|"
+BOMS = ((codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"))
+
+def sniff_encoding(prefix: bytes) -> str:
+    # A BOM wins, otherwise UTF-8 if the prefix decodes, then cp1252 (most bank exports
+    # that are not UTF-8), then latin-1 which always decodes
+    for bom, encoding in BOMS:
+        if prefix.startswith(bom):
+            return encoding
+    for encoding in ("utf-8", "cp1252"):
+        try:
+            codecs.getincrementaldecoder(encoding)().decode(prefix, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return "latin-1"
+
+def sniff_delimiter(sample: str) -> str:
+    # Only the delimiter is taken from the sniffer; quoting stays the csv defaults
+    # (the sniffer splits lines on \n only, so old-Mac \r endings are normalised first)
+    sample = sample.replace("\r\n", "\n").replace("\r", "\n")
+    cut = sample.rfind("\n")
+    try:
+        return csv.Sniffer().sniff(sample[:cut + 1] if cut > 0 else sample, delimiters=SNIFF_DELIMITERS).delimiter
+    except csv.Error:
+        return ","
+
+class PrefixedStream(io.RawIOBase):
+    # Replays the bytes already read for sniffing before the rest of a non-seekable stream
+    def __init__(self, prefix: bytes, stream):
+        self._prefix = prefix
+        self._stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._prefix:
+            n = min(len(buffer), len(self._prefix))
+            buffer[:n] = self._prefix[:n]
+            self._prefix = self._prefix[n:]
+            return n
+        read = getattr(self._stream, "read1", self._stream.read)
+        data = read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+@contextlib.contextmanager
+def open_csv(source, encoding: Optional[str] = None, delimiter: Optional[str] = None, logger: Optional[logging.Logger] = None):
+    """
+    Open an input CSV (a path, or a binary stream such as stdin) and yield a csv.reader
+    over it. The encoding (BOM, UTF-8, cp1252, latin-1) and delimiter are sniffed once
+    from the start of the input unless given; the input is then read and decoded in
+    1 MiB blocks. Any line ending style is accepted.
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            prefix = f.read(SNIFF_BYTES)
+    else:
+        prefix = source.read(SNIFF_BYTES)
+    name = source if isinstance(source, str) else getattr(source, "name", "<stream>")
+    if encoding is None:
+        encoding = sniff_encoding(prefix)
+    elif codecs.lookup(encoding).name == "utf-8" and prefix.startswith(codecs.BOM_UTF8):
+        encoding = "utf-8-sig"
+    if delimiter is None:
+        delimiter = sniff_delimiter(prefix.decode(encoding, errors="ignore")[:SNIFF_DIALECT_CHARS])
+    if logger:
+        logger.debug(f"Reading {name} as {encoding} with delimiter {delimiter!r}")
+    if isinstance(source, str):
+        f = open(source, "r", encoding=encoding, newline="", buffering=READ_BUFFER_BYTES)
+    else:
+        f = io.TextIOWrapper(io.BufferedReader(PrefixedStream(prefix, source), READ_BUFFER_BYTES), encoding=encoding, newline="")
+    with f:
+        # Decode in the same large blocks the buffer reads (the default is 8 KiB)
+        f._CHUNK_SIZE = READ_BUFFER_BYTES
+        try:
+            yield csv.reader(f, delimiter=delimiter)
+        except UnicodeDecodeError as e:
+            raise ValueError(f"{name} is not valid {encoding} past the first {SNIFF_BYTES} bytes ({e}); set the input encoding explicitly") from e
+
+# --- Run metrics ---
+class RunMetrics:
+    """
+    Counters and per-stage timings for one import run, written at the end as a JSON
+    summary or (for a .prom path) a Prometheus node_exporter textfile.
+    """
+    def __init__(self, **labels):
+        self.labels = {k: str(v) for k, v in labels.items() if v is not None}
+        self.counters: Dict[str, float] = collections.defaultdict(float)
+        self.stages: Dict[str, float] = collections.defaultdict(float)
+        self.files: Dict[str, Dict[str, float]] = collections.defaultdict(lambda: collections.defaultdict(float))
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] += value
+
+    def add_time(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[stage] += seconds
+
+    def add_file(self, path: str, **values: float) -> None:
+        with self._lock:
+            for name, value in values.items():
+                self.files[path][name] += value
+
+    @contextlib.contextmanager
+    def timer(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    def timed(self, rows: Iterable, stage: str) -> Iterator:
+        # Time spent producing each item of a pipeline stage (inclusive of upstream stages)
+        it = iter(rows)
+        perf_counter = time.perf_counter
+        total = 0.0
+        try:
+            while True:
+                start = perf_counter()
+                try:
+                    row = next(it)
+                except StopIteration:
+                    total += perf_counter() - start
+                    return
+                total += perf_counter() - start
+                yield row
+        finally:
+            self.add_time(stage, total)
+
+    def summary(self) -> Dict:
+        with self._lock:
+            counters = dict(self.counters)
+            checked = counters.get("dedup_rows_checked", 0)
+            duplicates = counters.get("dedup_existing_duplicates", 0) + counters.get("dedup_batch_duplicates", 0)
+            return {
+                "labels": dict(self.labels),
+                "counters": counters,
+                "dedup_hit_rate": round(duplicates / checked, 6) if checked else None,
+                "stage_seconds": {k: round(v, 6) for k, v in self.stages.items()},
+                "files": {path: dict(values) for path, values in self.files.items()},
+            }
+
+    def prometheus_families(self) -> "collections.OrderedDict[str, Tuple[str, List[str]]]":
+        # metric family -> (type, sample lines), so several runs can share one textfile
+        def fmt_labels(**extra) -> str:
+            labels = {**self.labels, **extra}
+            inner = ",".join(f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in sorted(labels.items()))
+            return "{" + inner + "}" if inner else ""
+        summary = self.summary()
+        families = collections.OrderedDict()
+        for name, value in sorted(summary["counters"].items()):
+            families[f"csvimport_{name}_total"] = ("counter", [f"csvimport_{name}_total{fmt_labels()} {value}"])
+        families["csvimport_stage_seconds"] = ("gauge", [f"csvimport_stage_seconds{fmt_labels(stage=stage)} {value}" for stage, value in sorted(summary["stage_seconds"].items())])
+        if summary["dedup_hit_rate"] is not None:
+            families["csvimport_dedup_hit_rate"] = ("gauge", [f"csvimport_dedup_hit_rate{fmt_labels()} {summary['dedup_hit_rate']}"])
+        for metric in ("rows_read", "bytes_read", "parse_seconds", "transform_seconds"):
+            values = [(path, v[metric]) for path, v in sorted(summary["files"].items()) if metric in v]
+            if values:
+                families[f"csvimport_file_{metric}"] = ("gauge", [f"csvimport_file_{metric}{fmt_labels(file=path)} {value}" for path, value in values])
+        return families
+
+    def to_prometheus(self) -> str:
+        return RunMetrics.format_prometheus([self])
+
+    @staticmethod
+    def format_prometheus(runs: Sequence["RunMetrics"]) -> str:
+        merged: "collections.OrderedDict[str, Tuple[str, List[str]]]" = collections.OrderedDict()
+        for run in runs:
+            for name, (kind, samples) in run.prometheus_families().items():
+                merged.setdefault(name, (kind, []))[1].extend(samples)
+        lines = []
+        for name, (kind, samples) in merged.items():
+            lines.append(f"# TYPE {name} {kind}")
+            lines += samples
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        write_atomic(path, self.to_prometheus() if path.endswith(".prom") else json.dumps(self.summary(), indent=2) + "\n")
+
+    @staticmethod
+    def write_all(path: str, runs: Sequence["RunMetrics"]) -> None:
+        # Several runs (--all-orgs) as {"runs": [...]} or one textfile with a sample per org label
+        if path.endswith(".prom"):
+            write_atomic(path, RunMetrics.format_prometheus(runs))
+        else:
+            write_atomic(path, json.dumps({"runs": [run.summary() for run in runs]}, indent=2) + "\n")
+
+def write_atomic(path: str, text: str) -> None:
+    # Write atomically so a textfile collector never sees a partial file
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(path + ".tmp", path)
+
+# --- Key normalizers ---
+# Per key column normalizers from the org config, e.g.
+#   key_normalizers:
+#     Amount: decimal
+#     Transaction Date: {date: "%m/%d/%Y"}
+#     Description: [strip, casefold]
+# so "-12.50" from a CSV matches -12.5 from the sheet and "10/01/2025" matches "10/1/2025".
+DECIMAL_JUNK = str.maketrans("", "", " $€£¥\u00a0")
+PLAIN_DECIMAL = re.compile(r"(-?)(\d+)(?:\.(\d*))?\Z")
+CANONICAL_DECIMAL = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d*[1-9])?\Z")
+
+def normalize_decimal(value, decimal_comma: bool = False) -> str:
+    # Canonical decimal text: "-12.50", "-12.5", "$-12.5" and -12.5 all become "-12.5".
+    # Plain numbers take a string-only fast path; the rest go through Decimal.
+    text = value.strip() if type(value) is str else str(value)
+    if type(value) is not str:
+        decimal_comma = False
+    elif not decimal_comma and CANONICAL_DECIMAL.match(text) is not None and text != "-0":
+        return text
+    match = PLAIN_DECIMAL.match(text) if not decimal_comma else None
+    negative = False
+    if match is None:
+        cleaned = text.translate(DECIMAL_JUNK)
+        negative = cleaned.startswith("(") and cleaned.endswith(")")
+        if negative:
+            cleaned = cleaned[1:-1]
+        cleaned = cleaned.replace(".", "").replace(",", ".") if decimal_comma else cleaned.replace(",", "")
+        match = PLAIN_DECIMAL.match(cleaned)
+        if match is None:
+            try:
+                number = decimal.Decimal(cleaned)
+            except decimal.InvalidOperation:
+                return text
+            if not number.is_finite():
+                return text
+            if number == 0:
+                return "0"
+            return format(-number.normalize() if negative else number.normalize(), "f")
+    sign, whole, fraction = match.groups()
+    whole = whole.lstrip("0") or "0"
+    fraction = (fraction or "").rstrip("0")
+    if whole == "0" and not fraction:
+        return "0"
+    if negative:
+        sign = "" if sign else "-"
+    return f"{sign}{whole}.{fraction}" if fraction else f"{sign}{whole}"
+
+NORMALIZER_CACHE_SIZE = 100000
+
+class NormalizerCache(dict):
+    # Bounded memo for one normalizer. Hits are a plain dict lookup through
+    # __getitem__; misses compute the value and keep it while there is room.
+    # text_only caches str values only, for normalizers that format 1 and 1.0
+    # differently (they compare and hash equal).
+    def __init__(self, func: Callable[[object], str], text_only: bool = False):
+        super().__init__()
+        self.func = func
+        self.text_only = text_only
+
+    def __missing__(self, value) -> str:
+        result = self.func(value)
+        if len(self) < NORMALIZER_CACHE_SIZE and (not self.text_only or type(value) is str):
+            self[value] = result
+        return result
+
+def memoize_normalizer(func: Callable[[object], str], text_only: bool = False) -> Callable[[object], str]:
+    # Dates, amounts and descriptions repeat a lot across a history, so results are cached (bounded)
+    return NormalizerCache(func, text_only).__getitem__
+
+# Largest Sheets serial day number that is a valid date (9999-12-31)
+SHEETS_SERIAL_MAX = 2958465
+
+def make_date_normalizer(formats: Sequence[str]) -> Callable[[object], str]:
+    # Dates to ISO 8601; sheet serial numbers are accepted too. Other numbers are
+    # dates get_all_records() numericised (e.g. 20251001 for "%Y%m%d") and are
+    # parsed as text.
+    def normalize(value) -> str:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            try:
+                if 1 <= value <= SHEETS_SERIAL_MAX:
+                    return datetime.date.fromordinal(int(value) + SHEETS_EPOCH).isoformat()
+                text = str(int(value)) if value == int(value) else str(value)
+            except (ValueError, OverflowError):
+                return str(value)
+        else:
+            text = str(value).strip()
+        for fmt in formats:
+            try:
+                return datetime.datetime.strptime(text, fmt).date().isoformat()
+            except ValueError:
+                continue
+        return text
+    return normalize
+
+def compile_normalizer(spec) -> Callable[[object], str]:
+    # The whole chain is memoized once, so a repeated value costs one dict lookup
+    steps = spec if isinstance(spec, list) else [spec]
+    funcs: List[Callable[[object], str]] = []
+    text_only = False
+    for step in steps:
+        name, arg = next(iter(step.items())) if isinstance(step, dict) and len(step) == 1 else (step, None)
+        if name == "strip":
+            funcs.append(lambda value: str(value).strip())
+            text_only = True
+        elif name == "casefold":
+            funcs.append(lambda value: str(value).casefold())
+            text_only = True
+        elif name == "decimal":
+            funcs.append(functools.partial(normalize_decimal, decimal_comma=arg == ","))
+        elif name == "date":
+            formats = [arg] if isinstance(arg, str) else list(arg or [])
+            funcs.append(make_date_normalizer(formats + ["%Y-%m-%d"]))
+        else:
+            raise ValueError(f"Unknown key normalizer: {step!r}")
+    if not funcs:
+        return str
+    if len(funcs) == 1:
+        return memoize_normalizer(funcs[0], text_only)
+    def chain(value) -> str:
+        for func in funcs:
+            value = func(value)
+        return value
+    return memoize_normalizer(chain, text_only)
+
+def compile_key_normalizers(key_columns: List[str], normalizers: Optional[Dict]) -> Optional[List[Optional[Callable[[object], str]]]]:
+    # One function per key column (None where none is configured), or None if no column has one
+    if not normalizers or not any(col in normalizers for col in key_columns):
+        return None
+    return [compile_normalizer(normalizers[col]) if col in normalizers else None for col in key_columns]
+
 # --- Duplicate removal logic ---
-def remove_duplicates(transformed_rows: List[Dict], existing_entries: List[Dict], key_columns: List[str], logger: logging.Logger) -> List[Dict]:
-    logger.debug(f"Deduplication: key_columns={key_columns}")
-    logger.debug(f"Input rows: {len(transformed_rows)}, Existing entries: {len(existing_entries)}")
-    # Log sample key tuples for inspection
-    for i, entry in enumerate(existing_entries[:5]):
-        key = tuple(str(entry.get(col, "")) for col in key_columns)
-        logger.debug(f"Sample existing key {i}: {key}")
-    for i, row in enumerate(transformed_rows[:5]):
-        key = tuple(str(row.get(col, "")) for col in key_columns)
-        logger.debug(f"Sample input key {i}: {key}")
-    existing_keys = set()
-    for entry in existing_entries:
-        key = tuple(str(entry.get(col, "")) for col in key_columns)
-        existing_keys.add(key)
-    result = []
-    for row in transformed_rows:
-        key = tuple(str(row.get(col, "")) for col in key_columns)
-        if key not in existing_keys:
-            result.append(row)
+def make_key_func(columns: Optional[List[str]], key_columns: List[str], normalizers: Optional[Dict] = None) -> Callable:
+    # Build a key extractor once: positional for output tuples, by name for dicts
+    funcs = compile_key_normalizers(key_columns, normalizers)
+    if columns is None:
+        if funcs is not None:
+            pairs = [(col, func or str) for col, func in zip(key_columns, funcs)]
+            return lambda row: tuple([func(row.get(col, "")) for col, func in pairs])
+        return lambda row: tuple(str(row.get(col, "")) for col in key_columns)
+    positions = [columns.index(col) if col in columns else None for col in key_columns]
+    if funcs is not None:
+        if None in positions:
+            pairs = list(zip(positions, funcs))
+            return lambda row: tuple([("" if pos is None else row[pos] if func is None else func(row[pos])) for pos, func in pairs])
+        # Output rows hold strings already: itemgetter picks the key columns and only
+        # the normalized ones are replaced, each by a (memoized) function call
+        normalized = [(i, func) for i, func in enumerate(funcs) if func is not None]
+        if len(positions) == 1:
+            pos, func = positions[0], funcs[0]
+            return lambda row: (func(row[pos]),)
+        get = operator.itemgetter(*positions)
+        if len(normalized) == 1:
+            (i, func), = normalized
+            def key_with_one(row) -> Tuple[str, ...]:
+                key = list(get(row))
+                key[i] = func(key[i])
+                return tuple(key)
+            return key_with_one
+        def key_with_many(row) -> Tuple[str, ...]:
+            key = list(get(row))
+            for i, func in normalized:
+                key[i] = func(key[i])
+            return tuple(key)
+        return key_with_many
+    if None not in positions:
+        if len(positions) == 1:
+            pos = positions[0]
+            return lambda row: (row[pos],)
+        return operator.itemgetter(*positions)
+    return lambda row: tuple(row[pos] if pos is not None else "" for pos in positions)
+
+def build_key_set(existing_entries: Iterable[Dict], key_columns: List[str], normalizers: Optional[Dict] = None) -> Set[Tuple[str, ...]]:
+    if normalizers:
+        key_func = make_key_func(None, key_columns, normalizers)
+        return {key_func(entry) for entry in existing_entries}
+    return {tuple(str(entry.get(col, "")) for col in key_columns) for entry in existing_entries}
+
+def batch_last_positions(rows: Iterable, key_func: Callable) -> Dict[bytes, int]:
+    # Pre-scan for last-wins batch dedup: position of the last occurrence of each key
+    return {key_digest(key_func(row)): i for i, row in enumerate(rows)}
+
+DUPLICATE_SAMPLE_SIZE = 10
+
+class DuplicateReport:
+    # Aggregates duplicate hits into a count plus a bounded sample of keys. Individual
+    # duplicates are only logged with log_each (INFO) or when the logger is at DEBUG, and
+    # always with %-style args so nothing is formatted unless a handler emits it.
+    def __init__(self, logger: logging.Logger, label: str, log_each: bool = False, sample_size: int = DUPLICATE_SAMPLE_SIZE):
+        self.logger = logger
+        self.label = label
+        self.count = 0
+        self.sample: List[Tuple[str, ...]] = []
+        self.sample_size = sample_size
+        is_enabled = getattr(logger, "isEnabledFor", None)
+        if log_each:
+            self._emit = logger.info
+        elif is_enabled is not None and is_enabled(logging.DEBUG):
+            self._emit = logger.debug
         else:
-            logger.info(f"Duplicate found and removed: {key}")
-    logger.info(f"Total duplicates removed: {len(transformed_rows) - len(result)}")
-    return result
+            self._emit = None
+
+    def add(self, key) -> None:
+        self.count += 1
+        if len(self.sample) < self.sample_size:
+            self.sample.append(key)
+        if self._emit is not None:
+            self._emit("%s: %s", self.label, key)
+
+    def log_summary(self, total_message: str) -> None:
+        self.logger.info(total_message, self.count)
+        if self.sample and self._emit is None:
+            self.logger.info("%s (first %d of %d): %s", self.label, len(self.sample), self.count, self.sample)
+
+def dedup_rows(rows: Iterable, existing_keys: Set[Tuple[str, ...]], key_func: Callable, logger: logging.Logger,
+               batch_policy: str = "off", last_positions: Optional[Dict[bytes, int]] = None, metrics: Optional[RunMetrics] = None,
+               log_each: bool = False) -> Iterator:
+    # batch_policy also drops duplicates within the incoming rows themselves:
+    #   "first" keeps the first occurrence, "last" keeps the last one (needs last_positions
+    #   from batch_last_positions over the same rows). Only a digest per unique key is kept.
+    if batch_policy not in ("off", "first", "last"):
+        raise ValueError(f"Unknown batch dedup policy: {batch_policy}")
+    if batch_policy == "last" and last_positions is None:
+        raise ValueError("batch_policy 'last' requires last_positions")
+    removed = DuplicateReport(logger, "Duplicate found and removed", log_each)
+    batch_removed = DuplicateReport(logger, "Duplicate within batch removed", log_each)
+    seen: Set[bytes] = set()
+    # Digest sets in verify mode only report candidate hits; those rows are held back
+    # and confirmed against the exact keys in one pass at the end (false positives are
+    # emitted last).
+    pending = [] if getattr(existing_keys, "verify", False) else None
+    i = -1
+    for i, row in enumerate(rows):
+        key = key_func(row)
+        if batch_policy != "off":
+            digest = key_digest(key)
+            if batch_policy == "first":
+                if digest in seen:
+                    batch_removed.add(key)
+                    continue
+                seen.add(digest)
+            elif last_positions.get(digest) != i:
+                batch_removed.add(key)
+                continue
+        if key in existing_keys:
+            if pending is not None:
+                pending.append((key, row))
+                continue
+            removed.add(key)
+            continue
+        yield row
+    if pending:
+        confirmed = existing_keys.confirm(key for key, _ in pending)
+        for key, row in pending:
+            if key in confirmed:
+                removed.add(key)
+            else:
+                logger.debug("Digest collision for %s; keeping row.", key)
+                yield row
+    if batch_policy != "off":
+        batch_removed.log_summary("Total duplicates removed within batch: %d")
+    removed.log_summary("Total duplicates removed: %d")
+    if metrics is not None:
+        metrics.incr("dedup_rows_checked", i + 1)
+        metrics.incr("dedup_existing_duplicates", removed.count)
+        metrics.incr("dedup_batch_duplicates", batch_removed.count)
+
+def remove_duplicates(transformed_rows: List[Dict], existing_entries: List[Dict], key_columns: List[str], logger: logging.Logger, normalizers: Optional[Dict] = None) -> List[Dict]:
+    key_func = make_key_func(None, key_columns, normalizers)
+    # Log sample key tuples for inspection (only built when DEBUG is actually enabled)
+    is_enabled = getattr(logger, "isEnabledFor", None)
+    if is_enabled is not None and is_enabled(logging.DEBUG):
+        logger.debug("Deduplication: key_columns=%s", key_columns)
+        logger.debug("Input rows: %d, Existing entries: %d", len(transformed_rows), len(existing_entries))
+        for i, entry in enumerate(existing_entries[:5]):
+            logger.debug("Sample existing key %d: %s", i, key_func(entry))
+        for i, row in enumerate(transformed_rows[:5]):
+            logger.debug("Sample input key %d: %s", i, key_func(row))
+    existing_keys = build_key_set(existing_entries, key_columns, normalizers)
+    return list(dedup_rows(transformed_rows, existing_keys, key_func, logger))
+
+# --- Compact dedup key storage ---
+def key_digest(key: Tuple[str, ...], size: int = 16) -> bytes:
+    return hashlib.blake2b("\x1f".join(key).encode("utf-8"), digest_size=size).digest()
+
+class DigestKeySet:
+    """
+    Memory-compact set of dedup keys. Each key is stored as a fixed-size 64 or
+    128-bit digest in a sorted array and looked up by binary search; an optional
+    Bloom filter answers most misses without touching the array.
+    With verify=True, hits are only candidates: confirm() re-reads the exact keys
+    from key_source (a callable returning a fresh iterable of key tuples).
+    """
+    def __init__(self, keys: Iterable[Tuple[str, ...]], bits: int = 64, bloom: bool = False, bloom_error_rate: float = 0.01,
+                 verify: bool = False, key_source: Optional[Callable[[], Iterable[Tuple[str, ...]]]] = None):
+        if bits not in (64, 128):
+            raise ValueError(f"Unsupported digest size: {bits} (use 64 or 128)")
+        if verify and key_source is None:
+            raise ValueError("verify=True requires a key_source to re-read exact keys from")
+        self.width = bits // 8
+        self.verify = verify
+        self._key_source = key_source
+        digests = sorted({self._digest(key) for key in keys})
+        self._count = len(digests)
+        if self.width == 8:
+            self._table = array.array("Q", digests)
+        else:
+            self._table = b"".join(d.to_bytes(self.width, "big") for d in digests)
+        self._added: Set[int] = set()
+        self._added_exact: Set[Tuple[str, ...]] = set()
+        self._bloom = None
+        if bloom:
+            n = max(self._count, 1)
+            self._bloom_bits = max(64, int(-n * math.log(bloom_error_rate) / (math.log(2) ** 2)))
+            self._bloom_hashes = max(1, round(self._bloom_bits / n * math.log(2)))
+            self._bloom = bytearray((self._bloom_bits + 7) // 8)
+            for d in digests:
+                self._bloom_add(d)
+        del digests
+
+    def _digest(self, key: Tuple[str, ...]) -> int:
+        return int.from_bytes(key_digest(key, self.width), "big")
+
+    def _bloom_positions(self, d: int) -> Iterator[int]:
+        # Kirsch-Mitzenmacher double hashing from the two halves of the digest
+        h1 = d & 0xFFFFFFFF
+        h2 = (d >> 32) | 1
+        for i in range(self._bloom_hashes):
+            yield (h1 + i * h2) % self._bloom_bits
+
+    def _bloom_add(self, d: int) -> None:
+        for pos in self._bloom_positions(d):
+            self._bloom[pos >> 3] |= 1 << (pos & 7)
+
+    def _bloom_check(self, d: int) -> bool:
+        bloom = self._bloom
+        return all(bloom[pos >> 3] & (1 << (pos & 7)) for pos in self._bloom_positions(d))
+
+    def _table_contains(self, d: int) -> bool:
+        if self.width == 8:
+            i = bisect.bisect_left(self._table, d)
+            return i < self._count and self._table[i] == d
+        target = d.to_bytes(self.width, "big")
+        table, width = self._table, self.width
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            cur = table[mid * width:(mid + 1) * width]
+            if cur < target:
+                lo = mid + 1
+            elif cur > target:
+                hi = mid
+            else:
+                return True
+        return False
+
+    def add(self, key: Tuple[str, ...]) -> None:
+        d = self._digest(key)
+        self._added.add(d)
+        if self.verify:
+            self._added_exact.add(key)
+        if self._bloom is not None:
+            self._bloom_add(d)
+
+    def __contains__(self, key: Tuple[str, ...]) -> bool:
+        d = self._digest(key)
+        if self._bloom is not None and not self._bloom_check(d):
+            return False
+        return d in self._added or self._table_contains(d)
+
+    def __len__(self) -> int:
+        return self._count + len(self._added)
+
+    def confirm(self, keys: Iterable[Tuple[str, ...]]) -> Set[Tuple[str, ...]]:
+        # One pass over the exact source, materialising only keys that share a digest with a candidate
+        candidates = set(keys)
+        if not self.verify:
+            return candidates
+        wanted = {self._digest(key) for key in candidates}
+        exact = {key for key in self._key_source() if self._digest(key) in wanted}
+        return candidates & (exact | self._added_exact)
+
+def iter_csv_entries(path: str) -> Iterator[Dict]:
+    with open_csv(path) as reader:
+        header = next(reader, None)
+        if header is None:
+            return
+        for row in reader:
+            if row:
+                yield dict(zip(header, row))
+
+def spool_keys(keys: Iterable[Tuple[str, ...]], directory: Optional[str] = None) -> str:
+    # Write exact dedup keys to a temporary CSV so verify mode can re-read them
+    # instead of keeping the fetched entries in memory
+    fd, path = tempfile.mkstemp(prefix="csvimport-keys-", suffix=".csv", dir=directory)
+    with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerows(keys)
+    return path
+
+def iter_spooled_keys(path: str) -> Iterator[Tuple[str, ...]]:
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.reader(f):
+            yield tuple(row)
+
+def build_existing_keys(entries, key_columns: List[str], compact_bits: Optional[int] = None, bloom: bool = False, verify: bool = False,
+                        normalizers: Optional[Dict] = None, exact_keys: Optional[Callable[[], Iterable[Tuple[str, ...]]]] = None):
+    # entries is either a re-iterable collection of dicts or a callable returning a fresh iterable.
+    # exact_keys, when given, is what verify mode re-reads instead of entries, so the
+    # result keeps no reference to them.
+    key_func = make_key_func(None, key_columns, normalizers)
+    def key_source() -> Iterator[Tuple[str, ...]]:
+        source = entries() if callable(entries) else entries
+        return (key_func(entry) for entry in source)
+    if compact_bits:
+        return DigestKeySet(key_source(), bits=compact_bits, bloom=bloom, verify=verify, key_source=(exact_keys or key_source) if verify else None)
+    return set(key_source())
+
+# --- Persistent dedup key index ---
+
+class KeyIndex:
+    """
+    On-disk (sqlite) set of dedup key digests for one org/worksheet.
+    The index remembers the signature of the source it was built from, so it is
+    only rebuilt when the source changes and otherwise updated incrementally.
+    """
+    def __init__(self, path: str, key_columns: List[str], normalizers: Optional[Dict] = None):
+        index_dir = os.path.dirname(path)
+        if index_dir:
+            os.makedirs(index_dir, exist_ok=True)
+        self.path = path
+        self.key_columns = list(key_columns)
+        # Keys built with other normalizers would not match, so they are part of freshness
+        self.normalizers = json.dumps({col: normalizers[col] for col in self.key_columns if col in normalizers}, sort_keys=True) if normalizers else "{}"
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS keys (digest BLOB PRIMARY KEY) WITHOUT ROWID")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self._conn.commit()
+
+    def _get_meta(self, name: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, name: str, value: str) -> None:
+        self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+    def is_fresh(self, signature: Optional[str]) -> bool:
+        # No signature (the source's modified time is unknown) is never fresh
+        return (signature is not None and self._get_meta("signature") == signature and self._get_meta("key_columns") == json.dumps(self.key_columns)
+                and (self._get_meta("key_normalizers") or "{}") == self.normalizers)
+
+    def rebuild(self, keys: Iterable[Tuple[str, ...]], signature: Optional[str]) -> int:
+        with self._conn:
+            self._conn.execute("DELETE FROM keys")
+            self._conn.executemany("INSERT OR IGNORE INTO keys (digest) VALUES (?)", ((key_digest(key),) for key in keys))
+            self._set_meta("key_columns", json.dumps(self.key_columns))
+            self._set_meta("key_normalizers", self.normalizers)
+            self._set_meta("signature", signature or "")
+        return self._conn.execute("SELECT COUNT(*) FROM keys").fetchone()[0]
+
+    def add(self, keys: Iterable[Tuple[str, ...]], signature: Optional[str] = None) -> None:
+        with self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO keys (digest) VALUES (?)", ((key_digest(key),) for key in keys))
+            if signature is not None:
+                self._set_meta("signature", signature)
+
+    def __contains__(self, key: Tuple[str, ...]) -> bool:
+        return self._conn.execute("SELECT 1 FROM keys WHERE digest = ?", (key_digest(key),)).fetchone() is not None
+
+    def close(self) -> None:
+        self._conn.close()
+
+def key_index_path(index_dir: str, org: Optional[str], source_name: str) -> str:
+    safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in f"{org or 'default'}_{source_name}")
+    return os.path.join(index_dir, f"{safe}.keys.sqlite")
+
+def file_signature(path: str) -> str:
+    st = os.stat(path)
+    return f"file:{st.st_size}:{st.st_mtime_ns}"
+
+def sheet_signature(worksheet) -> Optional[str]:
+    # Drive's modified time changes on any edit to the spreadsheet. Without it there is
+    # no cheap way to notice an edit to an arbitrary cell, so the result is None and
+    # the key index and snapshot are never treated as up to date.
+    get_last_update = getattr(worksheet.spreadsheet, "get_lastUpdateTime", None)
+    if callable(get_last_update):
+        try:
+            return f"sheet:{worksheet.id}:{get_last_update()}"
+        except Exception:
+            pass
+    return None
 
 # --- Google Sheets integration ---
-def fetch_sheet_entries(sheet_id: str, worksheet_name: str, creds_path: str, logger: logging.Logger) -> List[Dict]:
-    if not gspread or not Credentials:
-        logger.error("gspread or google-auth not installed. Cannot fetch Google Sheets entries.")
-        raise ImportError("gspread and google-auth must be installed for Google Sheets integration.")
-    scopes = ["https://www.googleapis.com/auth/spreadsheets.readonly"]
-    try:
-        creds = Credentials.from_service_account_file(creds_path, scopes=scopes)
-    except Exception as e:
-        logger.error(f"Failed to load Google credentials file '{creds_path}': {e}")
-        raise
-    try:
-        client = gspread.authorize(creds)
-    except Exception as e:
-        logger.error(f"Failed to authorize Google Sheets client: {e}")
-        raise
-    try:
-        sheet = client.open_by_key(sheet_id)
-    except Exception as e:
-        logger.error(f"Failed to open Google Sheet with ID '{sheet_id}': {e}")
-        raise
-    try:
-        worksheet = sheet.worksheet(worksheet_name)
-    except Exception as e:
-        logger.error(f"Failed to open worksheet '{worksheet_name}' in Google Sheet: {e}")
-        raise
+SHEETS_SCOPES = [
+    'https://www.googleapis.com/auth/spreadsheets',
+    'https://www.googleapis.com/auth/drive'
+]
+
+class SheetsSession:
+    """
+    One authenticated Google Sheets client shared by the read and write paths.
+    Credentials are loaded and authorized once (google-auth caches and refreshes
+    the token), and spreadsheet/worksheet handles are cached by ID and name.
+    """
+    def __init__(self, creds_path: str, logger: logging.Logger, scopes: Optional[List[str]] = None):
+        self.creds_path = creds_path
+        self.logger = logger
+        self.scopes = scopes or SHEETS_SCOPES
+        self._client = None
+        self._spreadsheets: Dict[str, object] = {}
+        self._worksheets: Dict[Tuple[str, str], object] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                if not gspread or not Credentials:
+                    self.logger.error("gspread or google-auth not installed. Cannot fetch Google Sheets entries.")
+                    raise ImportError("gspread and google-auth must be installed for Google Sheets integration.")
+                try:
+                    creds = Credentials.from_service_account_file(self.creds_path, scopes=self.scopes)
+                except Exception as e:
+                    self.logger.error(f"Failed to load Google credentials file '{self.creds_path}': {e}")
+                    raise
+                try:
+                    self._client = gspread.authorize(creds)
+                except Exception as e:
+                    self.logger.error(f"Failed to authorize Google Sheets client: {e}")
+                    raise
+            return self._client
+
+    def spreadsheet(self, sheet_id: str):
+        client = self.client
+        with self._lock:
+            if sheet_id not in self._spreadsheets:
+                try:
+                    self._spreadsheets[sheet_id] = client.open_by_key(sheet_id)
+                except Exception as e:
+                    self.logger.error(f"Failed to open Google Sheet with ID '{sheet_id}': {e}")
+                    raise
+            return self._spreadsheets[sheet_id]
+
+    def worksheet(self, sheet_id: str, worksheet_name: str):
+        sheet = self.spreadsheet(sheet_id)
+        with self._lock:
+            if (sheet_id, worksheet_name) not in self._worksheets:
+                try:
+                    self._worksheets[(sheet_id, worksheet_name)] = sheet.worksheet(worksheet_name)
+                except Exception as e:
+                    self.logger.error(f"Failed to open worksheet '{worksheet_name}' in Google Sheet: {e}")
+                    raise
+            return self._worksheets[(sheet_id, worksheet_name)]
+
+def backup_sheet_rows(worksheet_name: str, header: List[str], rows: List, logger: logging.Logger, suffix: str = "") -> Optional[str]:
+    backup_dir = os.path.join(os.getcwd(), "backups")
+    os.makedirs(backup_dir, exist_ok=True)
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    backup_path = os.path.join(backup_dir, f"{worksheet_name}_backup_{timestamp}{suffix}.csv")
+    if not rows:
+        logger.info(f"No rows to backup from Google Sheet '{worksheet_name}'")
+        return None
+    with open(backup_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow([row.get(col, "") for col in header] if isinstance(row, dict) else row)
+    logger.info(f"Google Sheet backed up to: {backup_path}")
+    return backup_path
+
+def fetch_sheet_entries(sheet_id: str, worksheet_name: str, creds_path: str, logger: logging.Logger, session: Optional[SheetsSession] = None, cache_dir: Optional[str] = None, backup_store: Optional["BackupStore"] = None,
+                        refresh: bool = False) -> List[Dict]:
+    if session is None:
+        session = SheetsSession(creds_path, logger)
+    worksheet = session.worksheet(sheet_id, worksheet_name)
+    if cache_dir:
+        try:
+            values, status, new_rows = fetch_sheet_values(worksheet, snapshot_path(cache_dir, sheet_id, worksheet_name), logger, refresh=refresh)
+        except Exception as e:
+            logger.error(f"Failed to fetch records from worksheet '{worksheet_name}': {e}")
+            raise
+        rows = values_to_records(values)
+        logger.info(f"Loaded {len(rows)} entries from Google Sheet '{worksheet_name}' (ID: {sheet_id}); snapshot {status}")
+        backup_sheet_values(worksheet_name, values, status, new_rows, logger, backup_store)
+        return rows
     try:
         rows = worksheet.get_all_records()
     except Exception as e:
@@ -118,114 +885,777 @@ def fetch_sheet_entries(sheet_id: str, worksheet_name: str, creds_path: str, log
         raise
     logger.info(f"Fetched {len(rows)} entries from Google Sheet '{worksheet_name}' (ID: {sheet_id})")
     # Always backup Google Sheet before update
-    import csv, os, datetime
-    backup_dir = os.path.join(os.getcwd(), "backups")
-    os.makedirs(backup_dir, exist_ok=True)
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_path = os.path.join(backup_dir, f"{worksheet_name}_backup_{timestamp}.csv")
-    if rows:
-        with open(backup_path, "w", encoding="utf-8", newline="") as f:
-            writer = csv.DictWriter(f, fieldnames=rows[0].keys())
-            writer.writeheader()
-            for row in rows:
-                writer.writerow(row)
-        logger.info(f"Google Sheet backed up to: {backup_path}")
+    header = list(rows[0].keys()) if rows else []
+    if backup_store is not None:
+        backup_store.save_async(worksheet_name, header, [[row.get(col, "") for col in header] for row in rows])
     else:
-        logger.info(f"No rows to backup from Google Sheet '{worksheet_name}'")
+        backup_sheet_rows(worksheet_name, header, rows, logger)
     return rows
 
+def backup_sheet_values(worksheet_name: str, values: List[List[str]], status: str, new_rows: List[List[str]], logger: logging.Logger, backup_store: Optional["BackupStore"] = None) -> None:
+    # Backups are incremental: nothing when unchanged, only the new rows for a delta
+    if status == "unchanged":
+        logger.info(f"Google Sheet '{worksheet_name}' unchanged since last backup; skipping backup")
+    elif not values:
+        logger.info(f"No rows to backup from Google Sheet '{worksheet_name}'")
+    elif backup_store is not None:
+        backup_store.save_async(worksheet_name, values[0], values[1:])
+    elif status == "delta":
+        backup_sheet_rows(worksheet_name, values[0], new_rows, logger, suffix="_delta")
+    else:
+        backup_sheet_rows(worksheet_name, values[0], values[1:], logger)
+
+def backup_sheet(sheet_id: str, worksheet_name: str, creds_path: str, logger: logging.Logger, session: Optional[SheetsSession] = None, cache_dir: Optional[str] = None, backup_store: Optional["BackupStore"] = None,
+                 refresh: bool = False) -> None:
+    # Back up the worksheet before an update when its entries are not needed for dedup
+    # (the key index is up to date). With a snapshot cache only new rows are fetched.
+    if session is None:
+        session = SheetsSession(creds_path, logger)
+    worksheet = session.worksheet(sheet_id, worksheet_name)
+    try:
+        if cache_dir:
+            values, status, new_rows = fetch_sheet_values(worksheet, snapshot_path(cache_dir, sheet_id, worksheet_name), logger, refresh=refresh)
+        else:
+            values = worksheet.get_all_values()
+            status, new_rows = "full", values[1:]
+    except Exception as e:
+        logger.error(f"Failed to fetch values from worksheet '{worksheet_name}' for backup: {e}")
+        raise
+    backup_sheet_values(worksheet_name, values, status, new_rows, logger, backup_store)
+
+# --- Backup store ---
+class BackupStore:
+    """
+    Content-addressed, compressed store for Google Sheet backups.
+    Rows are split into content-defined chunks (a chunk ends where a row hash hits the
+    boundary pattern), so rows added or edited in one place only change nearby chunks.
+    Each chunk is stored once under objects/<sha256>.csv.zst (or .csv.gz without
+    zstandard); each backup is a small manifest listing its header and chunk hashes.
+    """
+    CHUNK_AVG_ROWS = 256
+    CHUNK_MIN_ROWS = 32
+    CHUNK_MAX_ROWS = 4096
+
+    def __init__(self, root: str, logger: logging.Logger, metrics: Optional[RunMetrics] = None):
+        self.root = root
+        self.logger = logger
+        self.metrics = metrics
+        self.objects_dir = os.path.join(root, "objects")
+        self.manifests_dir = os.path.join(root, "manifests")
+        self._threads: List[threading.Thread] = []
+        self._errors: List[Exception] = []
+
+    def _chunks(self, rows: Iterable[List]) -> Iterator[List[List[str]]]:
+        chunk = []
+        for row in rows:
+            row = ["" if value is None else str(value) for value in row]
+            chunk.append(row)
+            boundary = int.from_bytes(key_digest(tuple(row), 8), "big") % self.CHUNK_AVG_ROWS == 0
+            if (boundary and len(chunk) >= self.CHUNK_MIN_ROWS) or len(chunk) >= self.CHUNK_MAX_ROWS:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _write_object(self, chunk: List[List[str]]) -> Tuple[str, bool]:
+        buf = io.StringIO()
+        csv.writer(buf).writerows(chunk)
+        data = buf.getvalue().encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        for ext in (".csv.zst", ".csv.gz"):
+            if os.path.exists(os.path.join(self.objects_dir, digest + ext)):
+                return digest, False
+        if zstandard is not None:
+            path, payload = os.path.join(self.objects_dir, digest + ".csv.zst"), zstandard.ZstdCompressor().compress(data)
+        else:
+            path, payload = os.path.join(self.objects_dir, digest + ".csv.gz"), gzip.compress(data)
+        with open(path + ".tmp", "wb") as f:
+            f.write(payload)
+        os.replace(path + ".tmp", path)
+        return digest, True
+
+    def _read_object(self, digest: str) -> List[List[str]]:
+        zst_path = os.path.join(self.objects_dir, digest + ".csv.zst")
+        if os.path.exists(zst_path):
+            if zstandard is None:
+                raise ImportError("zstandard must be installed to restore zstd-compressed backup chunks.")
+            with open(zst_path, "rb") as f:
+                data = zstandard.ZstdDecompressor().decompress(f.read())
+        else:
+            with open(os.path.join(self.objects_dir, digest + ".csv.gz"), "rb") as f:
+                data = gzip.decompress(f.read())
+        return list(csv.reader(io.StringIO(data.decode("utf-8"), newline="")))
+
+    def save(self, worksheet_name: str, header: List[str], rows: Iterable[List]) -> str:
+        start = time.perf_counter()
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.manifests_dir, exist_ok=True)
+        chunks, written, row_count = [], 0, 0
+        for chunk in self._chunks(rows):
+            digest, is_new = self._write_object(chunk)
+            chunks.append(digest)
+            written += is_new
+            row_count += len(chunk)
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        manifest_path = os.path.join(self.manifests_dir, f"{worksheet_name}_backup_{timestamp}.json")
+        suffix = 1
+        while os.path.exists(manifest_path):
+            manifest_path = os.path.join(self.manifests_dir, f"{worksheet_name}_backup_{timestamp}_{suffix}.json")
+            suffix += 1
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump({"worksheet": worksheet_name, "timestamp": timestamp, "header": header, "rows": row_count, "chunks": chunks}, f, indent=2)
+        self.logger.info(f"Google Sheet backed up to: {manifest_path} ({row_count} rows, {written} of {len(chunks)} chunks new)")
+        if self.metrics is not None:
+            self.metrics.add_time("backup", time.perf_counter() - start)
+            self.metrics.incr("backup_chunks_written", written)
+            self.metrics.incr("backup_chunks_reused", len(chunks) - written)
+        return manifest_path
+
+    def save_async(self, worksheet_name: str, header: List[str], rows: List[List]) -> None:
+        # Backups run off the import's critical path; wait() joins them before exit
+        def run():
+            try:
+                self.save(worksheet_name, header, rows)
+            except Exception as e:
+                self.logger.error(f"Failed to back up Google Sheet '{worksheet_name}': {e}")
+                self._errors.append(e)
+        thread = threading.Thread(target=run, name=f"backup-{worksheet_name}", daemon=False)
+        thread.start()
+        self._threads.append(thread)
+
+    def wait(self) -> bool:
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        return not self._errors
+
+    def list_manifests(self, worksheet_name: Optional[str] = None) -> List[str]:
+        if not os.path.isdir(self.manifests_dir):
+            return []
+        names = sorted(n[:-len(".json")] for n in os.listdir(self.manifests_dir) if n.endswith(".json"))
+        return [n for n in names if worksheet_name is None or n.startswith(f"{worksheet_name}_backup_")]
+
+    def restore(self, name: str, output_path: str) -> int:
+        # name is a manifest path or a backup name as printed by list_manifests()
+        manifest_path = name if os.path.exists(name) else os.path.join(self.manifests_dir, os.path.basename(name).rsplit(".json", 1)[0] + ".json")
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        count = 0
+        with open(output_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(manifest["header"])
+            for digest in manifest["chunks"]:
+                chunk = self._read_object(digest)
+                writer.writerows(chunk)
+                count += len(chunk)
+        return count
+
+# --- Sheet snapshot cache ---
+# Rows used to confirm that the cached snapshot still lines up with the sheet
+SNAPSHOT_OVERLAP = 5
+
+def snapshot_path(cache_dir: str, sheet_id: str, worksheet_name: str) -> str:
+    safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in f"{sheet_id}_{worksheet_name}")
+    return os.path.join(cache_dir, f"{safe}.snapshot.csv")
+
+def load_snapshot(path: str) -> Tuple[Optional[Dict], List[List[str]]]:
+    meta_path = path + ".meta.json"
+    if not (os.path.exists(path) and os.path.exists(meta_path)):
+        return None, []
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        values = list(csv.reader(f))
+    if len(values) != meta.get("rows"):
+        return None, []
+    return meta, values
+
+def save_snapshot(path: str, signature: Optional[str], values: List[List[str]]) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerows(values)
+    os.replace(path + ".tmp", path)
+    with open(path + ".meta.json", "w", encoding="utf-8") as f:
+        json.dump({"signature": signature, "rows": len(values)}, f)
+
+def pad_rows(rows: List[List[str]], width: int) -> List[List[str]]:
+    return [(list(row) + [""] * (width - len(row)))[:width] for row in rows]
+
+def values_to_records(values: List[List[str]]) -> List[Dict]:
+    # Same shape as worksheet.get_all_records(): header row as keys, numbers numericised
+    if not values:
+        return []
+    header, body = values[0], values[1:]
+    if gspread is not None:
+        body = [gspread.utils.numericise_all(row) for row in body]
+    return [dict(zip(header, row)) for row in body]
+
+def fetch_sheet_values(worksheet, path: str, logger: logging.Logger, refresh: bool = False) -> Tuple[List[List[str]], str, List[List[str]]]:
+    """
+    Return (values, status, new_rows) for the worksheet, using the local snapshot when possible.
+    status is "unchanged" (signature matches, nothing fetched), "delta" (only rows added at
+    the top were fetched and verified against the cached head and tail), or "full".
+    refresh=True ignores the snapshot and always fetches the whole sheet.
+    """
+    signature = sheet_signature(worksheet)
+    meta, cached = load_snapshot(path) if not refresh else (None, [])
+    if meta and signature is not None and meta.get("signature") == signature:
+        return cached, "unchanged", []
+    if meta and len(cached) > 1:
+        header, body = cached[0], cached[1:]
+        width = len(header)
+        total = len(worksheet.col_values(1))
+        delta = total - len(cached)
+        # The sheet changed: without added rows the change is an edit somewhere we
+        # cannot locate from samples, so only a delta is worth verifying
+        if delta > 0:
+            overlap = body[:SNAPSHOT_OVERLAP]
+            head_end = 1 + delta + len(overlap)
+            top = pad_rows(worksheet.get_values(f"1:{head_end}"), width)
+            matches = top[:1] == [header] and top[1 + delta:] == overlap
+            # Every row past the head up to SNAPSHOT_OVERLAP rows is compared as the tail
+            tail_start = max(total - SNAPSHOT_OVERLAP + 1, head_end + 1)
+            if matches and tail_start <= total:
+                matches = pad_rows(worksheet.get_values(f"{tail_start}:{total}"), width) == body[-(total - tail_start + 1):]
+            if matches:
+                new_rows = top[1:1 + delta]
+                values = [header] + new_rows + body
+                save_snapshot(path, signature, values)
+                logger.debug(f"Snapshot delta: fetched {delta} new rows, {len(body)} rows from cache")
+                return values, "delta", new_rows
+        logger.debug("Snapshot no longer lines up with the sheet; fetching all values")
+    values = worksheet.get_all_values()
+    if values:
+        values = [values[0]] + pad_rows(values[1:], len(values[0]))
+    save_snapshot(path, signature, values)
+    return values, "full", values[1:]
+
+# --- Google Sheets writes ---
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+def api_error_status(exc: Exception) -> Optional[int]:
+    # gspread.exceptions.APIError carries the HTTP response; other errors have no status
+    code = getattr(exc, "code", None)
+    if isinstance(code, int):
+        return code
+    return getattr(getattr(exc, "response", None), "status_code", None)
+
+def call_with_backoff(func: Callable, *args, logger: Optional[logging.Logger] = None, retries: int = 5, base_delay: float = 1.0, metrics: Optional[RunMetrics] = None,
+                      applied: Optional[Callable[[], bool]] = None, **kwargs):
+    # Retry quota (429) and transient server errors with exponential backoff and jitter,
+    # honouring Retry-After when the API sends one.
+    # Writes that are not idempotent pass applied(): a 5xx can arrive after the server
+    # made the change, so it is only retried once applied() shows it was not made.
+    for attempt in range(retries + 1):
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            status = api_error_status(e)
+            if status not in RETRYABLE_STATUS or attempt == retries:
+                raise
+            if status != 429 and applied is not None and applied():
+                if logger:
+                    logger.warning(f"Google Sheets API returned {status} but the write was applied; not retrying")
+                return None
+            retry_after = getattr(getattr(e, "response", None), "headers", {}).get("Retry-After")
+            try:
+                delay = float(retry_after)
+            except (TypeError, ValueError):
+                delay = base_delay * (2 ** attempt) + random.uniform(0, base_delay)
+            if metrics is not None:
+                metrics.incr("sheet_api_retries")
+            if logger:
+                logger.warning(f"Google Sheets API returned {status}; retrying in {delay:.1f}s (attempt {attempt + 1}/{retries})")
+            time.sleep(delay)
+
+SORT_DATE_FORMATS = ("%m/%d/%Y", "%Y-%m-%d", "%m/%d/%y", "%Y/%m/%d")
+SHEETS_EPOCH = datetime.date(1899, 12, 30).toordinal()
+SORTED_MERGE_MAX_RANGES = 20
+
+def sheet_sort_value(value, date_formats: Sequence[str] = SORT_DATE_FORMATS) -> Optional[float]:
+    # Column A as the sheet sorts it: numbers as is, dates as serial day numbers.
+    # None for anything else (text, blanks), which the caller treats as "cannot merge".
+    if isinstance(value, (int, float)):
+        return float(value)
+    value = str(value).strip()
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    for fmt in date_formats:
+        try:
+            return float(datetime.datetime.strptime(value, fmt).toordinal() - SHEETS_EPOCH)
+        except ValueError:
+            continue
+    return None
+
+def plan_sorted_inserts(existing_desc: List[float], rows: List[List], values: List[float]) -> List[Tuple[int, List[List]]]:
+    """
+    Merge rows into a column sorted descending without re-sorting the sheet. existing_desc
+    holds the negated sort values of the data rows in sheet order (so it is ascending) and
+    is updated in place. Returns (data row index, rows) inserts, bottom-up so earlier
+    inserts do not shift later ones. Ties go after the existing rows and keep input order,
+    as an append followed by a stable sort would.
+    """
+    order = sorted(range(len(rows)), key=lambda i: -values[i])
+    groups: List[Tuple[int, List[List], List[float]]] = []
+    for i in order:
+        position = bisect.bisect_right(existing_desc, -values[i])
+        if groups and groups[-1][0] == position:
+            groups[-1][1].append(rows[i])
+            groups[-1][2].append(-values[i])
+        else:
+            groups.append((position, [rows[i]], [-values[i]]))
+    for position, _, negated in reversed(groups):
+        existing_desc[position:position] = negated
+    return [(position, group_rows) for position, group_rows, _ in reversed(groups)]
+
+def write_sheet_rows(worksheet, rows: List[List[str]], logger: logging.Logger, mode: str = "append", chunk_size: int = 500, metrics: Optional[RunMetrics] = None,
+                     done_chunks: Optional[Set[int]] = None, on_chunk: Optional[Callable[[int], None]] = None,
+                     existing_column: Optional[List] = None, date_formats: Sequence[str] = SORT_DATE_FORMATS,
+                     done_rows: Optional[Dict[int, Set[int]]] = None, on_rows: Optional[Callable[[int, List[int]], None]] = None) -> int:
+    # Write rows in chunks so no single request hits the API size limit:
+    #   "append" appends chunks after the last row and sorts once at the end
+    #   "insert" inserts at the top (row 2), last chunk first so the input order is kept
+    #   "sorted-merge" inserts each chunk's rows where they belong by column A, so the
+    #   sheet stays sorted without a sort request. The column is taken from
+    #   existing_column (data rows, already fetched for dedup) or read with one request.
+    #   Falls back to append + sort if column A is not sorted or not all dates/numbers,
+    #   or if the rows would scatter over more than SORTED_MERGE_MAX_RANGES places.
+    # Chunks in done_chunks were committed by an earlier attempt and are skipped;
+    # on_chunk(index) is called after each chunk is written (see RunJournal).
+    # A sorted merge writes a chunk in several inserts, so each insert is committed on
+    # its own with on_rows(index, offsets in the chunk); done_rows holds those offsets
+    # for partly written chunks, and only the remaining rows are written on resume.
+    chunks = [rows[i:i + chunk_size] for i in range(0, len(rows), chunk_size)]
+    done_chunks = done_chunks or set()
+    done_rows = done_rows or {}
+    merge_column = None
+    # Row count (column A) before the next write, so a write that failed with a 5xx can be
+    # checked before it is retried (see call_with_backoff)
+    row_count = None
+    if mode == "sorted-merge" and chunks:
+        if existing_column is None:
+            column = call_with_backoff(worksheet.col_values, 1, logger=logger, metrics=metrics)
+            existing_column, row_count = column[1:], len(column)
+        merge_column, reason = sorted_merge_column(existing_column, [row[0] if row else "" for row in rows], date_formats)
+        if merge_column is None:
+            logger.info(f"Sorted merge not possible for Google Sheet '{worksheet.title}' ({reason}); appending and sorting instead.")
+            mode = "append"
+    if mode in ("append", "sorted-merge"):
+        order = range(len(chunks))
+    elif mode == "insert":
+        order = range(len(chunks) - 1, -1, -1)
+    else:
+        raise ValueError(f"Unknown sheet write mode: {mode}")
+    written = 0
+    requests = 0
+    def sheet_row_count() -> int:
+        return len(call_with_backoff(worksheet.col_values, 1, logger=logger, metrics=metrics))
+    for index in order:
+        if index in done_chunks:
+            continue
+        done = done_rows.get(index, set())
+        pending = [offset for offset in range(len(chunks[index])) if offset not in done]
+        chunk = [chunks[index][offset] for offset in pending]
+        if row_count is None:
+            row_count = sheet_row_count()
+        if mode == "append":
+            call_with_backoff(worksheet.append_rows, chunk, value_input_option='USER_ENTERED', insert_data_option='INSERT_ROWS', logger=logger, metrics=metrics,
+                              applied=lambda: sheet_row_count() >= row_count + len(chunk))
+            row_count += len(chunk)
+            logger.debug(f"Appended {len(chunk)} rows to Google Sheet '{worksheet.title}'.")
+            requests += 1
+        elif mode == "insert":
+            call_with_backoff(worksheet.insert_rows, chunk, row=2, value_input_option='USER_ENTERED', logger=logger, metrics=metrics,
+                              applied=lambda: sheet_row_count() >= row_count + len(chunk))
+            row_count += len(chunk)
+            logger.debug(f"Inserted {len(chunk)} rows at top of Google Sheet '{worksheet.title}'.")
+            requests += 1
+        else:
+            values = [sheet_sort_value(row[0], date_formats) for row in chunk]
+            for position, offsets in plan_sorted_inserts(merge_column, pending, values):
+                group = [chunks[index][offset] for offset in offsets]
+                call_with_backoff(worksheet.insert_rows, group, row=position + 2, value_input_option='USER_ENTERED', logger=logger, metrics=metrics,
+                                  applied=lambda: sheet_row_count() >= row_count + len(group))
+                row_count += len(group)
+                logger.debug(f"Inserted {len(group)} rows at row {position + 2} of Google Sheet '{worksheet.title}'.")
+                requests += 1
+                if on_rows is not None:
+                    on_rows(index, offsets)
+        written += len(chunk)
+        if on_chunk is not None:
+            on_chunk(index)
+    if mode != "sorted-merge":
+        # Reverse sort by column A (descending), once per run
+        call_with_backoff(worksheet.sort, (1, 'des'), logger=logger, metrics=metrics)
+        requests += 1
+    if metrics is not None:
+        metrics.incr("sheet_rows_written", written)
+        metrics.incr("sheet_write_requests", requests)
+    return len(chunks)
+
+def sorted_merge_column(existing_column: List, new_column: List, date_formats: Sequence[str] = SORT_DATE_FORMATS) -> Tuple[Optional[List[float]], str]:
+    # Negated sort values of the existing data rows (ascending when the sheet is sorted
+    # descending), or (None, reason) when a sorted merge would not match the sheet's sort
+    existing = [sheet_sort_value(value, date_formats) for value in existing_column]
+    new = [sheet_sort_value(value, date_formats) for value in new_column]
+    if None in existing or None in new:
+        return None, "column A has values that are not dates or numbers"
+    negated = [-value for value in existing]
+    if any(a > b for a, b in zip(negated, negated[1:])):
+        return None, "column A is not sorted descending"
+    positions = {bisect.bisect_right(negated, -value) for value in new}
+    if len(positions) > SORTED_MERGE_MAX_RANGES:
+        return None, f"new rows would go to {len(positions)} places"
+    return negated, ""
+
+# --- Import checkpoints ---
+class RunJournal:
+    """
+    Checkpoint for one organization's Google Sheet write. Before the first write the
+    deduplicated rows are spooled to disk next to a journal recording the input files,
+    write mode, chunk size and the chunks committed so far. If the write fails, a rerun
+    with the same inputs resumes from the spool: no re-read, re-fetch or re-dedup, and
+    committed chunks are not inserted again. Both files are removed once the write
+    (including the final sort) succeeds.
+    """
+    def __init__(self, directory: str, org: Optional[str], sheet_id: str, sheet_name: str, input_files: List[str], logger: logging.Logger):
+        safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in f"{org or 'default'}_{sheet_name}")
+        self.path = os.path.join(directory, f"{safe}.journal.json")
+        self.spool_path = os.path.join(directory, f"{safe}.spool.csv.gz")
+        self.logger = logger
+        self.signature = {
+            "org": org,
+            "sheet_id": sheet_id,
+            "sheet_name": sheet_name,
+            "inputs": [[path, file_signature(path)] for path in input_files],
+        }
+        self.state: Optional[Dict] = None
+
+    def resume(self) -> bool:
+        # Load a journal left by a failed run with the same inputs and target
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable import journal {self.path}: {e}")
+            self.discard()
+            return False
+        if state.get("signature") != self.signature or not os.path.exists(self.spool_path):
+            self.logger.warning(f"Discarding import journal {self.path}: inputs or target changed since it was written.")
+            self.discard()
+            return False
+        self.state = state
+        return True
+
+    @property
+    def committed(self) -> Set[int]:
+        return set(self.state["committed_chunks"]) if self.state else set()
+
+    def start(self, rows: List[List], mode: str, chunk_size: int) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with gzip.open(self.spool_path + ".tmp", "wt", encoding="utf-8", newline="") as f:
+            csv.writer(f).writerows(rows)
+        os.replace(self.spool_path + ".tmp", self.spool_path)
+        self.state = {"signature": self.signature, "rows": len(rows), "mode": mode, "chunk_size": chunk_size, "committed_chunks": []}
+        self._save()
+
+    def rows(self) -> List[List[str]]:
+        with gzip.open(self.spool_path, "rt", encoding="utf-8", newline="") as f:
+            rows = [row for row in csv.reader(f)]
+        if len(rows) != self.state["rows"]:
+            raise ValueError(f"Import spool {self.spool_path} has {len(rows)} rows, journal expects {self.state['rows']}")
+        return rows
+
+    @property
+    def committed_rows(self) -> Dict[int, Set[int]]:
+        # Rows of partly written chunks (sorted merge writes a chunk in several inserts)
+        partial = self.state.get("committed_rows", {}) if self.state else {}
+        return {int(index): set(offsets) for index, offsets in partial.items()}
+
+    def commit_rows(self, chunk_index: int, offsets: List[int]) -> None:
+        self.state.setdefault("committed_rows", {}).setdefault(str(chunk_index), []).extend(offsets)
+        self._save()
+
+    def commit(self, chunk_index: int) -> None:
+        self.state["committed_chunks"].append(chunk_index)
+        self.state.get("committed_rows", {}).pop(str(chunk_index), None)
+        self._save()
+
+    def finish(self) -> None:
+        self.discard()
+        self.state = None
+
+    def discard(self) -> None:
+        for path in (self.path, self.spool_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _save(self) -> None:
+        write_atomic(self.path, json.dumps(self.state))
+
 # --- CSV transformation ---
-def transform_csv(input_path: str, output_path: str, input_format: List[str], output_format: List[str], existing_entries: Optional[List[Dict]] = None, key_columns: Optional[List[str]] = None, logger: Optional[logging.Logger] = None):
-    with open(input_path, "r", encoding="utf-8-sig") as infile:
-        reader = csv.DictReader(infile)
-        transformed_rows = []
-        for row in reader:
-            # Special transform rules for excepted org: split Amount into Debit/Credit
-            if (
-                'Debit' in output_format and 'Credit' in output_format and 'Amount' in input_format and 'Credit Debit Indicator' in input_format
-            ):
-                debit = row['Amount'] if row.get('Credit Debit Indicator') == 'Debit' else ''
-                credit = row['Amount'] if row.get('Credit Debit Indicator') == 'Credit' else ''
-                new_row = {}
-                for col in output_format:
-                    if col == 'Debit':
-                        new_row['Debit'] = debit
-                    elif col == 'Credit':
-                        new_row['Credit'] = credit
-                    elif col == 'Posting Date':
-                        # Use Posting Date from input
-                        new_row['Posting Date'] = row.get('Posting Date', '')
-                    else:
-                        new_row[col] = row.get(col, '')
+# A transform plan is a list of (kind, args) column specs, one per output column:
+#   ("copy", source_col)                        copy a column by name
+#   ("split", amount_col, indicator_col, value) amount_col when indicator_col == value, else ''
+#   ("value", constant)                         fixed value
+# Org config may declare rules per output column under `transform_rules`, e.g.
+#   transform_rules:
+#     Debit: {split: Amount, indicator: Credit Debit Indicator, when: Debit}
+#     Posting Date: {copy: Booking Date}
+def compile_transform(input_format: List[str], output_format: List[str], rules: Optional[Dict] = None) -> List[Tuple]:
+    rules = dict(rules or {})
+    # Special transform rules for excepted org: split Amount into Debit/Credit
+    if (
+        'Debit' in output_format and 'Credit' in output_format and 'Amount' in input_format and 'Credit Debit Indicator' in input_format
+    ):
+        rules.setdefault('Debit', {'split': 'Amount', 'indicator': 'Credit Debit Indicator', 'when': 'Debit'})
+        rules.setdefault('Credit', {'split': 'Amount', 'indicator': 'Credit Debit Indicator', 'when': 'Credit'})
+    plan = []
+    for col in output_format:
+        rule = rules.get(col)
+        if rule is None:
+            plan.append(("copy", col))
+        elif 'split' in rule:
+            plan.append(("split", rule['split'], rule.get('indicator', 'Credit Debit Indicator'), rule.get('when', col)))
+        elif 'copy' in rule:
+            plan.append(("copy", rule['copy']))
+        elif 'value' in rule:
+            plan.append(("value", str(rule['value'])))
+        else:
+            raise ValueError(f"Unsupported transform rule for column '{col}': {rule}")
+    return plan
+
+def bind_transform(plan: List[Tuple], header: List[str]) -> Callable[[List[str]], Tuple[str, ...]]:
+    # Resolve column names to positions in this file's header once, so each row is a tuple lookup
+    positions = {name: i for i, name in enumerate(header)}
+    width = len(header)
+    if all(kind == "copy" and spec[0] in positions for kind, *spec in plan):
+        indices = [positions[spec[0]] for _, *spec in plan]
+        getter = operator.itemgetter(*indices) if len(indices) > 1 else (lambda row, i=indices[0]: (row[i],))
+
+        def apply_copy(row: List[str]) -> Tuple[str, ...]:
+            if len(row) < width:
+                row = row + [''] * (width - len(row))
+            return getter(row)
+        return apply_copy
+    getters = []
+    for kind, *spec in plan:
+        if kind == "copy" and spec[0] in positions:
+            getters.append(operator.itemgetter(positions[spec[0]]))
+        elif kind == "split" and spec[0] in positions and spec[1] in positions:
+            amount_pos, indicator_pos, when = positions[spec[0]], positions[spec[1]], spec[2]
+            getters.append(lambda row, a=amount_pos, i=indicator_pos, w=when: row[a] if row[i] == w else '')
+        elif kind == "value":
+            getters.append(lambda row, v=spec[0]: v)
+        else:
+            getters.append(lambda row: '')
+
+    def apply(row: List[str]) -> Tuple[str, ...]:
+        if len(row) < width:
+            row = row + [''] * (width - len(row))
+        return tuple([get(row) for get in getters])
+    return apply
+
+# --- Columnar engine ---
+# Rows per block for the columnar engine. Blocks are transposed with zip(); small
+# blocks keep the column tuples in CPU cache, which matters more than per-block overhead
+COLUMNAR_BLOCK_ROWS = 1024
+
+def transform_block(plan: List[Tuple], header: List[str], block: List[List[str]]) -> List[Sequence[str]]:
+    # Apply the plan to a block of rows column-wise and return the output columns.
+    # The transpose (zip), copies (shared column tuples) and constants run at C speed;
+    # only the Debit/Credit split touches each value from Python, in one comprehension.
+    width = len(header)
+    positions = {name: i for i, name in enumerate(header)}
+    n = len(block)
+    if min(map(len, block)) < width:
+        block = [row if len(row) >= width else row + [''] * (width - len(row)) for row in block]
+    columns = list(zip(*block))
+    out = []
+    for kind, *spec in plan:
+        if kind == "copy" and spec[0] in positions:
+            out.append(columns[positions[spec[0]]])
+        elif kind == "split" and spec[0] in positions and spec[1] in positions:
+            amount, indicator, when = columns[positions[spec[0]]], columns[positions[spec[1]]], spec[2]
+            out.append([a if i == when else '' for a, i in zip(amount, indicator)])
+        elif kind == "value":
+            out.append((spec[0],) * n)
+        else:
+            out.append(('',) * n)
+    return out
+
+# Rows per block for the row engine; parse and transform are timed per block, not per row
+ROW_BLOCK_ROWS = 1024
+
+def read_rows(input_files: List[str], plan: List[Tuple], logger: Optional[logging.Logger] = None, workers: int = 1, engine: str = "row", metrics: Optional[RunMetrics] = None,
+              encoding: Optional[str] = None, delimiter: Optional[str] = None) -> Iterator[Tuple[str, ...]]:
+    # Stream output-format tuples from every input file in order, one row at a time.
+    # encoding/delimiter are sniffed per file (see open_csv) unless given.
+    if engine not in ("row", "columnar"):
+        raise ValueError(f"Unknown transform engine: {engine}")
+    if workers > 1 and len(input_files) > 1:
+        yield from read_rows_parallel(input_files, plan, logger, workers, engine, metrics, encoding, delimiter)
+        return
+    for input_path in input_files:
+        stats = {"rows": 0, "parse_seconds": 0.0, "transform_seconds": 0.0}
+        # "-" reads standard input (csvtransform pipelines)
+        source = sys.stdin.buffer if input_path == "-" else input_path
+        with open_csv(source, encoding, delimiter, logger) as reader:
+            yield from transform_reader(reader, plan, engine, stats)
+        count = stats["rows"]
+        if metrics is not None:
+            bytes_read = os.path.getsize(input_path) if input_path != "-" else 0
+            metrics.add_file(input_path, rows_read=count, bytes_read=bytes_read, parse_seconds=stats["parse_seconds"], transform_seconds=stats["transform_seconds"])
+            metrics.incr("rows_read", count)
+            metrics.add_time("parse", stats["parse_seconds"])
+            metrics.add_time("transform", stats["transform_seconds"])
+        if logger:
+            logger.info(f"Read {count} rows from {input_path}")
+
+def transform_reader(reader: Iterator[List[str]], plan: List[Tuple], engine: str = "row", stats: Optional[Dict[str, float]] = None) -> Iterator[Tuple[str, ...]]:
+    # Transform the rows of a csv.reader (first row is the header) block by block.
+    # stats, if given, accumulates rows / parse_seconds / transform_seconds.
+    perf_counter = time.perf_counter
+    header = next(reader, None)
+    if header is None:
+        return
+    apply = bind_transform(plan, header) if engine == "row" else None
+    block_rows = COLUMNAR_BLOCK_ROWS if engine == "columnar" else ROW_BLOCK_ROWS
+    count = 0
+    parse_seconds = transform_seconds = 0.0
+    try:
+        while True:
+            start = perf_counter()
+            block = list(itertools.islice(reader, block_rows))
+            parsed = perf_counter()
+            parse_seconds += parsed - start
+            if not block:
+                break
+            count += len(block)
+            if apply is None:
+                out = list(zip(*transform_block(plan, header, block)))
             else:
-                new_row = {col: row.get(col, "") for col in output_format}
-            transformed_rows.append(new_row)
+                out = [apply(row) for row in block]
+            transform_seconds += perf_counter() - parsed
+            yield from out
+    finally:
+        if stats is not None:
+            stats["rows"] += count
+            stats["parse_seconds"] += parse_seconds
+            stats["transform_seconds"] += transform_seconds
+
+def read_file_rows(input_path: str, plan: List[Tuple], engine: str = "row", encoding: Optional[str] = None, delimiter: Optional[str] = None) -> List[Tuple[str, ...]]:
+    # Worker entry point: parse and transform one whole file
+    return list(read_rows([input_path], plan, engine=engine, encoding=encoding, delimiter=delimiter))
+
+def read_rows_parallel(input_files: List[str], plan: List[Tuple], logger: Optional[logging.Logger], workers: int, engine: str = "row", metrics: Optional[RunMetrics] = None,
+                       encoding: Optional[str] = None, delimiter: Optional[str] = None) -> Iterator[Tuple[str, ...]]:
+    # Parse files in a process pool but yield them in input order. At most 2 * workers
+    # files are in flight, so finished-but-unconsumed results stay bounded.
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        files = iter(input_files)
+        pending = collections.deque((path, pool.submit(read_file_rows, path, plan, engine, encoding, delimiter)) for path in itertools.islice(files, workers * 2))
+        while pending:
+            input_path, future = pending.popleft()
+            start = time.perf_counter()
+            rows = future.result()
+            next_path = next(files, None)
+            if next_path is not None:
+                pending.append((next_path, pool.submit(read_file_rows, next_path, plan, engine, encoding, delimiter)))
+            if metrics is not None:
+                # Worker-side parse/transform time is not visible here; record the wait instead
+                metrics.add_file(input_path, rows_read=len(rows), bytes_read=os.path.getsize(input_path))
+                metrics.incr("rows_read", len(rows))
+                metrics.add_time("parallel_read_wait", time.perf_counter() - start)
+            if logger:
+                logger.info(f"Read {len(rows)} rows from {input_path}")
+            yield from rows
+
+def transform_csv(input_path: str, output_path: str, input_format: List[str], output_format: List[str], existing_entries: Optional[List[Dict]] = None, key_columns: Optional[List[str]] = None, logger: Optional[logging.Logger] = None, rules: Optional[Dict] = None):
+    plan = compile_transform(input_format, output_format, rules)
+    transformed_rows = [dict(zip(output_format, row)) for row in read_rows([input_path], plan, logger or logging.getLogger("csvimport"))]
     # Remove duplicates if existing_entries and key_columns are provided
     if existing_entries and key_columns and logger:
         transformed_rows = remove_duplicates(transformed_rows, existing_entries, key_columns, logger)
     return transformed_rows
 
 # --- Logging setup ---
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    # The queue never leaves this process, so records are handed over as-is and the
+    # message is formatted by the listener thread instead of the caller.
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+def stop_logging(logger: logging.Logger) -> None:
+    # Drains queued records and closes the background writer's handlers.
+    listener = getattr(logger, "queue_listener", None)
+    if listener is None:
+        return
+    logger.queue_listener = None
+    listener.stop()
+    for h in listener.handlers:
+        h.close()
+
 def setup_logging(debug: bool, log_file: str = "csvimport.log") -> logging.Logger:
     logger = logging.getLogger("csvimport")
     logger.setLevel(logging.DEBUG if debug else logging.INFO)
     logger.debug_mode = debug
+    stop_logging(logger)
     for h in list(logger.handlers):
         logger.removeHandler(h)
-    import os
     formatter = logging.Formatter("%(asctime)s %(levelname)s: %(message)s")
     # Ensure parent directory exists for log file
     log_dir = os.path.dirname(log_file)
     if log_dir and not os.path.exists(log_dir):
         os.makedirs(log_dir, exist_ok=True)
+    handlers = []
     fh = logging.FileHandler(log_file)
     fh.setLevel(logging.DEBUG)
     fh.setFormatter(formatter)
-    logger.addHandler(fh)
+    handlers.append(fh)
     if debug:
         ch = logging.StreamHandler(sys.stdout)
         ch.setLevel(logging.DEBUG)
         ch.setFormatter(formatter)
-        logger.addHandler(ch)
+        handlers.append(ch)
+    # File and console writes happen on a background listener thread so logging never
+    # blocks row processing; the listener is drained at interpreter exit.
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(DeferredQueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    logger.queue_listener = listener
+    atexit.register(stop_logging, logger)
     return logger
 
 # --- Main CLI ---
-def main():
-    parser = argparse.ArgumentParser(description="Import and transform CSV files for multiple organizations.")
-    parser.add_argument("--input-files", required=True, help="Comma-separated list of input CSV files")
-    parser.add_argument("--output", required=False, help="Optional path to output CSV file (for debug/troubleshooting)")
-    parser.add_argument("--input-format", help="Input format (comma-separated or YAML/JSON list)")
-    parser.add_argument("--output-format", help="Output format (comma-separated or YAML/JSON list)")
-    parser.add_argument("--config", help="Optional config file for organization formats (default: confs/csvimport.conf)")
-    parser.add_argument("--org", help="Organization name for config lookup")
-    parser.add_argument("--debug", action="store_true", help="Enable debug logging to STDOUT")
-    parser.add_argument("--log-file", default="logs/csvimport.log", help="Log file path (default: logs/csvimport.log)")
-    parser.add_argument("--existing-csv", help="Path to CSV file with existing entries for duplicate removal")
-    parser.add_argument("--existing-sheet-id", help="Google Sheet ID for existing entries (for duplicate removal)")
-    parser.add_argument("--existing-sheet-name", help="Worksheet name in Google Sheet for existing entries (deprecated, use --sheet-name)")
-    parser.add_argument("--sheet-name", help="Worksheet name to use for Google Sheet operations (overrides config)")
-    parser.add_argument("--google-creds", help="Path to Google service account credentials JSON file")
-    parser.add_argument("--key-columns", help="Comma-separated list of columns to use for duplicate detection")
-    args = parser.parse_args()
+class ImportFailed(Exception):
+    """Raised by run_import with the process exit code for the failure."""
+    def __init__(self, message: str, exit_code: int, hints: Sequence[str] = ()):
+        super().__init__(message)
+        self.exit_code = exit_code
+        self.hints = list(hints)
 
-    logger = setup_logging(args.debug, args.log_file)
-    input_files = [f.strip() for f in args.input_files.split(",")]
-    logger.info(f"Starting csvimport for input files: {input_files}, output: {args.output}")
+class OrgLogger(logging.LoggerAdapter):
+    # Prefixes records with the organization when several imports share the log
+    def process(self, msg, kwargs):
+        return f"[{self.extra['org']}] {msg}", kwargs
 
-    # Default config path if not specified
-    config_path = args.config if args.config else "confs/csvimport.conf"
-    config = load_config(config_path)
-    input_format = get_format(config, args.org, "input_format", parse_format(args.input_format))
-    output_format = get_format(config, args.org, "output_format", parse_format(args.output_format))
+def get_param(cli_val, config_dict, config_key, env_var):
+    if cli_val:
+        return cli_val
+    if config_dict and config_key in config_dict:
+        return config_dict[config_key]
+    return os.environ.get(env_var)
 
+def resolve_sheet_params(args, config: Dict) -> Tuple[Optional[str], Optional[str], Optional[str]]:
     # --- Google integration: get creds, sheet id, sheet name from CLI, config, or env ---
-    def get_param(cli_val, config_dict, config_key, env_var):
-        if cli_val:
-            return cli_val
-        if config_dict and config_key in config_dict:
-            return config_dict[config_key]
-        return os.environ.get(env_var)
-
     # Config structure example:
     # google:
     #   creds: /path/to/creds.json
@@ -237,15 +1667,39 @@ def main():
     org_config = config.get('organizations', {}).get(args.org, {}) if config and args.org else {}
     sheet_name = args.sheet_name or org_config.get('sheet_name') or get_param(args.existing_sheet_name, google_config, 'sheet_name', 'GOOGLE_SHEET_NAME')
     creds_path = get_param(args.google_creds, google_config, 'creds', 'GOOGLE_CREDS')
+    return sheet_id, sheet_name, creds_path
+
+def spool_stdin(directory: Optional[str] = None) -> str:
+    # Copy standard input to a temporary file, for reads that need the input more than
+    # once (last-wins pre-scan) or from other processes (--workers)
+    fd, path = tempfile.mkstemp(prefix="csvimport-stdin-", suffix=".csv", dir=directory)
+    with os.fdopen(fd, "wb") as f:
+        shutil.copyfileobj(sys.stdin.buffer, f, READ_BUFFER_BYTES)
+    return path
+
+def run_import(args, config: Dict, logger: logging.Logger, metrics: RunMetrics, session: Optional[SheetsSession] = None) -> None:
+    # One organization's import: read -> transform -> dedup -> write. Failures raise
+    # ImportFailed with the exit code; the caller owns logging setup, metrics output
+    # and (when importing several organizations) the shared Sheets session.
+    # Files and indexes opened along the way are released through one ExitStack.
+    with contextlib.ExitStack() as resources:
+        import_pipeline(args, config, logger, metrics, session, resources)
+
+def import_pipeline(args, config: Dict, logger: logging.Logger, metrics: RunMetrics, session: Optional[SheetsSession], resources: contextlib.ExitStack) -> None:
+    backup_store = BackupStore(os.path.join(args.backup_dir, "store"), logger, metrics) if args.backup_mode == "store" else None
+    input_files = [f.strip() for f in args.input_files.split(",")]
+    logger.info(f"Starting csvimport for input files: {input_files}, output: {args.output}")
+
+    input_format = get_format(config, args.org, "input_format", parse_format(args.input_format))
+    output_format = get_format(config, args.org, "output_format", parse_format(args.output_format))
+    sheet_id, sheet_name, creds_path = resolve_sheet_params(args, config)
 
     if not input_format or not output_format:
-        logger.error("Input and output formats must be specified via CLI or config.")
-        print("Error: Input and output formats must be specified via CLI or config.", file=sys.stderr)
-        sys.exit(2)
+        raise ImportFailed("Input and output formats must be specified via CLI or config.", 2)
 
     if input_format != output_format:
         logger.info(f"Transforming CSV with input format: {input_format} and output format: {output_format}")
-    existing_entries = None
+    existing_keys = None
     key_columns = None
     org_config = config.get('organizations', {}).get(args.org, {}) if config and args.org else {}
     if args.key_columns:
@@ -253,96 +1707,390 @@ def main():
     elif org_config.get('key_fields'):
         key_columns = [str(col).strip() for col in org_config['key_fields']]
         logger.info(f"Using key_fields from config for organization '{args.org}': {key_columns}")
+    key_normalizers = org_config.get('key_normalizers')
+    batch_policy = args.batch_dedup or org_config.get('batch_dedup', 'first')
+    reads_stdin = "-" in input_files
+    if reads_stdin and (args.workers > 1 or (key_columns and batch_policy == "last")):
+        # stdin can be read only once and only by this process; spool it to a file
+        stdin_spool = spool_stdin()
+        resources.callback(os.remove, stdin_spool)
+        input_files = [stdin_spool if path == "-" else path for path in input_files]
+        logger.info(f"Spooled standard input to {stdin_spool}")
+    if key_columns and key_normalizers:
+        try:
+            compile_key_normalizers(key_columns, key_normalizers)
+        except (ValueError, AttributeError, TypeError) as e:
+            raise ImportFailed(f"Invalid key_normalizers for organization '{args.org}': {e}", 2)
+    # One authenticated Sheets client for both the dedup fetch and the write
+    if session is None and sheet_id and sheet_name and creds_path:
+        session = SheetsSession(creds_path, logger)
+    sheet_cache_dir = args.sheet_cache_dir if args.sheet_cache or org_config.get('sheet_cache') else None
+    # A Google Sheet write left unfinished by an earlier run is resumed from its journal,
+    # skipping the fetch, read and dedup stages below
+    journal = None
+    if reads_stdin and sheet_id and sheet_name and creds_path and not args.no_checkpoint:
+        logger.info("Input is read from standard input; the Google Sheet write is not checkpointed.")
+    elif sheet_id and sheet_name and creds_path and not args.no_checkpoint:
+        journal = RunJournal(args.checkpoint_dir, args.org, sheet_id, sheet_name, input_files, logger)
+        if journal.resume():
+            logger.info(f"Resuming import from {journal.path}: {len(journal.committed)} chunks of {journal.state['rows']} rows already committed.")
+            metrics.incr("resumed_chunks", len(journal.committed))
+    resuming = journal is not None and journal.state is not None
+    write_mode = args.write_mode or org_config.get('write_mode', 'append')
+    # Column A of the fetched sheet, so a sorted merge does not have to read it again
+    existing_column = None
     # Support duplicate removal from CSV or Google Sheet
-    if key_columns:
+    key_index = None
+    use_key_index = args.key_index or bool(org_config.get('key_index'))
+    key_store_options = {
+        "compact_bits": args.compact_keys or org_config.get('compact_keys'),
+        "bloom": args.bloom_filter or bool(org_config.get('bloom_filter')),
+        "verify": args.verify_keys or bool(org_config.get('verify_keys')),
+    }
+    if key_columns and not resuming:
         if args.existing_csv:
-            with open(args.existing_csv, "r", encoding="utf-8-sig") as f:
-                reader = csv.DictReader(f)
-                existing_entries = [row for row in reader]
-            logger.info(f"Loaded {len(existing_entries)} existing entries from CSV for duplicate removal.")
+            if use_key_index:
+                key_index = KeyIndex(key_index_path(args.key_index_dir, args.org, os.path.basename(args.existing_csv)), key_columns, key_normalizers)
+                resources.callback(key_index.close)
+                signature = file_signature(args.existing_csv)
+                if key_index.is_fresh(signature):
+                    logger.info(f"Key index {key_index.path} is up to date; skipping reload of {args.existing_csv}.")
+                else:
+                    count = key_index.rebuild(build_key_set(iter_csv_entries(args.existing_csv), key_columns, key_normalizers), signature)
+                    logger.info(f"Rebuilt key index {key_index.path} with {count} keys from {args.existing_csv}.")
+                existing_keys = key_index
+            else:
+                existing_keys = build_existing_keys(lambda: iter_csv_entries(args.existing_csv), key_columns, normalizers=key_normalizers, **key_store_options)
+                logger.info(f"Loaded {len(existing_keys)} existing keys from CSV for duplicate removal.")
         elif sheet_id and sheet_name and creds_path:
             try:
-                existing_entries = fetch_sheet_entries(sheet_id, sheet_name, creds_path, logger)
+                with metrics.timer("sheet_fetch"):
+                    if use_key_index:
+                        key_index = KeyIndex(key_index_path(args.key_index_dir, args.org, sheet_name), key_columns, key_normalizers)
+                        resources.callback(key_index.close)
+                        signature = sheet_signature(session.worksheet(sheet_id, sheet_name))
+                        if key_index.is_fresh(signature):
+                            logger.info(f"Key index {key_index.path} is up to date; skipping fetch of Google Sheet '{sheet_name}' entries.")
+                            # Always backup Google Sheet before update
+                            backup_sheet(sheet_id, sheet_name, creds_path, logger, session=session, cache_dir=sheet_cache_dir, backup_store=backup_store, refresh=args.sheet_cache_refresh)
+                        else:
+                            entries = fetch_sheet_entries(sheet_id, sheet_name, creds_path, logger, session=session, cache_dir=sheet_cache_dir, backup_store=backup_store, refresh=args.sheet_cache_refresh)
+                            if write_mode == "sorted-merge":
+                                existing_column = [next(iter(entry.values()), "") for entry in entries]
+                            count = key_index.rebuild(build_key_set(entries, key_columns, key_normalizers), signature)
+                            entries = None
+                            logger.info(f"Rebuilt key index {key_index.path} with {count} keys from Google Sheet '{sheet_name}'.")
+                        existing_keys = key_index
+                    else:
+                        entries = fetch_sheet_entries(sheet_id, sheet_name, creds_path, logger, session=session, cache_dir=sheet_cache_dir, backup_store=backup_store, refresh=args.sheet_cache_refresh)
+                        if write_mode == "sorted-merge":
+                            existing_column = [next(iter(entry.values()), "") for entry in entries]
+                        exact_keys = None
+                        if key_store_options["compact_bits"] and key_store_options["verify"]:
+                            # Verify mode confirms hits against the exact keys; re-read them from disk
+                            # so the fetched entries can be released
+                            key_file = spool_keys(map(make_key_func(None, key_columns, key_normalizers), entries))
+                            resources.callback(os.remove, key_file)
+                            exact_keys = lambda: iter_spooled_keys(key_file)
+                        existing_keys = build_existing_keys(entries, key_columns, normalizers=key_normalizers, exact_keys=exact_keys, **key_store_options)
+                        # Only the keys are needed from here on; do not hold the sheet's records for the rest of the run
+                        entries = None
             except Exception as e:
-                logger.error(f"Failed to fetch Google Sheet entries: {e}")
-                print(f"Error: Failed to fetch Google Sheet entries: {e}", file=sys.stderr)
-                print("Troubleshooting tips:", file=sys.stderr)
-                print("- Check that your credentials file is a valid Google service account JSON.", file=sys.stderr)
-                print("- Ensure the file path, sheet ID, and worksheet name are correct.", file=sys.stderr)
-                print("- Make sure the service account has access to the target sheet.", file=sys.stderr)
-                sys.exit(3)
-        else:
+                raise ImportFailed(f"Failed to fetch Google Sheet entries: {e}", 3, [
+                    "Troubleshooting tips:",
+                    "- Check that your credentials file is a valid Google service account JSON.",
+                    "- Ensure the file path, sheet ID, and worksheet name are correct.",
+                    "- Make sure the service account has access to the target sheet.",
+                ])
+        elif not resuming:
             logger.info("No existing entries source provided for duplicate removal.")
+    # Build the streaming pipeline: read -> transform -> dedup -> write.
+    # Rows flow through one at a time, so memory stays bounded regardless of input size.
+    # The column mapping is compiled once into a plan and applied to csv.reader tuples.
+    plan = compile_transform(input_format, output_format, org_config.get('transform_rules'))
+    read_options = {
+        "encoding": args.input_encoding or org_config.get('input_encoding'),
+        "delimiter": args.input_delimiter or org_config.get('input_delimiter'),
+    }
+    rows = read_rows(input_files, plan, logger, workers=args.workers, engine=args.engine, metrics=metrics, **read_options)
     # Always deduplicate, even if formats are the same
-    # Transform and deduplicate rows
-    if input_format == output_format:
-        rows = []
-        for input_path in input_files:
-            with open(input_path, "r", encoding="utf-8-sig") as infile:
-                reader = csv.DictReader(infile)
-                rows.extend([row for row in reader])
-        if existing_entries and key_columns:
-            deduped_rows = remove_duplicates(rows, existing_entries, key_columns, logger)
-        else:
-            deduped_rows = rows
-    else:
-        # For transformation, merge all input files before processing
-        all_rows = []
-        for input_path in input_files:
-            with open(input_path, "r", encoding="utf-8-sig") as infile:
-                reader = csv.DictReader(infile)
-                all_rows.extend([row for row in reader])
-        # Write merged rows to a temp file for transform_csv
-        import tempfile
-        with tempfile.NamedTemporaryFile(mode="w+", delete=False, newline="", encoding="utf-8") as temp_in:
-            writer = csv.DictWriter(temp_in, fieldnames=input_format)
-            writer.writeheader()
-            for row in all_rows:
-                writer.writerow(row)
-            temp_in_path = temp_in.name
-        deduped_rows = transform_csv(temp_in_path, args.output, input_format, output_format, existing_entries, key_columns, logger)
+    key_func = make_key_func(output_format, key_columns, key_normalizers) if key_columns else None
+    if key_columns and not resuming and (existing_keys is not None or batch_policy != "off"):
+        logger.debug(f"Deduplication: key_columns={key_columns}, batch policy: {batch_policy}")
+        last_positions = None
+        if batch_policy == "last":
+            # Last-wins needs to know where each key occurs last, so pre-scan the inputs once
+            last_positions = batch_last_positions(read_rows(input_files, plan, workers=args.workers, engine=args.engine, **read_options), key_func)
+        rows = dedup_rows(rows, existing_keys if existing_keys is not None else set(), key_func, logger, batch_policy, last_positions, metrics,
+                          log_each=args.log_duplicates == "each")
+    # Per-row pipeline timing costs a little, so only pay for it when metrics are requested
+    deduped_rows = metrics.timed(rows, "pipeline") if args.metrics_file else rows
 
     # Google Sheets integration: append deduplicated data and sort
     if sheet_name and sheet_id and creds_path:
+        # Support extra columns from org config
+        extra_columns = list(org_config.get('extra_columns', []))
+        chunk_size = args.write_chunk_size
+        if resuming:
+            # Same rows, mode and chunking as the interrupted run so committed chunks line up
+            rows_to_insert = journal.rows()
+            write_mode, chunk_size = journal.state["mode"], journal.state["chunk_size"]
+        else:
+            rows_to_insert = [list(row) + extra_columns for row in deduped_rows]
+            if journal is not None and rows_to_insert:
+                journal.start(rows_to_insert, write_mode, chunk_size)
         try:
-            import gspread
-            from google.oauth2.service_account import Credentials
-            creds = Credentials.from_service_account_file(creds_path, scopes=[
-                'https://www.googleapis.com/auth/spreadsheets',
-                'https://www.googleapis.com/auth/drive'
-            ])
-            gc = gspread.authorize(creds)
-            sh = gc.open_by_key(sheet_id)
-            worksheet = sh.worksheet(sheet_name)
-            # Support extra columns from org config
-            extra_columns = org_config.get('extra_columns', [])
-            rows_to_insert = []
-            for row in deduped_rows:
-                base_row = [row.get(col, '') for col in output_format]
-                full_row = base_row + list(extra_columns)
-                rows_to_insert.append(full_row)
+            worksheet = session.worksheet(sheet_id, sheet_name)
+            with metrics.timer("sheet_write"):
+                chunk_count = write_sheet_rows(worksheet, rows_to_insert, logger, mode=write_mode, chunk_size=chunk_size, metrics=metrics,
+                                               done_chunks=journal.committed if journal is not None else None,
+                                               on_chunk=journal.commit if journal is not None and journal.state is not None else None,
+                                               existing_column=existing_column, date_formats=org_config.get('date_formats') or SORT_DATE_FORMATS,
+                                               done_rows=journal.committed_rows if journal is not None else None,
+                                               on_rows=journal.commit_rows if journal is not None and journal.state is not None else None)
             if rows_to_insert:
-                worksheet.insert_rows(rows_to_insert, row=2, value_input_option='USER_ENTERED')
-                logger.info(f"Deduplicated data inserted at top of Google Sheet '{sheet_name}'. ({len(rows_to_insert)} rows)")
+                logger.info(f"Deduplicated data written to Google Sheet '{sheet_name}' ({write_mode} mode). ({len(rows_to_insert)} rows in {chunk_count} chunks)")
             else:
                 logger.info(f"No new rows to insert into Google Sheet '{sheet_name}'.")
-            # Reverse sort by column A (descending)
-            worksheet.sort((1, 'des'))
-            logger.info(f"Sheet '{sheet_name}' sorted by column A descending.")
+            if write_mode != "sorted-merge":
+                logger.info(f"Sheet '{sheet_name}' sorted by column A descending.")
+            # Record our own write so the next run does not treat it as an external change
+            if key_index is not None and not args.existing_csv:
+                key_index.add((key_func(row) for row in rows_to_insert), sheet_signature(worksheet))
+            if journal is not None:
+                journal.finish()
             print(f"Deduplicated data appended and sorted in Google Sheet '{sheet_name}'.")
         except Exception as e:
-            logger.error(f"Failed to append/sort data in Google Sheet: {e}")
-            print(f"Error: Failed to append/sort data in Google Sheet: {e}", file=sys.stderr)
-            sys.exit(4)
+            hints = []
+            if journal is not None and journal.state is not None:
+                hints.append(f"{len(journal.committed)} of {math.ceil(len(rows_to_insert) / chunk_size)} chunks were committed; rerun the same command to resume from {journal.path}.")
+            raise ImportFailed(f"Failed to append/sort data in Google Sheet: {e}", 4, hints)
     elif getattr(args, 'output', None):
         # Fallback: Write deduplicated data to output CSV only if --output is provided
-        with open(args.output, "w", encoding="utf-8", newline="") as outfile:
-            writer = csv.DictWriter(outfile, fieldnames=output_format)
-            writer.writeheader()
-            for row in deduped_rows:
-                writer.writerow(row)
+        with metrics.timer("output_total"), open(args.output, "w", encoding="utf-8", newline="") as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(output_format)
+            # zip stops before advancing the counter once the rows run out
+            written = itertools.count()
+            writer.writerows(row for row, _ in zip(deduped_rows, written))
+        metrics.incr("output_rows_written", next(written))
         logger.info(f"Deduplicated data written to {args.output}.")
         print(f"Deduplicated data written to {args.output}.")
+    # Backups are written in the background; make sure they finished before returning
+    backups_ok = backup_store is None or backup_store.wait()
+    if args.metrics_file:
+        # Derive exclusive stage times from the inclusive pipeline/output timers
+        stages = metrics.stages
+        if "pipeline" in stages:
+            metrics.add_time("dedup", max(stages["pipeline"] - stages.get("parse", 0.0) - stages.get("transform", 0.0), 0.0))
+            if "output_total" in stages:
+                metrics.add_time("csv_write", max(stages["output_total"] - stages["pipeline"], 0.0))
+    if not backups_ok:
+        raise ImportFailed("Google Sheet backup failed; see log for details.", 5)
+
+# --- Multi-organization runs ---
+JOB_FIELDS = ("org", "input_files", "output", "sheet_name", "existing_csv", "input_format", "output_format", "key_columns")
+
+def load_jobs(config: Dict, manifest_path: Optional[str] = None) -> List[Dict]:
+    # --all-orgs builds one job per organization from its input_files (and optional output)
+    # in the config; a job manifest lists jobs explicitly:
+    #   jobs:
+    #     - org: orgname1
+    #       input_files: [a.csv, b.csv]
+    #       output: out.csv
+    if manifest_path:
+        manifest = load_config(manifest_path) or {}
+        jobs = manifest.get("jobs", []) if isinstance(manifest, dict) else manifest
+    else:
+        jobs = [{"org": org, **{k: v for k, v in (org_config or {}).items() if k in ("input_files", "output")}}
+                for org, org_config in (config.get("organizations") or {}).items()]
+    result = []
+    outputs: Dict[str, str] = {}
+    for job in jobs:
+        unknown = set(job) - set(JOB_FIELDS)
+        if not job.get("org") or unknown:
+            raise ValueError(f"Invalid job {job}: needs 'org' and only {', '.join(JOB_FIELDS)}")
+        job = dict(job)
+        for key in ("input_files", "input_format", "output_format", "key_columns"):
+            if isinstance(job.get(key), (list, tuple)):
+                job[key] = ",".join(str(v) for v in job[key])
+        if job.get("output"):
+            # Jobs run concurrently, so a shared output file would silently keep only one of them
+            output = os.path.abspath(job["output"])
+            if output in outputs:
+                raise ValueError(f"Jobs '{outputs[output]}' and '{job['org']}' both write {job['output']}")
+            outputs[output] = job["org"]
+        result.append(job)
+    return result
+
+def import_report(org: Optional[str], metrics: RunMetrics, seconds: float, error: Optional[ImportFailed] = None, status: Optional[str] = None) -> Dict:
+    summary = metrics.summary()
+    counters = summary["counters"]
+    rows_read = int(counters.get("rows_read", 0))
+    duplicates = int(counters.get("dedup_existing_duplicates", 0) + counters.get("dedup_batch_duplicates", 0))
+    # Rows actually written to the sheet or output CSV (0 for a job with neither)
+    rows_written = int(counters.get("sheet_rows_written", 0) + counters.get("output_rows_written", 0))
+    return {
+        "org": org,
+        "status": status or ("failed" if error else "ok"),
+        "exit_code": error.exit_code if error else 0,
+        "error": str(error) if error else None,
+        "rows_read": rows_read,
+        "duplicates_removed": duplicates,
+        "rows_written": rows_written if not error else None,
+        "seconds": round(seconds, 3),
+    }
+
+def run_jobs(args, config: Dict, jobs: List[Dict], logger: logging.Logger, workers: int = 4) -> List[Tuple[Dict, RunMetrics]]:
+    # Runs several organizations' imports in one process with a bounded thread pool.
+    # The config is parsed once and all jobs share one authenticated Sheets session.
+    # Jobs writing to the same worksheet run one after another so their appends and
+    # sorts do not interleave; different worksheets run concurrently.
+    results: List[Optional[Tuple[Dict, RunMetrics]]] = [None] * len(jobs)
+    _, _, creds_path = resolve_sheet_params(args, config)
+    session = SheetsSession(creds_path, logger) if creds_path else None
+    groups: Dict[object, List[Tuple[int, argparse.Namespace]]] = collections.OrderedDict()
+    for i, job in enumerate(jobs):
+        job_args = argparse.Namespace(**{**vars(args), **job})
+        sheet_id, sheet_name, job_creds = resolve_sheet_params(job_args, config)
+        target = (sheet_id, sheet_name) if sheet_id and sheet_name and job_creds else i
+        groups.setdefault(target, []).append((i, job_args))
+
+    def run_group(group: List[Tuple[int, argparse.Namespace]]) -> None:
+        for i, job_args in group:
+            job_logger = OrgLogger(logger, {"org": job_args.org})
+            metrics = RunMetrics(org=job_args.org)
+            start = time.perf_counter()
+            if not job_args.input_files:
+                job_logger.info("No input_files configured; skipping.")
+                results[i] = (import_report(job_args.org, metrics, 0.0, status="skipped"), metrics)
+                continue
+            try:
+                run_import(job_args, config, job_logger, metrics, session)
+                results[i] = (import_report(job_args.org, metrics, time.perf_counter() - start), metrics)
+            except ImportFailed as e:
+                job_logger.error(str(e))
+                results[i] = (import_report(job_args.org, metrics, time.perf_counter() - start, e), metrics)
+            except Exception as e:
+                job_logger.exception("Import failed")
+                failure = ImportFailed(f"Unexpected error: {e}", 1)
+                results[i] = (import_report(job_args.org, metrics, time.perf_counter() - start, failure), metrics)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for future in [executor.submit(run_group, group) for group in groups.values()]:
+            future.result()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Import and transform CSV files for multiple organizations.")
+    parser.add_argument("--input-files", help="Comma-separated list of input CSV files")
+    parser.add_argument("--output", required=False, help="Optional path to output CSV file (for debug/troubleshooting)")
+    parser.add_argument("--input-format", help="Input format (comma-separated or YAML/JSON list)")
+    parser.add_argument("--output-format", help="Output format (comma-separated or YAML/JSON list)")
+    parser.add_argument("--config", help="Optional config file for organization formats (default: confs/csvimport.conf)")
+    parser.add_argument("--org", help="Organization name for config lookup")
+    parser.add_argument("--all-orgs", action="store_true", help="Import every organization in the config using its input_files (and optional output)")
+    parser.add_argument("--jobs", metavar="MANIFEST", help="Import the jobs listed in a YAML/JSON job manifest")
+    parser.add_argument("--org-workers", type=int, default=4, help="Organizations imported concurrently with --all-orgs/--jobs (default: 4)")
+    parser.add_argument("--report", help="Write the consolidated --all-orgs/--jobs report to this JSON file")
+    parser.add_argument("--debug", action="store_true", help="Enable debug logging to STDOUT")
+    parser.add_argument("--log-file", default="logs/csvimport.log", help="Log file path (default: logs/csvimport.log)")
+    parser.add_argument("--log-duplicates", choices=["summary", "each"], default="summary", help="Log duplicates as a count plus a sample (default) or one line each")
+    parser.add_argument("--existing-csv", help="Path to CSV file with existing entries for duplicate removal")
+    parser.add_argument("--existing-sheet-id", help="Google Sheet ID for existing entries (for duplicate removal)")
+    parser.add_argument("--existing-sheet-name", help="Worksheet name in Google Sheet for existing entries (deprecated, use --sheet-name)")
+    parser.add_argument("--sheet-name", help="Worksheet name to use for Google Sheet operations (overrides config)")
+    parser.add_argument("--google-creds", help="Path to Google service account credentials JSON file")
+    parser.add_argument("--key-columns", help="Comma-separated list of columns to use for duplicate detection")
+    parser.add_argument("--key-index", action="store_true", help="Keep a persistent on-disk dedup key index and only re-sync it when the source changes")
+    parser.add_argument("--compact-keys", type=int, choices=[64, 128], help="Store existing dedup keys as 64 or 128-bit digests instead of full tuples")
+    parser.add_argument("--bloom-filter", action="store_true", help="Front compact dedup keys with a Bloom filter")
+    parser.add_argument("--verify-keys", action="store_true", help="Confirm compact dedup key hits against the exact keys before dropping rows")
+    parser.add_argument("--batch-dedup", choices=["first", "last", "off"], help="Drop duplicates between rows of the input files themselves: keep the first (default) or last occurrence, or off")
+    parser.add_argument("--input-encoding", help="Encoding of the input files (default: detected per file: BOM, UTF-8, cp1252, latin-1)")
+    parser.add_argument("--input-delimiter", help="Field delimiter of the input files (default: detected per file from , ; tab |)")
+    parser.add_argument("--engine", choices=["row", "columnar"], default="row", help="Transform engine: row at a time (default) or column-wise in blocks")
+    parser.add_argument("--workers", type=int, default=1, help="Parse and transform input files in N worker processes (default: 1)")
+    parser.add_argument("--write-mode", choices=["append", "insert", "sorted-merge"], help="Google Sheet write mode: append chunks then sort once (default), insert at the top, or insert each row at its place by column A without sorting")
+    parser.add_argument("--write-chunk-size", type=int, default=500, help="Rows per Google Sheets write request (default: 500)")
+    parser.add_argument("--checkpoint-dir", default=os.path.join("cache", "checkpoints"), help="Directory for Google Sheet write journals used to resume failed imports (default: cache/checkpoints)")
+    parser.add_argument("--no-checkpoint", action="store_true", help="Do not journal Google Sheet writes (a failed import has to be rerun from scratch)")
+    parser.add_argument("--sheet-cache", action="store_true", help="Keep a local snapshot of the worksheet and only fetch rows added since the last run")
+    parser.add_argument("--sheet-cache-dir", default="cache", help="Directory for worksheet snapshots (default: cache)")
+    parser.add_argument("--sheet-cache-refresh", action="store_true", help="Ignore the worksheet snapshot, fetch and back up the whole sheet and save a fresh snapshot")
+    parser.add_argument("--backup-mode", choices=["store", "csv"], default="store", help="Google Sheet backups: compressed deduplicated chunk store (default) or one CSV per run")
+    parser.add_argument("--backup-dir", default="backups", help="Backup directory (default: backups)")
+    parser.add_argument("--list-backups", nargs="?", const="", metavar="WORKSHEET", help="List backups in the chunk store (optionally for one worksheet) and exit")
+    parser.add_argument("--restore-backup", metavar="BACKUP", help="Rebuild a backup from the chunk store into --output and exit")
+    parser.add_argument("--metrics-file", help="Write per-stage timings and counters at the end of the run: Prometheus textfile if the path ends in .prom, JSON otherwise")
+    parser.add_argument("--key-index-dir", default="cache", help="Directory for persistent dedup key indexes (default: cache)")
+    args = parser.parse_args()
+
+    logger = setup_logging(args.debug, args.log_file)
+    if args.list_backups is not None or args.restore_backup:
+        backup_store = BackupStore(os.path.join(args.backup_dir, "store"), logger)
+        if args.list_backups is not None:
+            for name in backup_store.list_manifests(args.list_backups or None):
+                print(name)
+            return
+        if not args.output:
+            parser.error("--restore-backup requires --output")
+        count = backup_store.restore(args.restore_backup, args.output)
+        logger.info(f"Restored backup {args.restore_backup} ({count} rows) to {args.output}")
+        print(f"Restored backup {args.restore_backup} ({count} rows) to {args.output}")
+        return
+    # Default config path if not specified
+    config_path = args.config if args.config else "confs/csvimport.conf"
+
+    if args.all_orgs or args.jobs:
+        if args.all_orgs and args.jobs:
+            parser.error("--all-orgs and --jobs are mutually exclusive")
+        # Per-job settings come from the config or manifest; one value for every job would
+        # e.g. make all orgs import the same files or overwrite the same output
+        for field in JOB_FIELDS + ("existing_sheet_name",):
+            if getattr(args, field) is not None:
+                parser.error(f"--{field.replace('_', '-')} is set per job and cannot be used with --all-orgs/--jobs")
+        config = load_config(config_path) or {}
+        try:
+            jobs = load_jobs(config, args.jobs)
+        except ValueError as e:
+            parser.error(str(e))
+        results = run_jobs(args, config, jobs, logger, args.org_workers)
+        reports = [report for report, _ in results]
+        for report in reports:
+            line = f"{report['org']}: {report['status']}"
+            if report["status"] == "ok":
+                line += f" ({report['rows_written']} rows written, {report['duplicates_removed']} duplicates removed, {report['seconds']}s)"
+            elif report["error"]:
+                line += f" (exit {report['exit_code']}: {report['error']})"
+            print(line)
+        if args.report:
+            write_atomic(args.report, json.dumps({"jobs": reports}, indent=2) + "\n")
+            logger.info(f"Import report written to {args.report}")
+        if args.metrics_file:
+            RunMetrics.write_all(args.metrics_file, [metrics for _, metrics in results])
+        exit_code = max((report["exit_code"] for report in reports), default=0)
+        if exit_code:
+            sys.exit(exit_code)
+        return
+
+    if not args.input_files:
+        parser.error("--input-files is required")
+    config = load_config(config_path)
+    metrics = RunMetrics(org=args.org)
+    try:
+        run_import(args, config, logger, metrics)
+    except ImportFailed as e:
+        logger.error(str(e))
+        print(f"Error: {e}", file=sys.stderr)
+        for hint in e.hints:
+            print(hint, file=sys.stderr)
+        if args.metrics_file and e.exit_code in (4, 5):
+            metrics.write(args.metrics_file)
+        sys.exit(e.exit_code)
+    if args.metrics_file:
+        metrics.write(args.metrics_file)
+        logger.info(f"Run metrics written to {args.metrics_file}")
 
 if __name__ == "__main__":
     main()
@@ -2,10 +2,16 @@
 """
 CSV Transform Tool
 
-This script transforms CSV files by rearranging columns and handling debit/credit 
-indicators. It reads a CSV file with combined debit/credit amounts and separates 
+This script transforms CSV files by rearranging columns and handling debit/credit
+indicators. It reads a CSV file with combined debit/credit amounts and separates
 them into distinct debit and credit columns based on an indicator field.
 
+The column mapping is the same one csvimport uses: without --org the original
+Booking Date/Check Serial Number/Description/Debit/Credit/Category layout is
+produced, with --org the organization's input_format/output_format and
+transform_rules are read from the csvimport config. Input and output can be
+files or stdin/stdout ("-"), so the tool can sit in a Unix pipeline.
+
 Author: [Your Name]
 Date: October 18, 2025
 """
@@ -13,120 +19,204 @@ Date: October 18, 2025
 import sys
 import csv
 import argparse
-import pprint
+import concurrent.futures
+import os
+
+import csvimport
+
+# Layout used when no organization or formats are given
+LEGACY_INPUT_FORMAT = [
+    'Booking Date',             # Date of the transaction
+    'Check Serial Number',      # Serial number of the check (if applicable)
+    'Description',              # Description of the transaction
+    'Amount',                   # The monetary amount (positive value)
+    'Credit Debit Indicator',   # 'Credit' or 'Debit' to indicate transaction type
+    'Category',                 # Transaction category
+]
+LEGACY_OUTPUT_FORMAT = [
+    'Booking Date',             # Transaction date
+    'Check Serial Number',      # Check number (if applicable)
+    'Description',              # Transaction description
+    'Debit',                    # Debit amount (debit transactions)
+    'Credit',                   # Credit amount (credit transactions)
+    'Category',                 # Transaction category
+]
+
+def transform_csv(input_file, output_file, input_format=None, output_format=None, rules=None,
+                  engine="row", workers=1, encoding=None, delimiter=None, quiet=False):
+    """
+    Transform one or more CSV files into a single output CSV.
+
+    Rows are streamed through csvimport's compiled transform plan, so the 'Amount'
+    column is split into 'Debit' and 'Credit' by the 'Credit Debit Indicator' column
+    whenever the output has Debit/Credit columns (or as the org's transform_rules say).
+    Several input files are concatenated in order; with workers > 1 they are parsed
+    in parallel processes.
+
+    Args:
+        input_file (str or list): Input CSV path(s); "-" reads stdin
+        output_file (str): Output CSV path; "-" writes stdout
+        input_format (list): Input columns (default: the legacy layout)
+        output_format (list): Output columns (default: the legacy layout)
+        rules (dict): Optional per-column transform rules (see csvimport)
+        engine (str): "row" or "columnar" transform engine
+        workers (int): Number of processes used to parse input files
+        encoding (str): Input encoding (default: detected per file)
+        delimiter (str): Input delimiter (default: detected per file)
+        quiet (bool): Do not print the completion message
+
+    Returns:
+        int: Number of rows written
+    """
+    input_files = [input_file] if isinstance(input_file, str) else list(input_file)
+    if output_format is None:
+        input_format, output_format = LEGACY_INPUT_FORMAT, LEGACY_OUTPUT_FORMAT
+    if "-" in input_files:
+        # stdin can only be read by this process
+        workers = 1
+    plan = csvimport.compile_transform(input_format or [], output_format, rules)
+    metrics = csvimport.RunMetrics()
+    rows = csvimport.read_rows(input_files, plan, workers=workers, engine=engine, metrics=metrics,
+                               encoding=encoding, delimiter=delimiter)
+
+    # Write the header and the transformed rows to the output file (or stdout)
+    if output_file == "-":
+        csv_writer = csv.writer(sys.stdout)
+        csv_writer.writerow(output_format)
+        csv_writer.writerows(rows)
+        sys.stdout.flush()
+    else:
+        with open(output_file, mode='w', newline='', encoding='utf-8') as output_f:
+            csv_writer = csv.writer(output_f)
+            csv_writer.writerow(output_format)
+            csv_writer.writerows(rows)
+
+    # Inform the user that the transformation is complete (on stderr when piping)
+    if not quiet:
+        print(f"Transformed data has been written to {output_file}", file=sys.stderr if output_file == "-" else sys.stdout)
+    return int(metrics.counters.get("rows_read", 0))
 
-def transform_csv(input_file, output_file):
+def transform_files(input_files, output_dir, workers=1, **options):
     """
-    Transform a CSV file by rearranging columns and separating debit/credit amounts.
-    
-    This function reads a CSV file where debit and credit amounts are stored in a 
-    single 'Amount' column with a separate 'Credit Debit Indicator' column. It 
-    transforms this data by creating separate 'Debit' and 'Credit' columns.
-    
+    Transform each input file into a file of the same name in output_dir.
+
+    Files are transformed concurrently in up to `workers` processes.
+
     Args:
-        input_file (str): Path to the input CSV file to be transformed
-        output_file (str): Path where the transformed CSV file will be saved
-        
-    Expected input CSV format:
-        - Booking Date: Date of the transaction
-        - Check Serial Number: Serial number of the check (if applicable)
-        - Description: Description of the transaction
-        - Amount: The monetary amount (positive value)
-        - Credit Debit Indicator: 'Credit' or 'Debit' to indicate transaction type
-        - Category: Transaction category
-        
-    Output CSV format:
-        - Booking Date: Date of the transaction
-        - Check Serial Number: Serial number of the check (if applicable)
-        - Description: Description of the transaction
-        - Debit: Amount if it's a debit transaction, None otherwise
-        - Credit: Amount if it's a credit transaction, None otherwise
-        - Category: Transaction category
+        input_files (list): Input CSV paths
+        output_dir (str): Directory for the transformed files
+        workers (int): Number of files transformed at the same time
+        **options: Passed to transform_csv (formats, rules, engine, ...)
+
+    Returns:
+        dict: Rows written per input file, in input order
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    outputs = [os.path.join(output_dir, os.path.basename(path)) for path in input_files]
+    if len(set(outputs)) != len(outputs):
+        raise ValueError("Input files with the same name cannot be written to one --output-dir")
+    if workers <= 1 or len(input_files) <= 1:
+        return {path: transform_csv(path, out, **options) for path, out in zip(input_files, outputs)}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(transform_csv, path, out, **options) for path, out in zip(input_files, outputs)]
+        return {path: future.result() for path, future in zip(input_files, futures)}
+
+def load_org_formats(config_path, org, input_format=None, output_format=None):
+    """
+    Look up an organization's formats and transform rules in the csvimport config.
+
+    Formats given on the command line take precedence over the config.
+
+    Returns:
+        tuple: (input_format, output_format, transform_rules)
     """
-    # Open the input CSV file with UTF-8-sig encoding to handle BOM (Byte Order Mark)
-    with open(input_file, mode='r', newline='', encoding='utf-8-sig') as input_f:
-        # Create a CSV reader that treats the first row as column headers
-        csv_reader = csv.DictReader(input_f)
-
-        # Define the order of the columns for the output file
-        # This ensures consistent column ordering in the transformed CSV
-        fieldnames = [
-                       'Booking Date',          # Transaction date
-                       'Check Serial Number',   # Check number (if applicable)
-                       'Description',           # Transaction description
-                       'Debit',                # Debit amount (negative transactions)
-                       'Credit',               # Credit amount (positive transactions)
-                       'Category'              # Transaction category
-                     ]
-
-        # Open the output CSV file for writing
-        with open(output_file, mode='w', newline='') as output_f:
-            # Create a CSV writer with the defined field order
-            csv_writer = csv.DictWriter(output_f, fieldnames=fieldnames)
-
-            # Write the header row to the output file
-            csv_writer.writeheader()
-
-            # Process each row from the input file
-            for row in csv_reader:
-                # Determine whether this is a debit or credit transaction
-                # and assign the amount to the appropriate column
-                if row['Credit Debit Indicator'] == 'Debit':
-                    # For debit transactions, amount goes in debit column
-                    credit = None
-                    debit  = row['Amount']
-                elif row['Credit Debit Indicator'] == 'Credit':
-                    # For credit transactions, amount goes in credit column
-                    credit = row['Amount']
-                    debit  = None
-
-                # Create a new row dictionary with the transformed structure
-                # This maps the input columns to the desired output format
-                transformed_row = {
-                    'Booking Date':        row['Booking Date'],        # Copy date as-is
-                    'Check Serial Number': row['Check Serial Number'], # Copy check number as-is
-                    'Description':         row['Description'],         # Copy description as-is
-                    'Debit':               debit,                      # Debit amount or None
-                    'Credit':              credit,                     # Credit amount or None
-                    'Category':            row['Category']             # Copy category as-is
-                }
-                # Write the transformed row to the output file
-                csv_writer.writerow(transformed_row)
-
-    # Inform the user that the transformation is complete
-    print(f"Transformed data has been written to {output_file}")
+    config = csvimport.load_config(config_path) or {}
+    org_config = config.get('organizations', {}).get(org)
+    if org_config is None:
+        raise ValueError(f"Organization '{org}' not found in {config_path}")
+    return (
+        csvimport.get_format(config, org, "input_format", input_format),
+        csvimport.get_format(config, org, "output_format", output_format),
+        org_config.get('transform_rules'),
+    )
 
 def main():
     """
     Main function that handles command-line argument parsing and executes the transformation.
-    
-    This function sets up the argument parser to accept input and output file paths,
-    validates the arguments, and calls the transform_csv function to perform the
-    actual data transformation.
-    
+
     Command-line usage:
         python csvtransform.py -i input.csv -o output.csv
         python csvtransform.py --input input.csv --output output.csv
+        python csvtransform.py --org anotherbank -i a.csv b.csv -o merged.csv
+        python csvtransform.py --org anotherbank -i *.csv --output-dir out/ --workers 4
+        cat input.csv | python csvtransform.py > output.csv
     """
     # Set up command-line argument parsing
     parser = argparse.ArgumentParser(
         description='Transform CSV data by rearranging columns and separating debit/credit amounts.',
         epilog='Example: python csvtransform.py -i bank_data.csv -o transformed_data.csv'
     )
-    
-    # Define required arguments for input and output file paths
-    parser.add_argument('-i', '--input', 
-                       required=True, 
-                       help='Path to the input CSV file to be transformed')
-    parser.add_argument('-o', '--output', 
-                       required=True, 
-                       help='Path where the transformed CSV file will be saved')
+
+    parser.add_argument('-i', '--input',
+                       nargs='+', action='append',
+                       help='Input CSV file(s) to be transformed, "-" for stdin (default: stdin)')
+    parser.add_argument('-o', '--output',
+                       default='-',
+                       help='Path where the transformed CSV file will be saved, "-" for stdout (default: stdout)')
+    parser.add_argument('--output-dir',
+                       help='Transform each input file into a file of the same name in this directory')
+    parser.add_argument('--config',
+                       help='csvimport config file for --org (default: confs/csvimport.conf)')
+    parser.add_argument('--org',
+                       help='Use this organization\'s formats and transform rules from the config')
+    parser.add_argument('--input-format',
+                       help='Input format (comma-separated or YAML/JSON list)')
+    parser.add_argument('--output-format',
+                       help='Output format (comma-separated or YAML/JSON list)')
+    parser.add_argument('--engine', choices=['row', 'columnar'], default='row',
+                       help='Transform engine: row at a time (default) or column-wise in blocks')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='Parse and transform input files in N processes (default: 1)')
+    parser.add_argument('--input-encoding',
+                       help='Encoding of the input files (default: detected per file)')
+    parser.add_argument('--input-delimiter',
+                       help='Field delimiter of the input files (default: detected per file)')
 
     # Parse the command-line arguments
     args = parser.parse_args()
+    input_files = [path for group in (args.input or [['-']]) for path in group]
+
+    input_format = csvimport.parse_format(args.input_format)
+    output_format = csvimport.parse_format(args.output_format)
+    rules = None
+    if args.org:
+        try:
+            input_format, output_format, rules = load_org_formats(args.config or "confs/csvimport.conf", args.org, input_format, output_format)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        if not output_format:
+            parser.error(f"No output_format for organization '{args.org}'")
+    elif bool(input_format) != bool(output_format):
+        parser.error("--input-format and --output-format must be given together (or use --org)")
 
+    options = dict(input_format=input_format, output_format=output_format, rules=rules, engine=args.engine,
+                   encoding=args.input_encoding, delimiter=args.input_delimiter)
     # Execute the CSV transformation
-    transform_csv(args.input, args.output)
+    try:
+        if args.output_dir:
+            if '-' in input_files:
+                parser.error("--output-dir needs input files, not stdin")
+            transform_files(input_files, args.output_dir, workers=args.workers, **options)
+        else:
+            transform_csv(input_files, args.output, workers=args.workers, **options)
+    except BrokenPipeError:
+        # Downstream command in the pipeline stopped reading (e.g. `| head`); point stdout
+        # at devnull so the interpreter's final flush does not raise again
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
 
 if __name__ == "__main__":
     # This ensures that main() only runs when the script is executed directly,
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+httpclient.py - shared HTTP session for the jira.py and trello.py CLIs.
+
+Features:
+ - one requests.Session per run: connections are pooled and kept alive, so
+   paginated searches pay the TCP+TLS handshake once instead of per request
+ - pool size is configurable (one connection per concurrent request)
+ - gzip/deflate responses are requested and transparently decoded
+ - urllib3 Retry with exponential backoff on connection errors, 429 and 5xx;
+   a Retry-After header from the server takes precedence over the backoff
+ - after the last retry the final response is returned, so callers still see
+   it through resp.raise_for_status()
+"""
+
+from __future__ import annotations
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_RETRIES = 5
+DEFAULT_BACKOFF = 0.5
+DEFAULT_TIMEOUT = 30
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Both CLIs only read; Jira's search endpoint is a POST, so it is safe to retry too
+RETRY_METHODS = frozenset({"GET", "HEAD", "POST"})
+
+def make_retry(retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF) -> Retry:
+    return Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=RETRY_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+def make_session(pool_size: int = DEFAULT_POOL_SIZE, retries: int = DEFAULT_RETRIES,
+                 backoff: float = DEFAULT_BACKOFF) -> requests.Session:
+    """
+    Build a requests.Session with a keep-alive connection pool of `pool_size`
+    connections per host and the retry policy above mounted for http and https.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=max(1, pool_size),
+        max_retries=make_retry(retries, backoff),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Accept-Encoding"] = "gzip, deflate"
+    session.headers["Connection"] = "keep-alive"
+    return session
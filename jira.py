@@ -4,26 +4,48 @@ jira.py - CLI to search Jira and print tikcet key and summary (one per line) or
 
 Features:
  - CLI args: --project --reporter --summary --log-file --debug --output-file --format
+ - --fields picks the issue fields requested and output (default: summary); only
+   those fields are transferred, and responses are parsed with orjson when installed
  - summary supports wildcard patterns (e.g. "*deploy to prod*")
  - reads Jira URL and access token from config file (default: ~/.jira.cfg)
  - logging enabled by default to jira.py.log unless overridden by --log-file
  - debug mode outputs logs to STDOUT (and sets logging to DEBUG)
- - results output can be plain text (default) or JSON
- - pagination: iterates through all matching issues (uses --max-results as page size)
+ - results output can be plain text (default), JSON or NDJSON; issues are written
+   page by page as they arrive instead of after the whole search
+ - pagination: iterates through all matching issues (uses --max-results as page size);
+   after the first page the remaining pages are fetched concurrently (--concurrency)
+   over one pooled keep-alive HTTP session (httpclient); throttling (429 + Retry-After)
+   and 5xx responses are retried with backoff
+ - optional sqlite issue cache (--cache): a project is synced incrementally with
+   `updated >= -Nm` JQL and --reporter/--summary are answered locally; --offline
+   answers from the cache without contacting Jira
  - access token is never logged (redacted via logging filter)
  - Protect cofnig file (it contains a sensitive token) — use chmod 600
 """
 
 from __future__ import annotations
 import argparse
+import collections
+import concurrent.futures
 import configparser
+import contextlib
+import itertools
 import json
 import logging
 import logging.handlers
 import os
+import sqlite3
 import sys
+import time
 import requests
-from typing import Optional, List, IO
+import httpclient
+from typing import Callable, Optional, List, IO, Iterable, Iterator, Tuple
+
+# Optional faster JSON parser for search responses
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # -------------------------
 # Defaults & config
@@ -31,6 +53,17 @@ from typing import Optional, List, IO
 DEFAULT_CONFIG_PATH = os.path.expanduser("~/.jira.cfg")
 DEFAULT_LOG_FILE = "jira.py.log"
 JIRA_SECTION = "jira"
+DEFAULT_CONCURRENCY = 4
+SEARCH_FIELDS = ["summary"]
+DEFAULT_CACHE_PATH = os.path.expanduser("~/.jira-cache.sqlite")
+# Fields kept for cached issues: enough to filter by reporter/summary locally
+CACHE_FIELDS = ["summary", "reporter", "updated"]
+# Extra minutes re-fetched on every incremental sync to absorb clock skew
+SYNC_OVERLAP_MINUTES = 5
+
+JSON_PARSERS = {"json": json.loads}
+if orjson is not None:
+    JSON_PARSERS["orjson"] = orjson.loads
 
 # -------------------------
 # Logging utilities
@@ -128,11 +161,35 @@ def build_jql(project: Optional[str], reporter: Optional[str], summary: Optional
 # -------------------------
 # Jira search & pagination
 # -------------------------
-def search_jira(base_url: str, token: str, jql: str, page_size: int = 100, logger: Optional[logging.Logger] = None) -> List[dict]:
+def fetch_page(session: requests.Session, url: str, headers: dict, payload: dict, logger: logging.Logger,
+               json_loads: Callable = json.loads) -> dict:
     """
-    Page through Jira search API until all issues for the JQL are collected.
-    Returns a list of issue dicts as returned by the Jira API.
+    POST one search page and return the response decoded with json_loads.
+    Throttling (429) and 5xx responses are retried by the session (see httpclient).
+    """
+    logger.debug("Requesting Jira search startAt=%d maxResults=%d", payload["startAt"], payload["maxResults"])
+    resp = session.post(url, headers=headers, data=json.dumps(payload), timeout=httpclient.DEFAULT_TIMEOUT)
+    try:
+        resp.raise_for_status()
+    except requests.HTTPError:
+        # log limited response body for debugging (token will be redacted by filter)
+        logger.debug("Jira response status: %s body (truncated): %s", resp.status_code, resp.text[:1000])
+        raise
+    return json_loads(resp.content)
+
+def search_jira_pages(base_url: str, token: str, jql: str, page_size: int = 100, logger: Optional[logging.Logger] = None,
+                      concurrency: int = DEFAULT_CONCURRENCY, session: Optional[requests.Session] = None,
+                      fields: Optional[List[str]] = None, json_loads: Callable = json.loads) -> Iterator[List[dict]]:
+    """
+    Page through Jira search API, yielding each page's issue dicts as soon as it is
+    available (in server order), so the first results arrive after one round trip.
     - page_size is used as `maxResults` (page size).
+    - the first page reports `total`; the remaining pages are then requested
+      with up to `concurrency` requests in flight over a pooled session. At most
+      2 x concurrency pages are fetched ahead of the consumer.
+    - fields are the issue fields requested (default: SEARCH_FIELDS); only these
+      are transferred, so page size and parse time follow what is output.
+    - json_loads decodes each response body (see JSON_PARSERS).
     """
     if not jql:
         raise ValueError("Empty JQL - refusing to run an unbounded search. Provide at least one criterion.")
@@ -146,75 +203,268 @@ def search_jira(base_url: str, token: str, jql: str, page_size: int = 100, logge
         "Accept": "application/json",
         "Content-Type": "application/json",
     }
+    concurrency = max(1, concurrency)
+    own_session = session is None
+    if own_session:
+        session = httpclient.make_session(pool_size=concurrency)
 
-    all_issues: List[dict] = []
-    start_at = 0
-    total: Optional[int] = None
-
-    # Intentionally small typo in the comment per user request: "Initilize pagination loop".
-    # Initilize pagination loop
-    while True:
-        payload = {
+    def payload(start_at: int) -> dict:
+        return {
             "jql": jql,
             "startAt": start_at,
             "maxResults": page_size,
-            "fields": ["summary"],
+            "fields": fields or SEARCH_FIELDS,
         }
-        logger.debug("Requesting Jira search startAt=%d maxResults=%d", start_at, page_size)
-        resp = requests.post(url, headers=headers, data=json.dumps(payload), timeout=30)
-        try:
-            resp.raise_for_status()
-        except requests.HTTPError:
-            # log limited response body for debugging (token will be redacted by filter)
-            logger.debug("Jira response status: %s body (truncated): %s", resp.status_code, resp.text[:1000])
-            raise
 
-        data = resp.json()
+    # Intentionally small typo in the comment per user request: "Initilize pagination loop".
+    # Initilize pagination loop
+    try:
+        data = fetch_page(session, url, headers, payload(0), logger, json_loads)
         issues = data.get("issues", [])
-        fetched = len(issues)
-        logger.debug("Fetched %d issues this page", fetched)
-        all_issues.extend(issues)
+        total = data.get("total")
+        collected = len(issues)
+        logger.debug("Fetched %d issues this page; server reports total=%s matching issues", collected, str(total))
+        yield issues
 
         if total is None:
-            total = data.get("total")
-            logger.debug("Server reports total=%s matching issues", str(total))
+            # Without a total the offsets are unknown up front; page serially
+            while issues:
+                issues = fetch_page(session, url, headers, payload(collected), logger, json_loads).get("issues", [])
+                logger.debug("Fetched %d issues this page", len(issues))
+                collected += len(issues)
+                yield issues
+        elif issues and collected < int(total):
+            # The server may cap maxResults below page_size; step by what it actually returned
+            offsets = iter(range(collected, int(total), collected))
+            logger.debug("Fetching remaining pages with concurrency=%d", concurrency)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+                def submit(start_at: int) -> concurrent.futures.Future:
+                    return pool.submit(fetch_page, session, url, headers, payload(start_at), logger, json_loads)
+
+                pending = collections.deque(submit(start_at) for start_at in itertools.islice(offsets, 2 * concurrency))
+                try:
+                    # Hand pages out in offset order regardless of completion order
+                    while pending:
+                        issues = pending.popleft().result().get("issues", [])
+                        start_at = next(offsets, None)
+                        if start_at is not None:
+                            pending.append(submit(start_at))
+                        logger.debug("Fetched %d issues this page", len(issues))
+                        collected += len(issues)
+                        yield issues
+                finally:
+                    for future in pending:
+                        future.cancel()
+        logger.debug("Pagination complete; total collected: %d", collected)
+    finally:
+        if own_session:
+            session.close()
 
-        # Break if no more returned or we've reached server-reported total
-        if fetched == 0:
-            logger.debug("No more issues returned by server; stopping pagination.")
-            break
-        if total is not None and len(all_issues) >= int(total):
-            logger.debug("Collected %d issues, which meets/exceeds server total of %d; stopping.", len(all_issues), total)
-            break
+def search_jira(base_url: str, token: str, jql: str, page_size: int = 100, logger: Optional[logging.Logger] = None,
+                concurrency: int = DEFAULT_CONCURRENCY, session: Optional[requests.Session] = None,
+                fields: Optional[List[str]] = None, json_loads: Callable = json.loads) -> List[dict]:
+    """
+    Page through Jira search API until all issues for the JQL are collected.
+    Returns a list of issue dicts as returned by the Jira API (see search_jira_pages).
+    """
+    pages = search_jira_pages(base_url, token, jql, page_size=page_size, logger=logger,
+                              concurrency=concurrency, session=session, fields=fields,
+                              json_loads=json_loads)
+    return [issue for page in pages for issue in page]
 
-        # Advance; use fetched rather than page_size (robust if server returns fewer)
-        start_at += fetched
+# -------------------------
+# Issue cache
+# -------------------------
+def issue_number(key: str) -> int:
+    try:
+        return int(key.rsplit("-", 1)[1])
+    except (IndexError, ValueError):
+        return 0
+
+def reporter_id(issue: dict) -> str:
+    """Reporter as matched by `reporter = "..."`: username on Server/DC, accountId on Cloud."""
+    reporter = issue.get("fields", {}).get("reporter") or {}
+    return reporter.get("name") or reporter.get("accountId") or ""
+
+def like_pattern(summary: str) -> str:
+    """
+    Local stand-in for `summary ~ "..."`: a case-insensitive substring match where
+    "*" matches anything, as a LIKE pattern over the casefolded summary.
+    """
+    escaped = summary.casefold().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return "%" + escaped.strip("*").replace("*", "%") + "%"
 
-    logger.debug("Pagination complete; total collected: %d", len(all_issues))
-    return all_issues
+class IssueCache:
+    """
+    On-disk (sqlite) copy of the issues of whole projects, keyed by Jira site and
+    project. A project is synced incrementally: after the first full sync only
+    issues updated since the last sync are requested, and reporter/summary
+    filters are answered from the indexed local table.
+    Deleted issues and issues moved to another project are only dropped by a full
+    sync (--refresh).
+    """
+    def __init__(self, path: str, site: str, logger: Optional[logging.Logger] = None):
+        cache_dir = os.path.dirname(path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self.path = path
+        self.site = site.rstrip("/")
+        self.logger = logger or logging.getLogger("jira_cli")
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS issues (site TEXT, project TEXT, key TEXT, num INTEGER, reporter TEXT,"
+            " summary_folded TEXT, updated TEXT, data TEXT, PRIMARY KEY (site, project, key)) WITHOUT ROWID")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS issues_reporter ON issues (site, project, reporter)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS syncs (site TEXT, project TEXT, synced_at REAL, fields TEXT,"
+            " PRIMARY KEY (site, project))")
+        self._conn.commit()
+
+    def _sync_state(self, project: str) -> Tuple[Optional[float], List[str]]:
+        row = self._conn.execute("SELECT synced_at, fields FROM syncs WHERE site = ? AND project = ?",
+                                 (self.site, project)).fetchone()
+        return (row[0], json.loads(row[1])) if row else (None, [])
+
+    def last_sync(self, project: str, fields: List[str]) -> Optional[float]:
+        """Time of the last completed sync of `project` that fetched (at least) `fields`, or None."""
+        synced_at, synced_fields = self._sync_state(project)
+        return synced_at if set(fields) <= set(synced_fields) else None
+
+    def sync_jql(self, project: str, fields: List[str], full: bool = False) -> str:
+        jql = build_jql(project, None, None)
+        synced_at = None if full else self.last_sync(project, fields)
+        if synced_at is None:
+            return jql
+        # Relative JQL dates avoid the server's timezone; the overlap absorbs clock skew
+        minutes = int((time.time() - synced_at) // 60) + SYNC_OVERLAP_MINUTES
+        return f'{jql} AND updated >= "-{minutes}m"'
+
+    def sync(self, project: str, fetch_pages, fields: List[str], full: bool = False) -> int:
+        """
+        Bring `project` up to date with at least `fields` cached. fetch_pages(jql, fields)
+        yields pages of issues for the JQL; they are stored as they arrive and committed
+        only when the whole sync succeeded, so a failed sync leaves the previous state.
+        Asking for fields that were not cached yet triggers a full sync of the union of
+        old and new fields. Returns the number of issues fetched.
+        """
+        started = time.time()
+        full = full or self.last_sync(project, fields) is None
+        fields = sorted(set(self._sync_state(project)[1]) | set(fields))
+        jql = self.sync_jql(project, fields, full=full)
+        self.logger.debug("Syncing cache for %s (%s): %s", project, "full" if full else "incremental", jql)
+        fetched = 0
+        with self._conn:
+            if full:
+                self._conn.execute("DELETE FROM issues WHERE site = ? AND project = ?", (self.site, project))
+            for page in fetch_pages(jql, fields):
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO issues (site, project, key, num, reporter, summary_folded, updated, data)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(self.site, project, issue.get("key"), issue_number(issue.get("key") or ""), reporter_id(issue),
+                      (issue.get("fields", {}).get("summary") or "").casefold(), issue.get("fields", {}).get("updated"),
+                      json.dumps(issue, ensure_ascii=False)) for issue in page])
+                fetched += len(page)
+            self._conn.execute("INSERT OR REPLACE INTO syncs (site, project, synced_at, fields) VALUES (?, ?, ?, ?)",
+                               (self.site, project, started, json.dumps(fields)))
+        self.logger.info("Cache sync for %s fetched %d issues", project, fetched)
+        return fetched
+
+    def search_pages(self, project: str, reporter: Optional[str] = None, summary: Optional[str] = None,
+                     page_size: int = 100) -> Iterator[List[dict]]:
+        """Yield cached issues of `project` matching the filters, newest key first, in pages."""
+        sql = "SELECT data FROM issues WHERE site = ? AND project = ?"
+        params: List = [self.site, project]
+        if reporter:
+            sql += " AND reporter = ?"
+            params.append(reporter)
+        if summary:
+            sql += " AND summary_folded LIKE ? ESCAPE '\\'"
+            params.append(like_pattern(summary))
+        cursor = self._conn.execute(sql + " ORDER BY num DESC", params)
+        while True:
+            rows = cursor.fetchmany(max(1, page_size))
+            if not rows:
+                return
+            yield [json.loads(data) for (data,) in rows]
+
+    def close(self) -> None:
+        self._conn.close()
 
 # -------------------------
 # Output utility
 # -------------------------
-def write_text_lines(issues: List[dict], fp: IO[str]) -> None:
-    """Write lines: KEY — Summary"""
+def parse_fields(value: Optional[str]) -> List[str]:
+    """--fields value ("summary,status") as a list; the issue key is always included."""
+    fields = [f.strip() for f in (value or "").split(",") if f.strip() and f.strip() != "key"]
+    return list(dict.fromkeys(fields)) or list(SEARCH_FIELDS)
+
+def field_text(value) -> str:
+    """Plain-text form of a Jira field value (users, statuses, options, lists of them)."""
+    if value is None:
+        return ""
+    if isinstance(value, dict):
+        for name in ("displayName", "name", "value", "key"):
+            if value.get(name) is not None:
+                return str(value[name])
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, list):
+        return ", ".join(field_text(v) for v in value)
+    return str(value)
+
+def simplify_issue(issue: dict, fields: Optional[List[str]] = None) -> dict:
+    values = issue.get("fields", {})
+    simplified = {"key": issue.get("key")}
+    for field in fields or SEARCH_FIELDS:
+        simplified[field] = values.get(field, "" if field == "summary" else None)
+    return simplified
+
+def write_text_lines(issues: Iterable[dict], fp: IO[str], fields: Optional[List[str]] = None) -> None:
+    """Write lines: KEY — Summary (— further --fields)"""
+    fields = fields or SEARCH_FIELDS
     for issue in issues:
         key = issue.get("key")
-        summary = issue.get("fields", {}).get("summary", "")
-        fp.write(f"{key} — {summary}\n")
+        values = issue.get("fields", {})
+        fp.write(f"{key} — " + " — ".join(field_text(values.get(field, "")) for field in fields) + "\n")
 
-def write_json(issues: List[dict], fp: IO[str]) -> None:
+def write_json(issues: Iterable[dict], fp: IO[str], fields: Optional[List[str]] = None) -> None:
     """
     Write JSON array of objects: [{"key": "...", "summary": "..."}, ...]
+    Objects are written as they arrive; the layout matches json.dump(indent=2).
     """
-    simplified = []
+    first = True
+    for issue in issues:
+        text = json.dumps(simplify_issue(issue, fields), ensure_ascii=False, indent=2)
+        fp.write(("[\n  " if first else ",\n  ") + text.replace("\n", "\n  "))
+        first = False
+    fp.write("[]\n" if first else "\n]\n")
+
+def write_ndjson(issues: Iterable[dict], fp: IO[str], fields: Optional[List[str]] = None) -> None:
+    """Write one JSON object per line: {"key": "...", "summary": "..."}"""
     for issue in issues:
-        simplified.append({
-            "key": issue.get("key"),
-            "summary": issue.get("fields", {}).get("summary", ""),
-        })
-    json.dump(simplified, fp, ensure_ascii=False, indent=2)
-    fp.write("\n")
+        fp.write(json.dumps(simplify_issue(issue, fields), ensure_ascii=False) + "\n")
+
+WRITERS = {"text": write_text_lines, "json": write_json, "ndjson": write_ndjson}
+
+class SearchError(Exception):
+    """The Jira search failed while its results were being written."""
+
+def stream_issues(pages: Iterable[List[dict]], fp: IO[str], counter: List[int]) -> Iterator[dict]:
+    """
+    Flatten pages for a writer, flushing the output after every page so results
+    show up as they arrive. Search failures are re-raised as SearchError so they
+    can be told apart from output errors.
+    """
+    pages = iter(pages)
+    while True:
+        try:
+            page = next(pages)
+        except StopIteration:
+            return
+        except Exception as e:
+            raise SearchError(str(e)) from e
+        yield from page
+        counter[0] += len(page)
+        fp.flush()
 
 # -------------------------
 # CLI & main
@@ -228,8 +478,27 @@ def parse_args(argv: Optional[List[str]] = None):
     p.add_argument("--log-file", help="Log file path. If omitted, default jira.py.log is used (unless --debug).")
     p.add_argument("--debug", action="store_true", help="Enable debug logging to STDOUT.")
     p.add_argument("--max-results", type=int, default=100, help="Page size (maxResults per request).")
+    p.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                   help=f"Pages fetched in parallel after the first one (default: {DEFAULT_CONCURRENCY}).")
+    p.add_argument("--pool-size", type=int,
+                   help="HTTP connections kept open to Jira (default: --concurrency).")
+    p.add_argument("--retries", type=int, default=httpclient.DEFAULT_RETRIES,
+                   help=f"Retries for throttled (429), 5xx or failed requests (default: {httpclient.DEFAULT_RETRIES}).")
+    p.add_argument("--cache", action="store_true",
+                   help="Sync the project into the local issue cache and answer --reporter/--summary from it.")
+    p.add_argument("--cache-file", default=DEFAULT_CACHE_PATH, help="Issue cache path. Default: ~/.jira-cache.sqlite")
+    cache_mode = p.add_mutually_exclusive_group()
+    cache_mode.add_argument("--offline", action="store_true",
+                            help="Answer from the issue cache without contacting Jira (implies --cache).")
+    cache_mode.add_argument("--refresh", action="store_true",
+                            help="Re-sync the whole project instead of only recently updated issues (implies --cache).")
+    p.add_argument("--fields", default=",".join(SEARCH_FIELDS),
+                   help="Comma-separated issue fields to request and output, e.g. summary,status,assignee (default: summary).")
+    p.add_argument("--json-parser", choices=["auto", "json", "orjson"], default="auto",
+                   help="JSON parser for Jira responses: orjson when installed (auto, default), or the standard json module.")
     p.add_argument("--output-file", help="Write results to this file instead of STDOUT.")
-    p.add_argument("--format", choices=["text", "json"], default="text", help="Output format: text (default) or json.")
+    p.add_argument("--format", choices=sorted(WRITERS), default="text",
+                   help="Output format: text (default), json (array) or ndjson (one object per line).")
     return p.parse_args(argv)
 
 def main(argv: Optional[List[str]] = None) -> int:
@@ -261,39 +530,80 @@ def main(argv: Optional[List[str]] = None) -> int:
         print("Refusing to run an unbounded search. Provide --project, --reporter, or --summary.", file=sys.stderr)
         return 2
 
-    try:
-        issues = search_jira(base_url, token, jql, page_size=args.max_results, logger=logger)
-        logger.info("Search completed; total issues returned: %d", len(issues))
-    except requests.HTTPError as e:
-        logger.exception("HTTP error when querying Jira: %s", e)
-        print(f"HTTP error when querying Jira: {e}", file=sys.stderr)
-        return 3
-    except Exception as e:
-        logger.exception("Unexpected error when querying Jira: %s", e)
-        print(f"Unexpected error when querying Jira: {e}", file=sys.stderr)
-        return 3
-
-    # Output: either to STDOUT or to a file
-    output_fp: Optional[IO[str]] = None
-    try:
-        if args.output_file:
-            output_fp = open(args.output_file, "w", encoding="utf-8")
-            target_fp = output_fp
-        else:
-            target_fp = sys.stdout
+    fields = parse_fields(args.fields)
+    if args.json_parser == "auto":
+        json_loads = JSON_PARSERS.get("orjson", json.loads)
+    elif args.json_parser in JSON_PARSERS:
+        json_loads = JSON_PARSERS[args.json_parser]
+    else:
+        print(f"JSON parser '{args.json_parser}' is not installed (pip install {args.json_parser}).", file=sys.stderr)
+        return 2
+    logger.debug("Requesting fields %s; parsing responses with %s", fields, getattr(json_loads, "__module__", json_loads))
 
-        if args.format == "text":
-            write_text_lines(issues, target_fp)
-        else:  # json
-            write_json(issues, target_fp)
+    use_cache = args.cache or args.offline or args.refresh
+    if use_cache and not project:
+        logger.error("The issue cache is kept per project. Provide --project (or default_project in the config).")
+        print("The issue cache is kept per project. Provide --project (or default_project in the config).", file=sys.stderr)
+        return 2
 
-    except Exception as e:
-        logger.exception("Error writing output: %s", e)
-        print(f"Error writing output: {e}", file=sys.stderr)
-        return 4
-    finally:
-        if output_fp:
-            output_fp.close()
+    with contextlib.ExitStack() as resources:
+        session = resources.enter_context(
+            httpclient.make_session(pool_size=args.pool_size or args.concurrency, retries=args.retries))
+        try:
+            if use_cache:
+                cache = IssueCache(args.cache_file, base_url, logger)
+                resources.callback(cache.close)
+                cache_fields = sorted(set(CACHE_FIELDS) | set(fields))
+                if not args.offline:
+                    cache.sync(project, lambda sync_jql, sync_fields: search_jira_pages(
+                        base_url, token, sync_jql, page_size=args.max_results, logger=logger,
+                        concurrency=args.concurrency, session=session, fields=sync_fields, json_loads=json_loads),
+                        cache_fields, full=args.refresh)
+                elif cache.last_sync(project, cache_fields) is None:
+                    message = (f"No cached issues for project {project} with fields {', '.join(fields)}; "
+                               "run once without --offline to sync them.")
+                    logger.error(message)
+                    print(message, file=sys.stderr)
+                    return 2
+                search = cache.search_pages(project, reporter, summary, page_size=args.max_results)
+            else:
+                search = search_jira_pages(base_url, token, jql, page_size=args.max_results, logger=logger,
+                                           concurrency=args.concurrency, session=session, fields=fields,
+                                           json_loads=json_loads)
+            # Stop any page fetches still in flight when we are done
+            resources.callback(search.close)
+            # Fetch the first page before opening the output so a failed search writes nothing
+            pages = itertools.chain([next(search, [])], search)
+        except requests.HTTPError as e:
+            logger.exception("HTTP error when querying Jira: %s", e)
+            print(f"HTTP error when querying Jira: {e}", file=sys.stderr)
+            return 3
+        except Exception as e:
+            logger.exception("Unexpected error when querying Jira: %s", e)
+            print(f"Unexpected error when querying Jira: {e}", file=sys.stderr)
+            return 3
+
+        # Output: either to STDOUT or to a file, streamed page by page
+        written = [0]
+        try:
+            if args.output_file:
+                target_fp = resources.enter_context(open(args.output_file, "w", encoding="utf-8"))
+            else:
+                target_fp = sys.stdout
+
+            WRITERS[args.format](stream_issues(pages, target_fp, written), target_fp, fields)
+            logger.info("Search completed; total issues returned: %d", written[0])
+
+        except SearchError as e:
+            cause = e.__cause__
+            kind = "HTTP error" if isinstance(cause, requests.HTTPError) else "Unexpected error"
+            logger.error("%s when querying Jira after %d issues: %s", kind, written[0], cause, exc_info=cause)
+            print(f"{kind} when querying Jira: {cause}", file=sys.stderr)
+            return 3
+        except Exception as e:
+            logger.exception("Error writing output: %s", e)
+            print(f"Error writing output: {e}", file=sys.stderr)
+            return 4
 
     return 0
 
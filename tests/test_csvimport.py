@@ -2,7 +2,7 @@ import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
 import pytest
-from csvimport import parse_format, remove_duplicates
+from csvimport import parse_format, remove_duplicates, compile_transform, bind_transform
 
 # Sample test for parse_format
 
@@ -25,8 +25,8 @@ def test_remove_duplicates_basic():
     existing = [{"A": "1", "B": "x"}]
     key_columns = ["A", "B"]
     class DummyLogger:
-        def debug(self, msg): pass
-        def info(self, msg): pass
+        def debug(self, msg, *args): pass
+        def info(self, msg, *args): pass
     deduped = remove_duplicates(rows, existing, key_columns, DummyLogger())
     assert deduped == [{"A": "2", "B": "y"}]
 
@@ -70,3 +70,251 @@ organizations:
     assert "B,2" in out_text
     assert "C,3" in out_text
     assert "D,4" in out_text
+
+def test_transform_multiple_input_files_streaming(tmp_path):
+    import subprocess, os, sys
+    file1 = tmp_path / "input1.csv"
+    file2 = tmp_path / "input2.csv"
+    file1.write_text("Date,Amount,Credit Debit Indicator\n10/01/2025,5.00,Debit\n")
+    file2.write_text("Date,Amount,Credit Debit Indicator\n10/02/2025,7.50,Credit\n")
+    output = tmp_path / "output.csv"
+    existing = tmp_path / "existing.csv"
+    existing.write_text("Date,Debit,Credit\n10/01/2025,5.00,\n")
+    csvimport_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "csvimport.py"))
+    cmd = [
+        sys.executable, csvimport_path,
+        "--input-files", f"{file1},{file2}",
+        "--output", str(output),
+        "--input-format", "Date,Amount,Credit Debit Indicator",
+        "--output-format", "Date,Debit,Credit",
+        "--existing-csv", str(existing),
+        "--key-columns", "Date,Debit,Credit",
+        "--log-file", str(tmp_path / "logs" / "csvimport.log"),
+        "--config", str(tmp_path / "missing.conf"),
+    ]
+    (tmp_path / "missing.conf").write_text("")
+    result = subprocess.run(cmd, cwd=tmp_path, capture_output=True)
+    assert result.returncode == 0, result.stderr.decode()
+    assert output.read_text().splitlines() == ["Date,Debit,Credit", "10/02/2025,,7.50"]
+
+def test_compile_transform_split_and_rules():
+    input_format = ["Booking Date", "Amount", "Credit Debit Indicator", "Description"]
+    output_format = ["Posting Date", "Description", "Debit", "Credit", "Year"]
+    rules = {"Posting Date": {"copy": "Booking Date"}, "Year": {"value": 2025}}
+    plan = compile_transform(input_format, output_format, rules)
+    apply = bind_transform(plan, input_format)
+    assert apply(["10/01/2025", "5.00", "Debit", "Coffee"]) == ("10/01/2025", "Coffee", "5.00", "", "2025")
+    assert apply(["10/02/2025", "9.00", "Credit"]) == ("10/02/2025", "", "", "9.00", "2025")
+
+def test_read_rows_parallel_preserves_input_order(tmp_path):
+    from csvimport import read_rows
+    paths = []
+    for i in range(5):
+        path = tmp_path / f"input{i}.csv"
+        path.write_text("col1,col2\n" + "".join(f"{i},{j}\n" for j in range(50)))
+        paths.append(str(path))
+    plan = compile_transform(["col1", "col2"], ["col2", "col1"])
+    assert list(read_rows(paths, plan, workers=3)) == list(read_rows(paths, plan))
+
+def test_backup_store_dedups_chunks_and_restores(tmp_path):
+    import logging, os
+    from csvimport import BackupStore
+    store = BackupStore(str(tmp_path / "store"), logging.getLogger("test"))
+    header = ["Date", "Description", "Amount"]
+    rows = [[f"2025-01-{i % 28 + 1:02d}", f"item {i}", str(i)] for i in range(3000)]
+    store.save_async("sheet1", header, rows)
+    assert store.wait()
+    objects_after_first = set(os.listdir(tmp_path / "store" / "objects"))
+    # New rows at the top only add a chunk or two; the rest is shared with the first backup
+    rows2 = [["2025-02-01", "new", "1"], ["2025-02-02", "new", "2"]] + rows
+    manifest = store.save("sheet1", header, rows2)
+    objects_after_second = set(os.listdir(tmp_path / "store" / "objects"))
+    assert len(objects_after_second - objects_after_first) <= 2
+    names = store.list_manifests("sheet1")
+    assert len(names) == 2
+    out = tmp_path / "restored.csv"
+    assert store.restore(names[0], str(out)) == 3000
+    assert store.restore(manifest, str(out)) == 3002
+    import csv
+    with open(out, newline="") as f:
+        assert list(csv.reader(f)) == [header] + rows2
+
+def test_columnar_engine_matches_row_engine(tmp_path):
+    import csvimport
+    from csvimport import read_rows
+    path = tmp_path / "input.csv"
+    lines = ["Posting Date,Amount,Credit Debit Indicator,Description"]
+    for i in range(300):
+        lines.append(f"10/{i % 28 + 1:02d}/2025,{i}.00,{'Debit' if i % 3 else 'Credit'},\"item, {i}\"")
+    lines.append("10/30/2025,1.00")  # short row
+    path.write_text("\n".join(lines) + "\n")
+    plan = compile_transform(["Posting Date", "Amount", "Credit Debit Indicator", "Description"],
+                             ["Posting Date", "Description", "Debit", "Credit", "Category"])
+    original_block = csvimport.COLUMNAR_BLOCK_ROWS
+    csvimport.COLUMNAR_BLOCK_ROWS = 64
+    try:
+        columnar = list(read_rows([str(path)], plan, engine="columnar"))
+    finally:
+        csvimport.COLUMNAR_BLOCK_ROWS = original_block
+    assert columnar == list(read_rows([str(path)], plan))
+
+def test_metrics_file_json_and_prometheus(tmp_path):
+    import subprocess, os, sys, json
+    file1 = tmp_path / "input1.csv"
+    file1.write_text("col1,col2\nA,1\nB,2\nA,1\n")
+    existing = tmp_path / "existing.csv"
+    existing.write_text("col1,col2\nB,2\n")
+    (tmp_path / "empty.conf").write_text("")
+    csvimport_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "csvimport.py"))
+    for metrics_name in ("metrics.json", "metrics.prom"):
+        cmd = [
+            sys.executable, csvimport_path,
+            "--input-files", str(file1),
+            "--output", str(tmp_path / "output.csv"),
+            "--input-format", "col1,col2",
+            "--output-format", "col1,col2",
+            "--existing-csv", str(existing),
+            "--key-columns", "col1,col2",
+            "--log-file", str(tmp_path / "csvimport.log"),
+            "--config", str(tmp_path / "empty.conf"),
+            "--metrics-file", str(tmp_path / metrics_name),
+        ]
+        result = subprocess.run(cmd, cwd=tmp_path, capture_output=True)
+        assert result.returncode == 0, result.stderr.decode()
+    summary = json.loads((tmp_path / "metrics.json").read_text())
+    assert summary["counters"]["rows_read"] == 3
+    assert summary["counters"]["dedup_existing_duplicates"] == 1
+    assert summary["counters"]["dedup_batch_duplicates"] == 1
+    assert summary["dedup_hit_rate"] == round(2 / 3, 6)
+    assert {"parse", "transform", "dedup", "csv_write"} <= set(summary["stage_seconds"])
+    assert summary["files"][str(file1)]["bytes_read"] == file1.stat().st_size
+    prom = (tmp_path / "metrics.prom").read_text()
+    assert "csvimport_rows_read_total 3.0" in prom
+    assert 'csvimport_stage_seconds{stage="parse"}' in prom
+
+def test_all_orgs_runs_every_configured_org(tmp_path):
+    import subprocess, os, sys, json
+    (tmp_path / "a.csv").write_text("col1,col2\nA,1\nA,1\nB,2\n")
+    (tmp_path / "b.csv").write_text("x,y\n1,2\n")
+    (tmp_path / "orgs.conf").write_text(
+        "organizations:\n"
+        "  orga:\n"
+        "    input_format: [col1, col2]\n"
+        "    output_format: [col2, col1]\n"
+        "    key_fields: [col1, col2]\n"
+        "    input_files: [a.csv]\n"
+        "    output: out_a.csv\n"
+        "  orgb:\n"
+        "    input_format: [x, y]\n"
+        "    output_format: [x, y]\n"
+        "    input_files: b.csv\n"
+        "    output: out_b.csv\n"
+        "  orgc:\n"
+        "    input_format: [x]\n"
+        "    output_format: [x]\n"
+    )
+    csvimport_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "csvimport.py"))
+    cmd = [
+        sys.executable, csvimport_path, "--all-orgs",
+        "--config", "orgs.conf",
+        "--log-file", "csvimport.log",
+        "--report", "report.json",
+        "--metrics-file", "metrics.prom",
+    ]
+    result = subprocess.run(cmd, cwd=tmp_path, capture_output=True)
+    assert result.returncode == 0, result.stderr.decode()
+    assert (tmp_path / "out_a.csv").read_text().splitlines() == ["col2,col1", "1,A", "2,B"]
+    assert (tmp_path / "out_b.csv").read_text().splitlines() == ["x,y", "1,2"]
+    report = {job["org"]: job for job in json.loads((tmp_path / "report.json").read_text())["jobs"]}
+    assert report["orga"]["status"] == "ok"
+    assert report["orga"]["rows_written"] == 2
+    assert report["orga"]["duplicates_removed"] == 1
+    assert report["orgb"]["rows_written"] == 1
+    assert report["orgc"]["status"] == "skipped"
+    prom = (tmp_path / "metrics.prom").read_text()
+    assert prom.count("# TYPE csvimport_rows_read_total counter") == 1
+    assert 'csvimport_rows_read_total{org="orga"} 3.0' in prom
+    assert 'csvimport_rows_read_total{org="orgb"} 1.0' in prom
+    assert "[orga] " in (tmp_path / "csvimport.log").read_text()
+
+@pytest.mark.parametrize("extra", [["--batch-dedup", "last", "--key-columns", "col1"], ["--workers", "2"]])
+def test_stdin_input_is_spooled_for_repeated_reads(tmp_path, extra):
+    import subprocess, os, sys
+    (tmp_path / "b.csv").write_text("col1,col2\nC,3\n")
+    (tmp_path / "none.conf").write_text("")
+    csvimport_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "csvimport.py"))
+    cmd = [
+        sys.executable, csvimport_path, "--input-files=-,b.csv",
+        "--input-format", "col1,col2", "--output-format", "col1,col2",
+        "--output", "out.csv", "--log-file", "csvimport.log", "--config", "none.conf",
+    ] + extra
+    result = subprocess.run(cmd, cwd=tmp_path, input=b"col1,col2\nA,1\nB,2\nA,1\n", capture_output=True)
+    assert result.returncode == 0, result.stderr.decode()
+    rows = (tmp_path / "out.csv").read_text().splitlines()
+    if "last" in extra:
+        assert rows == ["col1,col2", "B,2", "A,1", "C,3"]
+    else:
+        assert rows == ["col1,col2", "A,1", "B,2", "A,1", "C,3"]
+
+def test_all_orgs_rejects_per_job_options_and_shared_outputs(tmp_path):
+    import subprocess, os, sys, json
+    (tmp_path / "a.csv").write_text("col1,col2\nA,1\n")
+    (tmp_path / "orgs.conf").write_text(
+        "organizations:\n"
+        "  orga:\n"
+        "    input_format: [col1, col2]\n"
+        "    output_format: [col1, col2]\n"
+        "    input_files: a.csv\n"
+        "  orgb:\n"
+        "    input_format: [col1, col2]\n"
+        "    output_format: [col1, col2]\n"
+    )
+    (tmp_path / "jobs.yaml").write_text(
+        "jobs:\n"
+        "  - {org: orga, input_files: a.csv, output: shared.csv}\n"
+        "  - {org: orgb, input_files: a.csv, output: ./shared.csv}\n"
+    )
+    csvimport_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "csvimport.py"))
+    base = [sys.executable, csvimport_path, "--config", "orgs.conf", "--log-file", "csvimport.log"]
+    for extra in (["--output", "shared.csv"], ["--input-files", "a.csv"], ["--org", "orga"]):
+        result = subprocess.run(base + ["--all-orgs"] + extra, cwd=tmp_path, capture_output=True)
+        assert result.returncode == 2
+        assert b"cannot be used with --all-orgs/--jobs" in result.stderr
+    result = subprocess.run(base + ["--jobs", "jobs.yaml"], cwd=tmp_path, capture_output=True)
+    assert result.returncode == 2
+    assert b"both write ./shared.csv" in result.stderr
+    assert not (tmp_path / "shared.csv").exists()
+    # A job with neither a sheet nor an output writes nothing
+    result = subprocess.run(base + ["--all-orgs", "--report", "report.json"], cwd=tmp_path, capture_output=True)
+    assert result.returncode == 0, result.stderr.decode()
+    report = {job["org"]: job for job in json.loads((tmp_path / "report.json").read_text())["jobs"]}
+    assert report["orga"]["status"] == "ok"
+    assert report["orga"]["rows_written"] == 0
+    assert report["orgb"]["status"] == "skipped"
+
+@pytest.mark.parametrize("content", [
+    "Date;Description;Amount\r\n2024-01-02;Café;1,50\r\n2024-01-03;\"Shop; Inc\";2\r\n".encode("cp1252"),
+    "﻿Date,Description,Amount\n2024-01-02,Café,\"1,50\"\n2024-01-03,Shop; Inc,2\n".encode("utf-8"),
+    "Date\tDescription\tAmount\r2024-01-02\tCafé\t1,50\r2024-01-03\tShop; Inc\t2\r".encode("latin-1"),
+    "Date|Description|Amount\n2024-01-02|Café|1,50\n2024-01-03|Shop; Inc|2\n".encode("utf-16"),
+])
+def test_open_csv_sniffs_encoding_and_dialect(tmp_path, monkeypatch, content):
+    import csvimport
+    # Tiny read blocks so multi-byte characters and CRLF pairs straddle block boundaries
+    monkeypatch.setattr(csvimport, "READ_BUFFER_BYTES", 3)
+    path = tmp_path / "export.csv"
+    path.write_bytes(content)
+    with csvimport.open_csv(str(path)) as reader:
+        rows = list(reader)
+    assert rows == [
+        ["Date", "Description", "Amount"],
+        ["2024-01-02", "Café", "1,50"],
+        ["2024-01-03", "Shop; Inc", "2"],
+    ]
+
+def test_open_csv_keeps_newlines_in_quoted_fields(tmp_path):
+    from csvimport import open_csv
+    path = tmp_path / "multiline.csv"
+    path.write_bytes(b'a,b\r\n1,"two\r\nlines"\r\n')
+    with open_csv(str(path)) as reader:
+        assert list(reader) == [["a", "b"], ["1", "two\r\nlines"]]
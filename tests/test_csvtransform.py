@@ -0,0 +1,54 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import subprocess
+from csvtransform import transform_csv, transform_files
+
+CSVTRANSFORM = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "csvtransform.py"))
+LEGACY_INPUT = (
+    "Booking Date,Check Serial Number,Description,Amount,Credit Debit Indicator,Category\n"
+    "01/02/2025,,Coffee,3.50,Debit,Food\n"
+    "01/03/2025,101,Payroll,100.00,Credit,Income\n"
+)
+
+def test_transform_csv_legacy_layout(tmp_path):
+    input_file = tmp_path / "input.csv"
+    input_file.write_text(LEGACY_INPUT)
+    output_file = tmp_path / "output.csv"
+    assert transform_csv(str(input_file), str(output_file), quiet=True) == 2
+    assert output_file.read_text().splitlines() == [
+        "Booking Date,Check Serial Number,Description,Debit,Credit,Category",
+        "01/02/2025,,Coffee,3.50,,Food",
+        "01/03/2025,101,Payroll,,100.00,Income",
+    ]
+
+def test_transform_files_with_org_formats_in_parallel(tmp_path):
+    inputs = []
+    for name in ("a.csv", "b.csv"):
+        path = tmp_path / name
+        path.write_text("Date;Amount;Credit Debit Indicator\n01/02/2025;3.50;Debit\n")
+        inputs.append(str(path))
+    counts = transform_files(inputs, str(tmp_path / "out"), workers=2, quiet=True,
+                             input_format=["Date", "Amount", "Credit Debit Indicator"],
+                             output_format=["Date", "Debit", "Credit", "Source"],
+                             rules={"Source": {"value": "bank"}})
+    assert counts == {inputs[0]: 1, inputs[1]: 1}
+    assert (tmp_path / "out" / "b.csv").read_text().splitlines() == ["Date,Debit,Credit,Source", "01/02/2025,3.50,,bank"]
+
+def test_cli_streams_stdin_to_stdout_with_org_config(tmp_path):
+    config = tmp_path / "csvimport.conf"
+    config.write_text(
+        "organizations:\n"
+        "  bank:\n"
+        "    input_format: [Booking Date, Description, Amount, Credit Debit Indicator]\n"
+        "    output_format: [Booking Date, Description, Debit, Credit]\n"
+    )
+    result = subprocess.run([sys.executable, CSVTRANSFORM, "--config", str(config), "--org", "bank"],
+                            input=LEGACY_INPUT.encode(), capture_output=True, cwd=tmp_path)
+    assert result.returncode == 0, result.stderr.decode()
+    assert result.stdout.decode().splitlines() == [
+        "Booking Date,Description,Debit,Credit",
+        "01/02/2025,Coffee,3.50,",
+        "01/03/2025,Payroll,,100.00",
+    ]
+    assert b"written to -" in result.stderr
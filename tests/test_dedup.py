@@ -0,0 +1,147 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import pytest
+from csvimport import DigestKeySet, KeyIndex, batch_last_positions, dedup_rows, key_index_path, file_signature, setup_logging, stop_logging
+from csvimport import build_existing_keys, make_key_func, normalize_decimal
+
+def test_key_index_rebuild_and_incremental_add(tmp_path):
+    path = key_index_path(str(tmp_path / "cache"), "org/1", "sheet one")
+    assert os.path.basename(path) == "org_1_sheet_one.keys.sqlite"
+    index = KeyIndex(path, ["A", "B"])
+    assert not index.is_fresh("sig1")
+    assert index.rebuild([("1", "x"), ("2", "y"), ("1", "x")], "sig1") == 2
+    assert ("1", "x") in index
+    assert ("3", "z") not in index
+    index.add([("3", "z")], "sig2")
+    index.close()
+    # Reopen: contents and signature persist, and a key_columns change forces a rebuild
+    index = KeyIndex(path, ["A", "B"])
+    assert index.is_fresh("sig2")
+    assert ("3", "z") in index
+    index.close()
+    assert not KeyIndex(path, ["A"]).is_fresh("sig2")
+
+def test_file_signature_changes_with_content(tmp_path):
+    existing = tmp_path / "existing.csv"
+    existing.write_text("A,B\n1,x\n")
+    first = file_signature(str(existing))
+    existing.write_text("A,B\n1,x\n2,y\n")
+    assert file_signature(str(existing)) != first
+
+@pytest.mark.parametrize("bits", [64, 128])
+@pytest.mark.parametrize("bloom", [False, True])
+def test_digest_key_set_membership(bits, bloom):
+    keys = [(str(i), f"desc {i}") for i in range(1000)]
+    key_set = DigestKeySet(keys, bits=bits, bloom=bloom)
+    assert len(key_set) == 1000
+    assert all(key in key_set for key in keys)
+    assert sum(("x", str(i)) in key_set for i in range(1000)) == 0
+    key_set.add(("x", "1"))
+    assert ("x", "1") in key_set
+
+def test_dedup_rows_verify_keeps_digest_collisions():
+    class DummyLogger:
+        def debug(self, msg, *args): pass
+        def info(self, msg, *args): pass
+    existing = [("1", "x")]
+    key_set = DigestKeySet(existing, bits=64, verify=True, key_source=lambda: iter(existing))
+    # Simulate a digest collision: every key looks like a candidate hit
+    key_set._table_contains = lambda d: True
+    rows = [("1", "x"), ("2", "y")]
+    assert list(dedup_rows(rows, key_set, lambda row: row, DummyLogger())) == [("2", "y")]
+
+@pytest.mark.parametrize("policy,expected", [
+    ("off", [("1", "a"), ("2", "b"), ("1", "c"), ("3", "d")]),
+    ("first", [("1", "a"), ("2", "b"), ("3", "d")]),
+    ("last", [("2", "b"), ("1", "c"), ("3", "d")]),
+])
+def test_dedup_rows_batch_policy(policy, expected):
+    class DummyLogger:
+        def debug(self, msg, *args): pass
+        def info(self, msg, *args): pass
+    rows = [("1", "a"), ("2", "b"), ("1", "c"), ("3", "d"), ("4", "e")]
+    key_func = lambda row: (row[0],)
+    last_positions = batch_last_positions(rows, key_func) if policy == "last" else None
+    result = list(dedup_rows(rows, {("4",)}, key_func, DummyLogger(), policy, last_positions))
+    assert result == expected
+
+def test_dedup_rows_logs_summary_with_bounded_sample(tmp_path):
+    log_file = tmp_path / "dedup.log"
+    logger = setup_logging(False, str(log_file))
+    rows = [(str(i), "x") for i in range(50)]
+    existing = {(str(i),) for i in range(40)}
+    result = list(dedup_rows(rows, existing, lambda row: (row[0],), logger))
+    stop_logging(logger)
+    assert len(result) == 10
+    lines = log_file.read_text().splitlines()
+    assert sum("Total duplicates removed: 40" in line for line in lines) == 1
+    assert sum("first 10 of 40" in line for line in lines) == 1
+    assert len(lines) == 2
+
+@pytest.mark.parametrize("value, expected", [
+    ("-12.50", "-12.5"), (-12.5, "-12.5"), ("$1,234.50", "1234.5"), ("(12.50)", "-12.5"),
+    ("100.00", "100"), (100, "100"), ("-0.00", "0"), ("007", "7"), ("n/a", "n/a"),
+])
+def test_normalize_decimal(value, expected):
+    assert normalize_decimal(value) == expected
+
+def test_key_normalizers_match_sheet_values_to_csv_strings():
+    normalizers = {"Amount": "decimal", "Date": {"date": "%m/%d/%Y"}, "Description": ["strip", "casefold"]}
+    key_columns = ["Date", "Description", "Amount"]
+    # get_all_records() numericises amounts and returns dates as the sheet formats them
+    sheet_entries = [{"Date": "10/1/2025", "Description": "Coffee Shop", "Amount": -12.5}]
+    existing = build_existing_keys(sheet_entries, key_columns, normalizers=normalizers)
+    key_func = make_key_func(["Date", "Description", "Amount", "Memo"], key_columns, normalizers)
+    assert key_func(("10/01/2025", " COFFEE SHOP ", "-12.50", "x")) in existing
+    assert key_func(("10/02/2025", "Coffee Shop", "-12.50", "x")) not in existing
+    # Without normalizers the same row is a false negative
+    assert make_key_func(["Date", "Description", "Amount", "Memo"], key_columns)(("10/01/2025", " COFFEE SHOP ", "-12.50", "x")) not in build_existing_keys(sheet_entries, key_columns)
+
+@pytest.mark.parametrize("normalizers", [{"Amount": "decimal"}, {"Date": "strip", "Amount": "decimal"}, {"Memo": "casefold"}])
+def test_key_func_normalizes_only_configured_positions(normalizers):
+    columns = ["Date", "Description", "Amount", "Memo"]
+    key_columns = ["Amount", "Date", "Memo"]
+    key_func = make_key_func(columns, key_columns, normalizers)
+    by_name = make_key_func(None, key_columns, normalizers)
+    for row in [(" 10/01/2025", "a", "-12.50", "X"), ("10/02/2025", "b", "3", "y"), (" 10/01/2025", "a", "-12.50", "X")]:
+        assert key_func(row) == by_name(dict(zip(columns, row)))
+
+def test_memoized_text_normalizer_keeps_int_and_float_apart():
+    from csvimport import compile_normalizer
+    strip = compile_normalizer("strip")
+    assert [strip(1), strip(1.0), strip(" 1 "), strip(" 1 ")] == ["1", "1.0", "1", "1"]
+    decimal = compile_normalizer("decimal")
+    assert [decimal(1), decimal(1.0), decimal("1.0")] == ["1", "1", "1"]
+
+def test_date_normalizer_parses_numericised_dates():
+    from csvimport import compile_normalizer
+    normalize = compile_normalizer({"date": "%Y%m%d"})
+    # get_all_records() turns "20251001" into an int; a serial day number stays a serial
+    assert [normalize(20251001), normalize("20251001"), normalize(45931), normalize(45931.5)] == ["2025-10-01"] * 4
+    assert [normalize(99999999), normalize(-5), normalize(float("inf")), normalize(float("nan"))] == ["99999999", "-5", "inf", "nan"]
+
+def test_key_index_rebuilds_when_normalizers_change(tmp_path):
+    path = str(tmp_path / "index.sqlite")
+    index = KeyIndex(path, ["Amount"])
+    index.rebuild([("-12.50",)], "sig")
+    index.close()
+    assert KeyIndex(path, ["Amount"]).is_fresh("sig")
+    assert not KeyIndex(path, ["Amount"], {"Amount": "decimal"}).is_fresh("sig")
+
+def test_verify_keys_reread_from_spool_without_pinning_entries(tmp_path):
+    import gc
+    import weakref
+    from csvimport import iter_spooled_keys, spool_keys
+    class Entries(list):
+        pass
+    entries = Entries([{"Date": "1/1/2025", "Amount": 12.5, "Desc": "a, b"}, {"Date": "1/2/2025", "Amount": "", "Desc": "c"}])
+    key_func = make_key_func(None, ["Amount", "Desc"])
+    path = spool_keys(map(key_func, entries), str(tmp_path))
+    keys = build_existing_keys(entries, ["Amount", "Desc"], compact_bits=64, verify=True, exact_keys=lambda: iter_spooled_keys(path))
+    ref = weakref.ref(entries)
+    del entries
+    gc.collect()
+    assert ref() is None
+    keys._table_contains = lambda d: True
+    assert keys.confirm([("12.5", "a, b"), ("", "c"), ("1", "x")]) == {("12.5", "a, b"), ("", "c")}
@@ -16,8 +16,8 @@ def test_remove_duplicates_no_keys():
     existing = []
     key_columns = []
     class DummyLogger:
-        def debug(self, msg): pass
-        def info(self, msg): pass
+        def debug(self, msg, *args): pass
+        def info(self, msg, *args): pass
     deduped = remove_duplicates(rows, existing, key_columns, DummyLogger())
     assert deduped == rows
 
@@ -26,7 +26,7 @@ def test_remove_duplicates_all_duplicates():
     existing = [{"A": "1"}]
     key_columns = ["A"]
     class DummyLogger:
-        def debug(self, msg): pass
-        def info(self, msg): pass
+        def debug(self, msg, *args): pass
+        def info(self, msg, *args): pass
     deduped = remove_duplicates(rows, existing, key_columns, DummyLogger())
     assert deduped == []
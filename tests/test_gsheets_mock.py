@@ -5,7 +5,9 @@ import pytest
 from unittest.mock import patch, MagicMock
 from csvimport import fetch_sheet_entries
 
-def test_fetch_sheet_entries_mock():
+def test_fetch_sheet_entries_mock(tmp_path, monkeypatch):
+    # Without a backup store the CSV backup goes to ./backups
+    monkeypatch.chdir(tmp_path)
     # Patch gspread and Credentials
     with patch('csvimport.gspread') as gspread_mock, \
          patch('csvimport.Credentials') as creds_mock:
@@ -28,3 +30,338 @@ def test_fetch_sheet_entries_mock():
             def debug(self, msg): pass
         result = fetch_sheet_entries("sheetid", "sheetname", "creds.json", DummyLogger())
         assert result == [{"A": "1", "B": "x"}, {"A": "2", "B": "y"}]
+        assert len(os.listdir(tmp_path / "backups")) == 1
+
+def test_write_sheet_rows_chunks_and_retries():
+    from csvimport import write_sheet_rows
+    import logging
+    class QuotaError(Exception):
+        code = 429
+        response = MagicMock(headers={"Retry-After": "0"})
+    worksheet_mock = MagicMock()
+    worksheet_mock.append_rows.side_effect = [QuotaError("quota"), None, None, None]
+    rows = [[str(i), "x"] for i in range(5)]
+    with patch('csvimport.time.sleep') as sleep_mock:
+        chunks = write_sheet_rows(worksheet_mock, rows, logging.getLogger("test"), mode="append", chunk_size=2)
+    assert chunks == 3
+    sleep_mock.assert_called_once_with(0.0)
+    appended = [call.args[0] for call in worksheet_mock.append_rows.call_args_list]
+    assert appended == [rows[0:2], rows[0:2], rows[2:4], rows[4:5]]
+    worksheet_mock.sort.assert_called_once_with((1, 'des'))
+
+@pytest.mark.parametrize("mode", ["append", "insert", "sorted-merge"])
+@pytest.mark.parametrize("applied", [True, False])
+def test_write_sheet_rows_server_error_does_not_duplicate_rows(mode, applied):
+    from csvimport import write_sheet_rows
+    import logging
+    class ServerError(Exception):
+        code = 503
+
+    class FailingWorksheet(ListWorksheet):
+        failures = 1
+        def write(self, method, *args, **kwargs):
+            if self.failures and applied:
+                method(*args, **kwargs)
+            if self.failures:
+                self.failures -= 1
+                raise ServerError("backend error")
+            method(*args, **kwargs)
+        def append_rows(self, rows, **kwargs):
+            self.write(super().append_rows, rows, **kwargs)
+        def insert_rows(self, rows, row, **kwargs):
+            self.write(super().insert_rows, rows, row, **kwargs)
+
+    existing = [["Date", "Desc"], ["03/05/2025", "e1"], ["03/01/2025", "e2"]]
+    new_rows = [["03/07/2025", "n1"], ["03/02/2025", "n2"], ["01/01/2025", "n3"]]
+    expected = ListWorksheet(existing)
+    write_sheet_rows(expected, new_rows, logging.getLogger("test"), mode="append")
+    worksheet = FailingWorksheet(existing)
+    with patch('csvimport.time.sleep'):
+        write_sheet_rows(worksheet, new_rows, logging.getLogger("test"), mode=mode, chunk_size=2)
+    assert worksheet.values == expected.values
+
+def test_write_sheet_rows_retries_quota_errors_without_checking():
+    from csvimport import call_with_backoff
+    class QuotaError(Exception):
+        code = 429
+    calls = []
+    def write():
+        calls.append("write")
+        if len(calls) == 1:
+            raise QuotaError("quota")
+    with patch('csvimport.time.sleep'):
+        call_with_backoff(write, applied=lambda: calls.append("check") or True)
+    assert calls == ["write", "write"]
+
+def test_write_sheet_rows_insert_keeps_order():
+    from csvimport import write_sheet_rows
+    import logging
+    worksheet_mock = MagicMock()
+    rows = [[str(i)] for i in range(5)]
+    write_sheet_rows(worksheet_mock, rows, logging.getLogger("test"), mode="insert", chunk_size=2)
+    inserted = [call.args[0] for call in worksheet_mock.insert_rows.call_args_list]
+    assert inserted == [rows[4:5], rows[2:4], rows[0:2]]
+
+def test_sheets_session_authorizes_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    from csvimport import SheetsSession
+    with patch('csvimport.gspread') as gspread_mock, \
+         patch('csvimport.Credentials') as creds_mock:
+        client_mock = MagicMock()
+        gspread_mock.authorize.return_value = client_mock
+        worksheet_mock = client_mock.open_by_key.return_value.worksheet.return_value
+        worksheet_mock.get_all_records.return_value = []
+        class DummyLogger:
+            def info(self, msg): pass
+            def error(self, msg): pass
+            def debug(self, msg): pass
+        session = SheetsSession("creds.json", DummyLogger())
+        fetch_sheet_entries("sheetid", "sheetname", "creds.json", DummyLogger(), session=session)
+        assert session.worksheet("sheetid", "sheetname") is worksheet_mock
+        creds_mock.from_service_account_file.assert_called_once()
+        gspread_mock.authorize.assert_called_once()
+        client_mock.open_by_key.assert_called_once_with("sheetid")
+
+class FakeWorksheet:
+    # Minimal in-memory worksheet: rows are lists, A1 row ranges like "1:7"
+    def __init__(self, values, signature):
+        self.values = values
+        self.signature = signature
+        self.calls = []
+        self.spreadsheet = MagicMock()
+        self.spreadsheet.get_lastUpdateTime.side_effect = lambda: self.signature
+        self.id = 0
+    def col_values(self, col):
+        return [row[col - 1] for row in self.values]
+    def get_values(self, range_name):
+        self.calls.append(range_name)
+        first, last = (int(x) for x in range_name.split(":"))
+        return [list(row) for row in self.values[first - 1:last]]
+    def get_all_values(self):
+        self.calls.append("all")
+        return [list(row) for row in self.values]
+
+def test_fetch_sheet_values_snapshot_unchanged_delta_and_full(tmp_path):
+    import logging
+    from csvimport import fetch_sheet_values
+    logger = logging.getLogger("test")
+    path = str(tmp_path / "snap.csv")
+    body = [[f"2025-01-{d:02d}", str(d)] for d in range(20, 0, -1)]
+    ws = FakeWorksheet([["Date", "Amount"]] + body, "v1")
+    values, status, _ = fetch_sheet_values(ws, path, logger)
+    assert status == "full" and values == ws.values
+    ws.calls.clear()
+    values, status, _ = fetch_sheet_values(ws, path, logger)
+    assert status == "unchanged" and values == ws.values and ws.calls == []
+    # New rows sorted to the top: only the head (and a tail sample) is fetched
+    ws.values = [["Date", "Amount"], ["2025-02-02", "32"], ["2025-02-01", "31"]] + body
+    ws.signature = "v2"
+    values, status, new_rows = fetch_sheet_values(ws, path, logger)
+    assert status == "delta" and values == ws.values
+    assert new_rows == [["2025-02-02", "32"], ["2025-02-01", "31"]]
+    assert "all" not in ws.calls
+    # An edit further down breaks the tail check and forces a full fetch
+    ws.values[-1] = ["2025-01-01", "999"]
+    ws.signature = "v3"
+    values, status, _ = fetch_sheet_values(ws, path, logger)
+    assert status == "full" and values == ws.values
+
+def test_fetch_sheet_values_never_keeps_unverified_rows(tmp_path):
+    import logging
+    from csvimport import fetch_sheet_values
+    logger = logging.getLogger("test")
+    path = str(tmp_path / "snap.csv")
+    body = [[f"2025-01-{d:02d}", str(d)] for d in range(20, 0, -1)]
+    ws = FakeWorksheet([["Date", "Amount"]] + body, "v1")
+    fetch_sheet_values(ws, path, logger)
+    # A hand edit in the middle keeps the row count and the sampled head and tail
+    ws.values[15] = [ws.values[15][0], "edited"]
+    ws.signature = "v2"
+    values, status, _ = fetch_sheet_values(ws, path, logger)
+    assert status == "full" and values == ws.values
+    values, status, _ = fetch_sheet_values(ws, path, logger)
+    assert status == "unchanged" and values[15][1] == "edited"
+    # With a short body every cached row past the head is checked as the tail
+    short_path = str(tmp_path / "short.csv")
+    ws = FakeWorksheet([["Date", "Amount"]] + body[:8], "v1")
+    fetch_sheet_values(ws, short_path, logger)
+    ws.values = [["Date", "Amount"], ["2025-02-01", "31"]] + body[:8]
+    ws.values[8] = [ws.values[8][0], "edited"]
+    ws.signature = "v2"
+    values, status, _ = fetch_sheet_values(ws, short_path, logger)
+    assert status == "full" and values == ws.values
+    # refresh ignores a matching snapshot
+    ws.calls.clear()
+    values, status, _ = fetch_sheet_values(ws, short_path, logger, refresh=True)
+    assert status == "full" and ws.calls == ["all"]
+
+def test_sheet_without_modified_time_is_never_up_to_date(tmp_path):
+    import logging
+    from csvimport import KeyIndex, fetch_sheet_values, sheet_signature
+    ws = FakeWorksheet([["Date", "Desc", "Amount"], ["2025-01-02", "a", "1"], ["2025-01-01", "b", "2"]], "v1")
+    ws.spreadsheet.get_lastUpdateTime.side_effect = RuntimeError("not available")
+    assert sheet_signature(ws) is None
+    index = KeyIndex(str(tmp_path / "index.sqlite"), ["Desc", "Amount"])
+    index.rebuild([("a", "1")], sheet_signature(ws))
+    assert not index.is_fresh(sheet_signature(ws))
+    index.close()
+    path = str(tmp_path / "snap.csv")
+    fetch_sheet_values(ws, path, logging.getLogger("test"))
+    # An edit outside column A is picked up on the next fetch
+    ws.values[2][2] = "20"
+    values, status, _ = fetch_sheet_values(ws, path, logging.getLogger("test"))
+    assert status == "full" and values == ws.values
+
+def test_failed_sheet_write_resumes_from_journal(tmp_path, monkeypatch):
+    import csvimport
+    input_file = tmp_path / "input.csv"
+    input_file.write_text("col1,col2\n" + "".join(f"{i},x\n" for i in range(5)))
+    (tmp_path / "empty.conf").write_text("")
+    worksheet = MagicMock(title="ws")
+    session = MagicMock()
+    session.worksheet.return_value = worksheet
+    monkeypatch.setattr(csvimport, "SheetsSession", lambda *args, **kwargs: session)
+    fetch = MagicMock(return_value=[])
+    monkeypatch.setattr(csvimport, "fetch_sheet_entries", fetch)
+    monkeypatch.setattr(sys, "argv", [
+        "csvimport.py", "--input-files", str(input_file),
+        "--input-format", "col1,col2", "--output-format", "col1,col2", "--key-columns", "col1",
+        "--config", str(tmp_path / "empty.conf"), "--log-file", str(tmp_path / "csvimport.log"),
+        "--existing-sheet-id", "sheet", "--sheet-name", "ws", "--google-creds", "creds.json",
+        "--write-chunk-size", "2", "--checkpoint-dir", str(tmp_path / "checkpoints"),
+        "--backup-mode", "csv",
+    ])
+    worksheet.append_rows.side_effect = [None, ValueError("connection reset")]
+    with pytest.raises(SystemExit) as exc:
+        csvimport.main()
+    assert exc.value.code == 4
+    assert len(os.listdir(tmp_path / "checkpoints")) == 2
+    worksheet.append_rows.side_effect = None
+    csvimport.main()
+    appended = [call.args[0] for call in worksheet.append_rows.call_args_list]
+    assert appended[0] == [["0", "x"], ["1", "x"]]
+    # The failed chunk is retried, the committed one is not written again
+    assert appended[1:] == [[["2", "x"], ["3", "x"]], [["2", "x"], ["3", "x"]], [["4", "x"]]]
+    assert fetch.call_count == 1
+    assert os.listdir(tmp_path / "checkpoints") == []
+
+class ListWorksheet:
+    # In-memory worksheet supporting the calls write_sheet_rows makes
+    title = "ws"
+    def __init__(self, values):
+        self.values = [list(row) for row in values]
+        self.requests = []
+    def col_values(self, col):
+        self.requests.append("col_values")
+        return [row[col - 1] for row in self.values]
+    def insert_rows(self, rows, row, value_input_option=None):
+        self.requests.append(("insert", row, len(rows)))
+        self.values[row - 1:row - 1] = [list(r) for r in rows]
+    def append_rows(self, rows, value_input_option=None, insert_data_option=None):
+        self.requests.append(("append", len(rows)))
+        self.values.extend(list(r) for r in rows)
+    def sort(self, spec):
+        from csvimport import sheet_sort_value
+        self.requests.append("sort")
+        self.values[1:] = sorted(self.values[1:], key=lambda row: -sheet_sort_value(row[0]))
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 10])
+def test_write_sheet_rows_sorted_merge_matches_append_and_sort(chunk_size):
+    from csvimport import write_sheet_rows
+    import logging
+    existing = [["Date", "Desc"], ["03/05/2025", "e1"], ["03/01/2025", "e2"], ["03/01/2025", "e3"], ["2/20/2025", "e4"]]
+    new_rows = [["03/01/2025", "n1"], ["03/07/2025", "n2"], ["03/06/2025", "n3"], ["03/01/2025", "n4"], ["01/01/2025", "n5"]]
+    expected = ListWorksheet(existing)
+    write_sheet_rows(expected, new_rows, logging.getLogger("test"), mode="append", chunk_size=chunk_size)
+    merged = ListWorksheet(existing)
+    write_sheet_rows(merged, new_rows, logging.getLogger("test"), mode="sorted-merge", chunk_size=chunk_size)
+    assert merged.values == expected.values
+    assert "sort" not in merged.requests
+    if chunk_size == 10:
+        # Three insertion points, one request each, plus reading column A
+        assert merged.requests == ["col_values", ("insert", 6, 1), ("insert", 5, 2), ("insert", 2, 2)]
+
+def test_write_sheet_rows_sorted_merge_falls_back_when_unsorted():
+    from csvimport import write_sheet_rows
+    import logging
+    worksheet = ListWorksheet([["Date"], ["01/01/2025"], ["03/01/2025"]])
+    write_sheet_rows(worksheet, [["02/01/2025"]], logging.getLogger("test"), mode="sorted-merge", existing_column=["01/01/2025", "03/01/2025"])
+    # Column A is read once for the row count that guards write retries
+    assert worksheet.requests == ["col_values", ("append", 1), "sort"]
+    assert [row[0] for row in worksheet.values[1:]] == ["03/01/2025", "02/01/2025", "01/01/2025"]
+
+def test_sorted_merge_resume_does_not_repeat_committed_inserts(tmp_path):
+    from csvimport import write_sheet_rows, RunJournal
+    import logging
+    logger = logging.getLogger("test")
+    input_file = tmp_path / "input.csv"
+    input_file.write_text("x\n")
+    existing = [["Date", "Desc"], ["03/05/2025", "e1"], ["03/01/2025", "e2"], ["2/20/2025", "e3"]]
+    new_rows = [["03/07/2025", "n1"], ["03/02/2025", "n2"], ["01/01/2025", "n3"]]
+    expected = ListWorksheet(existing)
+    write_sheet_rows(expected, new_rows, logger, mode="append")
+
+    class FlakyWorksheet(ListWorksheet):
+        fail_at = 2
+        def insert_rows(self, rows, row, value_input_option=None):
+            self.fail_at -= 1
+            if self.fail_at == 0:
+                raise ValueError("connection reset")
+            super().insert_rows(rows, row, value_input_option)
+
+    worksheet = FlakyWorksheet(existing)
+    journal = RunJournal(str(tmp_path), "org", "sheet", "ws", [str(input_file)], logger)
+    journal.start(new_rows, "sorted-merge", 10)
+    with pytest.raises(ValueError):
+        write_sheet_rows(worksheet, journal.rows(), logger, mode="sorted-merge", chunk_size=10,
+                         done_chunks=journal.committed, on_chunk=journal.commit,
+                         done_rows=journal.committed_rows, on_rows=journal.commit_rows)
+    resumed = RunJournal(str(tmp_path), "org", "sheet", "ws", [str(input_file)], logger)
+    assert resumed.resume()
+    assert resumed.committed_rows == {0: {2}}
+    write_sheet_rows(worksheet, resumed.rows(), logger, mode="sorted-merge", chunk_size=10,
+                     done_chunks=resumed.committed, on_chunk=resumed.commit,
+                     done_rows=resumed.committed_rows, on_rows=resumed.commit_rows)
+    assert worksheet.values == expected.values
+    assert resumed.committed == {0} and resumed.committed_rows == {}
+
+def test_fresh_key_index_still_backs_up_sheet(tmp_path, monkeypatch):
+    import csvimport
+    import logging
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "empty.conf").write_text("")
+    worksheet = ListWorksheet([["Date", "Desc"], ["03/01/2025", "old"]])
+    worksheet.id = 0
+    worksheet.spreadsheet = MagicMock()
+    worksheet.spreadsheet.get_lastUpdateTime.side_effect = lambda: str(len(worksheet.values))
+    worksheet.get_all_records = lambda: [dict(zip(worksheet.values[0], row)) for row in worksheet.values[1:]]
+    worksheet.get_all_values = lambda: [list(row) for row in worksheet.values]
+    session = MagicMock()
+    session.worksheet.return_value = worksheet
+    monkeypatch.setattr(csvimport, "SheetsSession", lambda *args, **kwargs: session)
+    fetch = MagicMock(wraps=csvimport.fetch_sheet_entries)
+    monkeypatch.setattr(csvimport, "fetch_sheet_entries", fetch)
+    closed = []
+    monkeypatch.setattr(csvimport.KeyIndex, "close", lambda self: closed.append(self.path))
+
+    def run(date):
+        (tmp_path / "input.csv").write_text(f"Date,Desc\n{date},new\n")
+        monkeypatch.setattr(sys, "argv", [
+            "csvimport.py", "--input-files", str(tmp_path / "input.csv"),
+            "--input-format", "Date,Desc", "--output-format", "Date,Desc", "--key-columns", "Date,Desc",
+            "--config", "empty.conf", "--log-file", "csvimport.log", "--key-index", "--no-checkpoint",
+            "--existing-sheet-id", "sheet", "--sheet-name", "ws", "--google-creds", "creds.json",
+            "--backup-mode", "store",
+        ])
+        csvimport.main()
+
+    run("03/02/2025")
+    run("03/03/2025")
+    assert fetch.call_count == 1
+    assert [row[0] for row in worksheet.values[1:]] == ["03/03/2025", "03/02/2025", "03/01/2025"]
+    store = csvimport.BackupStore(str(tmp_path / "backups" / "store"), logging.getLogger("test"))
+    backups = store.list_manifests("ws")
+    assert len(backups) == 2
+    store.restore(backups[-1], str(tmp_path / "restored.csv"))
+    assert (tmp_path / "restored.csv").read_text().splitlines() == ["Date,Desc", "03/02/2025,new", "03/01/2025,old"]
+    assert len(closed) == 2
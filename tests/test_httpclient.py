@@ -0,0 +1,129 @@
+import sys
+import os
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import pytest
+import requests
+import httpclient
+import jira
+import trello
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def respond(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        with server.lock:
+            server.connections.add(self.client_address)
+            server.requests.append((self.command, self.path, self.headers.get("Accept-Encoding")))
+            scripted = server.script.pop(0) if server.script else None
+        status, headers, data = scripted or server.route(self.command, self.path, body)
+        payload = json.dumps(data).encode("utf-8")
+        if "gzip" in (self.headers.get("Accept-Encoding") or ""):
+            payload = gzip.compress(payload)
+            headers = dict(headers, **{"Content-Encoding": "gzip"})
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = respond
+    do_POST = respond
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.lock = threading.Lock()
+    server.connections = set()
+    server.requests = []
+    server.script = []
+    server.route = lambda method, path, body: (200, {}, {"ok": True})
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_session_keeps_connection_alive_and_decodes_gzip(stub):
+    session = httpclient.make_session(pool_size=1)
+    for _ in range(5):
+        resp = session.get(stub.url + "/ping", timeout=5)
+        assert resp.json() == {"ok": True}
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert len(stub.connections) == 1
+    assert all("gzip" in accept for _, _, accept in stub.requests)
+
+def test_session_retries_throttled_and_server_errors(stub):
+    stub.script = [(429, {"Retry-After": "0"}, {}), (503, {}, {}), (429, {"Retry-After": "0"}, {})]
+    session = httpclient.make_session(retries=3, backoff=0)
+    resp = session.post(stub.url + "/search", data="{}", timeout=5)
+    assert resp.status_code == 200
+    assert len(stub.requests) == 4
+
+def test_session_returns_last_response_when_retries_run_out(stub):
+    stub.script = [(503, {}, {})] * 3
+    session = httpclient.make_session(retries=2, backoff=0)
+    resp = session.get(stub.url + "/ping", timeout=5)
+    assert resp.status_code == 503
+    with pytest.raises(requests.HTTPError):
+        resp.raise_for_status()
+
+def test_jira_search_against_stub(stub):
+    issues = [{"key": f"ABC-{i}", "fields": {"summary": f"issue {i}"}} for i in range(230)]
+
+    def route(method, path, body):
+        payload = json.loads(body)
+        start, size = payload["startAt"], payload["maxResults"]
+        return 200, {}, {"total": len(issues), "issues": issues[start:start + size]}
+
+    stub.route = route
+    stub.script = [(429, {"Retry-After": "0"}, {})]
+    session = httpclient.make_session(pool_size=3, backoff=0)
+    result = jira.search_jira(stub.url, "t", 'project = "ABC"', page_size=50, concurrency=3, session=session)
+    assert [i["key"] for i in result] == [i["key"] for i in issues]
+    assert len(stub.connections) <= 3
+
+def test_trello_search_against_stub(stub, monkeypatch):
+    cards = [{"id": "1", "name": "Deploy to prod", "idList": "L", "idMembers": []},
+             {"id": "2", "name": "Other", "idList": "L", "idMembers": []}]
+    stub.route = lambda method, path, body: (200, {}, cards)
+    stub.script = [(502, {}, {})]
+    monkeypatch.setattr(trello, "TRELLO_API_URL", stub.url + "/1")
+    session = httpclient.make_session(pool_size=1, backoff=0)
+    result = trello.search_trello("k", "t", {"board": "B", "name": "*deploy*"}, session=session)
+    assert [c["id"] for c in result] == ["1"]
+    assert stub.requests[-1][1].startswith("/1/boards/B/cards?")
+
+def test_trello_search_closes_its_own_session(stub, monkeypatch):
+    stub.route = lambda method, path, body: (200, {}, [{"id": "1", "name": "Card", "idList": "L", "idMembers": []}])
+    monkeypatch.setattr(trello, "TRELLO_API_URL", stub.url + "/1")
+    closed = []
+
+    class TrackedSession(requests.Session):
+        def close(self):
+            closed.append(self)
+            super().close()
+
+    def tracked(**kwargs):
+        session = TrackedSession()
+        session.mount("http://", httpclient.HTTPAdapter(max_retries=httpclient.make_retry(0, 0)))
+        return session
+
+    monkeypatch.setattr(trello.httpclient, "make_session", tracked)
+    assert [c["id"] for c in trello.search_trello("k", "t", {"board": "B"})] == ["1"]
+    stub.script = [(404, {}, {})]
+    with pytest.raises(requests.HTTPError):
+        trello.search_trello("k", "t", {"board": "B"})
+    assert len(closed) == 2
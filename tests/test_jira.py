@@ -0,0 +1,218 @@
+import sys
+import os
+import json
+import random
+import threading
+import time
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import pytest
+import requests
+import jira
+
+class FakeResponse:
+    def __init__(self, status_code, data=None, headers=None):
+        self.status_code = status_code
+        self._data = data or {}
+        self.headers = headers or {}
+        self.text = json.dumps(self._data)
+        self.content = self.text.encode("utf-8")
+
+    def json(self):
+        return self._data
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error")
+
+class FakeJira:
+    """Stands in for a requests.Session talking to Jira's search endpoint."""
+    def __init__(self, total, page_cap=None, throttle_first=0):
+        self.issues = [{"key": f"ABC-{i}", "fields": {"summary": f"issue {i}"}} for i in range(total)]
+        self.updated_issues = []
+        self.jqls = []
+        self.fields = []
+        self.page_cap = page_cap
+        self.throttle_left = throttle_first
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def post(self, url, headers=None, data=None, timeout=None):
+        payload = json.loads(data)
+        with self.lock:
+            self.requests.append(payload["startAt"])
+            self.jqls.append(payload["jql"])
+            self.fields.append(payload["fields"])
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            throttled = self.throttle_left > 0 and payload["startAt"] > 0
+            if throttled:
+                self.throttle_left -= 1
+        time.sleep(random.uniform(0, 0.01))
+        with self.lock:
+            self.in_flight -= 1
+        if throttled:
+            return FakeResponse(429, headers={"Retry-After": "0"})
+        size = min(payload["maxResults"], self.page_cap or payload["maxResults"])
+        start = payload["startAt"]
+        matching = self.updated_issues if "updated >=" in payload["jql"] else self.issues
+        page = [{"key": issue["key"], "fields": {f: v for f, v in issue["fields"].items() if f in payload["fields"]}}
+                for issue in matching[start:start + size]]
+        return FakeResponse(200, {"total": len(matching), "issues": page})
+
+def test_search_jira_concurrent_pages_in_order():
+    server = FakeJira(total=1005)
+    issues = jira.search_jira("https://jira", "t", 'project = "ABC"', page_size=50, concurrency=4, session=server)
+    assert [i["key"] for i in issues] == [i["key"] for i in server.issues]
+    assert server.requests[0] == 0
+    assert sorted(server.requests) == list(range(0, 1005, 50))
+    assert 1 < server.max_in_flight <= 4
+
+def test_search_jira_steps_by_server_page_cap():
+    server = FakeJira(total=95, page_cap=20)
+    issues = jira.search_jira("https://jira", "t", 'project = "ABC"', page_size=100, concurrency=3, session=server)
+    assert len(issues) == 95
+    assert sorted(server.requests) == [0, 20, 40, 60, 80]
+
+def test_search_jira_pages_yields_first_page_after_one_request():
+    server = FakeJira(total=1000)
+    pages = jira.search_jira_pages("https://jira", "t", 'project = "ABC"', page_size=100, concurrency=2, session=server)
+    first = next(pages)
+    assert [i["key"] for i in first] == [f"ABC-{i}" for i in range(100)]
+    assert server.requests == [0]
+    pages.close()
+    # only the bounded read-ahead window was ever requested
+    assert len(server.requests) <= 1 + 2 * 2
+
+@pytest.mark.parametrize("count", [0, 1, 3])
+def test_write_json_matches_json_dump(count):
+    import io
+    issues = [{"key": f"ABC-{i}", "fields": {"summary": f"süm\n{i}"}} for i in range(count)]
+    out = io.StringIO()
+    jira.write_json(iter(issues), out)
+    expected = io.StringIO()
+    json.dump([jira.simplify_issue(i) for i in issues], expected, ensure_ascii=False, indent=2)
+    assert out.getvalue() == expected.getvalue() + "\n"
+
+def write_config(tmp_path):
+    cfg = tmp_path / "jira.cfg"
+    cfg.write_text("[jira]\nurl = https://jira\ntoken = secret\n")
+    return str(cfg)
+
+def test_main_streams_ndjson(tmp_path, monkeypatch):
+    server = FakeJira(total=250)
+    monkeypatch.setattr(jira.httpclient, "make_session", lambda **kwargs: server)
+    out = tmp_path / "out.ndjson"
+    code = jira.main(["-c", write_config(tmp_path), "--project", "ABC", "--format", "ndjson",
+                      "--output-file", str(out), "--log-file", str(tmp_path / "jira.log")])
+    assert code == 0
+    lines = [json.loads(line) for line in out.read_text().splitlines()]
+    assert [line["key"] for line in lines] == [i["key"] for i in server.issues]
+
+def test_main_search_failure_after_first_page(tmp_path, monkeypatch):
+    server = FakeJira(total=250, throttle_first=100)
+    monkeypatch.setattr(jira.httpclient, "make_session", lambda **kwargs: server)
+    out = tmp_path / "out.txt"
+    code = jira.main(["-c", write_config(tmp_path), "--project", "ABC",
+                      "--output-file", str(out), "--log-file", str(tmp_path / "jira.log")])
+    assert code == 3
+    assert out.read_text().splitlines()[0] == "ABC-0 — issue 0"
+
+def cached_issue(num, summary, reporter):
+    return {"key": f"ABC-{num}", "fields": {"summary": summary, "reporter": {"name": reporter}, "updated": "2025-01-01T00:00:00.000+0000"}}
+
+def run_cached(tmp_path, monkeypatch, server, *extra):
+    monkeypatch.setattr(jira.httpclient, "make_session", lambda **kwargs: server)
+    out = tmp_path / "out.ndjson"
+    code = jira.main(["-c", write_config(tmp_path), "--project", "ABC", "--format", "ndjson",
+                      "--cache-file", str(tmp_path / "cache.sqlite"), "--output-file", str(out),
+                      "--log-file", str(tmp_path / "jira.log"), *extra])
+    return code, [json.loads(line)["key"] for line in out.read_text().splitlines()] if out.exists() else None
+
+def test_cache_syncs_incrementally_and_filters_locally(tmp_path, monkeypatch):
+    server = FakeJira(total=0)
+    server.issues = [cached_issue(1, "Deploy to prod", "alice"), cached_issue(2, "Fix login", "bob"),
+                     cached_issue(3, "deploy TO prod again", "bob")]
+    code, keys = run_cached(tmp_path, monkeypatch, server, "--cache", "--summary", "*deploy to prod*")
+    assert code == 0
+    assert keys == ["ABC-3", "ABC-1"]
+    assert server.jqls == ['project = "ABC"']
+
+    server.updated_issues = [cached_issue(2, "Deploy to prod hotfix", "bob"), cached_issue(4, "New", "alice")]
+    code, keys = run_cached(tmp_path, monkeypatch, server, "--cache", "--summary", "*deploy to prod*", "--reporter", "bob")
+    assert code == 0
+    assert keys == ["ABC-3", "ABC-2"]
+    assert server.jqls[-1] == f'project = "ABC" AND updated >= "-{jira.SYNC_OVERLAP_MINUTES}m"'
+
+    requests_before = len(server.requests)
+    code, keys = run_cached(tmp_path, monkeypatch, server, "--offline", "--reporter", "alice")
+    assert code == 0
+    assert keys == ["ABC-4", "ABC-1"]
+    assert len(server.requests) == requests_before
+
+def test_cache_offline_without_sync(tmp_path, monkeypatch):
+    code, keys = run_cached(tmp_path, monkeypatch, FakeJira(total=3), "--offline")
+    assert code == 2
+    assert keys is None
+
+def test_cache_failed_sync_keeps_previous_state(tmp_path):
+    cache = jira.IssueCache(str(tmp_path / "cache.sqlite"), "https://jira")
+    cache.sync("ABC", lambda jql, fields: iter([[cached_issue(1, "one", "alice")]]), jira.CACHE_FIELDS)
+
+    def failing(jql, fields):
+        yield [cached_issue(2, "two", "bob")]
+        raise requests.HTTPError("503")
+
+    with pytest.raises(requests.HTTPError):
+        cache.sync("ABC", failing, jira.CACHE_FIELDS, full=True)
+    assert [i["key"] for page in cache.search_pages("ABC") for i in page] == ["ABC-1"]
+    cache.close()
+
+def test_main_fields_projection(tmp_path, monkeypatch):
+    server = FakeJira(total=0)
+    server.issues = [{"key": "ABC-1", "fields": {"summary": "One", "status": {"name": "Done"},
+                                                 "labels": ["a", "b"], "description": "x" * 1000}}]
+    monkeypatch.setattr(jira.httpclient, "make_session", lambda **kwargs: server)
+    out = tmp_path / "out.txt"
+    code = jira.main(["-c", write_config(tmp_path), "--project", "ABC", "--fields", "summary, status,labels",
+                      "--output-file", str(out), "--log-file", str(tmp_path / "jira.log")])
+    assert code == 0
+    assert server.fields == [["summary", "status", "labels"]]
+    assert out.read_text() == "ABC-1 — One — Done — a, b\n"
+
+    code = jira.main(["-c", write_config(tmp_path), "--project", "ABC", "--fields", "status", "--format", "ndjson",
+                      "--json-parser", "json", "--output-file", str(out), "--log-file", str(tmp_path / "jira.log")])
+    assert code == 0
+    assert json.loads(out.read_text()) == {"key": "ABC-1", "status": {"name": "Done"}}
+
+def test_main_json_parser_not_installed(tmp_path, monkeypatch):
+    monkeypatch.setattr(jira, "JSON_PARSERS", {"json": json.loads})
+    code = jira.main(["-c", write_config(tmp_path), "--project", "ABC", "--json-parser", "orjson",
+                      "--log-file", str(tmp_path / "jira.log")])
+    assert code == 2
+
+def test_cache_adding_fields_resyncs_union(tmp_path, monkeypatch):
+    server = FakeJira(total=0)
+    server.issues = [dict(cached_issue(1, "One", "alice"))]
+    server.issues[0]["fields"]["status"] = {"name": "Open"}
+    code, keys = run_cached(tmp_path, monkeypatch, server, "--cache")
+    assert code == 0
+    code, keys = run_cached(tmp_path, monkeypatch, server, "--cache", "--fields", "status")
+    assert code == 0
+    assert server.jqls == ['project = "ABC"', 'project = "ABC"']
+    assert server.fields[-1] == ["reporter", "status", "summary", "updated"]
+    code, keys = run_cached(tmp_path, monkeypatch, server, "--offline", "--fields", "summary,status")
+    assert code == 0
+    code, keys = run_cached(tmp_path, monkeypatch, server, "--cache")
+    assert server.jqls[-1].endswith('updated >= "-5m"')
+    assert server.fields[-1] == ["reporter", "status", "summary", "updated"]
@@ -10,6 +10,8 @@ Features:
  - debug mode outputs logs to STDOUT (and sets logging to DEBUG)
  - results output can be plain text (default) or JSON
  - pagination: iterates through all matching cards (uses --max-results as page size)
+ - requests go through the shared httpclient session (keep-alive, gzip, retries
+   with backoff on 429/5xx honouring Retry-After)
  - API token is never logged (redacted via logging filter)
  - Protect config file (it contains a sensitive token) — use chmod 600
 """
@@ -23,11 +25,13 @@ import logging.handlers
 import os
 import sys
 import requests
+import httpclient
 from typing import Optional, List, IO
 
 DEFAULT_CONFIG_PATH = os.path.expanduser("~/.trello.cfg")
 DEFAULT_LOG_FILE = "trello.py.log"
 TRELLO_SECTION = "trello"
+TRELLO_API_URL = "https://api.trello.com/1"
 
 class RedactTokenFilter(logging.Filter):
     def __init__(self, token: Optional[str]):
@@ -91,26 +95,34 @@ def build_query(board: Optional[str], list_name: Optional[str], member: Optional
         query["name"] = name
     return query
 
-def search_trello(key: str, token: str, query: dict, page_size: int = 100, logger: Optional[logging.Logger] = None) -> List[dict]:
+def search_trello(key: str, token: str, query: dict, page_size: int = 100, logger: Optional[logging.Logger] = None,
+                  session: Optional[requests.Session] = None) -> List[dict]:
     if logger is None:
         logger = logging.getLogger("trello_cli")
     board_id = query.get("board")
     if not board_id:
         raise ValueError("Board ID is required.")
-    url = f"https://api.trello.com/1/boards/{board_id}/cards"
+    url = f"{TRELLO_API_URL}/boards/{board_id}/cards"
     params = {
         "key": key,
         "token": token,
         "fields": "id,name,idList,idMembers",
     }
     all_cards: List[dict] = []
-    resp = requests.get(url, params=params, timeout=30)
+    own_session = session is None
+    if own_session:
+        session = httpclient.make_session(pool_size=1)
     try:
-        resp.raise_for_status()
-    except requests.HTTPError:
-        logger.debug("Trello response status: %s body (truncated): %s", resp.status_code, resp.text[:1000])
-        raise
-    cards = resp.json()
+        resp = session.get(url, params=params, timeout=httpclient.DEFAULT_TIMEOUT)
+        try:
+            resp.raise_for_status()
+        except requests.HTTPError:
+            logger.debug("Trello response status: %s body (truncated): %s", resp.status_code, resp.text[:1000])
+            raise
+        cards = resp.json()
+    finally:
+        if own_session:
+            session.close()
     # Filter by list, member, name (wildcard)
     for card in cards:
         if query.get("list") and card.get("idList") != query["list"]:
@@ -148,6 +160,8 @@ def parse_args(argv: Optional[List[str]] = None):
     p.add_argument("--log-file", help="Log file path. If omitted, default trello.py.log is used (unless --debug).")
     p.add_argument("--debug", action="store_true", help="Enable debug logging to STDOUT.")
     p.add_argument("--max-results", type=int, default=100, help="Page size (not used, for compatibility)")
+    p.add_argument("--retries", type=int, default=httpclient.DEFAULT_RETRIES,
+                   help=f"Retries for throttled (429), 5xx or failed requests (default: {httpclient.DEFAULT_RETRIES}).")
     p.add_argument("--output-file", help="Write results to this file instead of STDOUT.")
     p.add_argument("--format", choices=["text", "json"], default="text", help="Output format: text (default) or json.")
     return p.parse_args(argv)
@@ -175,8 +189,9 @@ def main(argv: Optional[List[str]] = None) -> int:
         logger.error("Refusing to run search without --board.")
         print("Refusing to run search without --board.", file=sys.stderr)
         return 2
+    session = httpclient.make_session(pool_size=1, retries=args.retries)
     try:
-        cards = search_trello(key, token, query, page_size=args.max_results, logger=logger)
+        cards = search_trello(key, token, query, page_size=args.max_results, logger=logger, session=session)
         logger.info("Search completed; total cards returned: %d", len(cards))
     except requests.HTTPError as e:
         logger.exception("HTTP error when querying Trello: %s", e)
@@ -186,6 +201,8 @@ def main(argv: Optional[List[str]] = None) -> int:
         logger.exception("Unexpected error when querying Trello: %s", e)
         print(f"Unexpected error when querying Trello: {e}", file=sys.stderr)
         return 3
+    finally:
+        session.close()
     output_fp: Optional[IO[str]] = None
     try:
         if args.output_file: